@@ -7,32 +7,760 @@ Author: Hy
 Version: 2.1 (Enhanced)
 """
 
+from __future__ import annotations
+
+import time
+
+# Mốc thời gian khởi động, in ra khi chạy với --profile-startup
+startup_marks = [("start", time.perf_counter())]
+
 import os
+import re
 import sys
+import asyncio
+import base64
+import socket
+import io
+import json
+import hashlib
+import cProfile
+import pstats
+import traceback
+import multiprocessing
+import tracemalloc
+import unicodedata
+import subprocess
+import queue
+import sqlite3
+import statistics
 import threading
-import time
 import random
-from typing import List, Dict, Optional
+import shutil
+import signal
+import tempfile
+import zipfile
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, asdict
+from functools import lru_cache, partial
+from html import escape
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, urljoin
+from typing import Callable, ClassVar, List, Dict, Optional, Set, Tuple
+startup_marks.append(("stdlib imports", time.perf_counter()))
 
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                            QLabel, QLineEdit, QPushButton, QTextEdit, QFrame, 
                            QStackedWidget, QMessageBox)
 from PyQt5.QtGui import QPixmap, QFont, QIcon
 from PyQt5.QtCore import Qt, QSize, pyqtSignal, QObject, QTimer
+startup_marks.append(("PyQt5 imports", time.perf_counter()))
+
+# selenium và requests được import khi lần đầu cần (xem load_automation_modules)
+requests = HTTPAdapter = None
+webdriver = By = EdgeOptions = EdgeService = EC = WebElement = None
+TimeoutException = NoSuchElementException = StaleElementReferenceException = None
+
+
+def load_automation_modules() -> None:
+    """
+    Import selenium và requests ở lần đầu cần (worker, benchmark, replay).
+
+    Cửa sổ đăng nhập hiện ra mà không phải chờ import hai thư viện này; các hàm
+    dùng chúng đều chạy sau khi hàm này được gọi.
+    """
+    global requests, HTTPAdapter, webdriver, By, EdgeOptions, EdgeService, EC, WebElement
+    global TimeoutException, NoSuchElementException, StaleElementReferenceException
+    if webdriver is not None:
+        return
+    import requests
+    from requests.adapters import HTTPAdapter
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.edge.options import Options as EdgeOptions
+    from selenium.webdriver.edge.service import Service as EdgeService
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.remote.webelement import WebElement
+    from selenium.common.exceptions import (TimeoutException, NoSuchElementException,
+                                            StaleElementReferenceException)
+
+class CancelledError(Exception):
+    """Raised inside the worker when the current run has been cancelled."""
+
+
+class CancelToken:
+    """
+    Token hủy dùng chung cho mọi lần chờ của worker.
+
+    Các lần chờ được chia thành lát ngắn và thức dậy ngay khi token bị hủy; các
+    callback đăng ký (vd. dừng msedgedriver) cắt ngang request WebDriver đang chạy.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        """Cancel the token and run the registered abort callbacks."""
+        self._event.set()
+        with self._lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def reset(self) -> None:
+        """Re-arm the token for a new run."""
+        with self._lock:
+            self._callbacks = []
+        self._event.clear()
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """Register a callback that aborts in-flight work when cancelled."""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def sleep(self, seconds: float) -> bool:
+        """
+        Sleep that wakes up immediately on cancellation.
+
+        Returns:
+            True if the token was cancelled
+        """
+        return self._event.wait(max(0.0, seconds))
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise CancelledError()
+
+
+# Mức log của event bus (giống module logging)
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+
+@dataclass
+class Event:
+    """
+    Sự kiện có kiểu của worker.
+
+    Sự kiện chỉ giữ dữ liệu thô; chuỗi hiển thị chỉ được dựng trong format(),
+    tức là chỉ khi có sink ở mức log tương ứng thực sự đọc nó.
+    """
+
+    level: ClassVar[int] = INFO
+
+    def format(self) -> str:
+        return self.__class__.__name__
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data["type"] = self.__class__.__name__
+        data["level"] = LEVEL_NAMES.get(self.event_level, str(self.event_level))
+        return data
+
+    @property
+    def event_level(self) -> int:
+        return self.level
+
+
+@dataclass
+class LogMessage(Event):
+    text: str
+    severity: int = INFO
+
+    @property
+    def event_level(self) -> int:
+        return self.severity
+
+    def format(self) -> str:
+        return self.text
+
+
+@dataclass
+class StatusChanged(Event):
+    text: str
+
+    def format(self) -> str:
+        return self.text
+
+
+@dataclass
+class LoginPrompt(Event):
+    active: bool
+
+    def format(self) -> str:
+        return "Chờ người dùng hoàn tất đăng nhập" if self.active else "Đã hoàn tất đăng nhập"
+
+
+@dataclass
+class RunStarted(Event):
+    dry_run: bool
+
+    def format(self) -> str:
+        return "Bắt đầu lượt chạy" + (" (chạy thử)" if self.dry_run else "")
+
+
+@dataclass
+class RunFinished(Event):
+    outcome: str
+    completed: int
+    failed: int
+
+    def format(self) -> str:
+        return f"Kết thúc lượt chạy ({self.outcome}): {self.completed} xong, {self.failed} lỗi"
+
+
+@dataclass
+class DriverStarted(Event):
+    backend: str
+    seconds: float
+
+    def format(self) -> str:
+        return f"Đã khởi động {self.backend} trong {self.seconds:.1f}s"
+
+
+@dataclass
+class SurveyStarted(Event):
+    index: int
+    total: int
+    link: str
+
+    def format(self) -> str:
+        return f"Đang thực hiện khảo sát {self.index}/{self.total}: {self.link}"
+
+
+@dataclass
+class SurveyFinished(Event):
+    index: int
+    submitted: bool
+    pages: int
+    seconds: float
+
+    def format(self) -> str:
+        outcome = "đã gửi" if self.submitted else "chưa gửi"
+        return f"Khảo sát {self.index} {outcome} sau {self.pages} trang ({self.seconds:.1f}s)"
+
+
+@dataclass
+class PageScanned(Event):
+    survey: int
+    page: int
+    fingerprint: str
+    from_cache: bool
+    actions: int
+    planning_ms: float
+
+    def format(self) -> str:
+        mode = "replay" if self.from_cache else "phân tích"
+        return (f"Trang {self.page} của khảo sát {self.survey}: {self.actions} thao tác, "
+                f"lập kế hoạch {self.planning_ms:.0f} ms ({mode}, mẫu {self.fingerprint[:8]})")
+
+
+@dataclass
+class GroupAnalyzed(Event):
+    level: ClassVar[int] = DEBUG
+    name: str
+    question: str
+    labels: List[str]
+
+    def format(self) -> str:
+        return f"Phân tích: {self.question[:100]}...\nOptions: {self.labels}"
+
+
+@dataclass
+class GroupAnswered(Event):
+    kind: str
+    target: str
+    reason: str
+
+    def format(self) -> str:
+        return f"✓ {self.reason}"
+
+
+@dataclass
+class Timing(Event):
+    level: ClassVar[int] = DEBUG
+    phase: str
+    seconds: float
+
+    def format(self) -> str:
+        return f"⏱ {self.phase}: {self.seconds * 1000:.0f} ms"
+
+
+class EventSink(ABC):
+    """Nơi nhận sự kiện; chỉ nhận sự kiện có mức >= level và thuộc kiểu quan tâm."""
+
+    def __init__(self, level: int = INFO, types: Optional[Tuple[type, ...]] = None):
+        self.level = level
+        self.types = types
+
+    def accepts(self, event_type: type, level: int) -> bool:
+        if self.types is not None and not issubclass(event_type, self.types):
+            return False
+        return level >= self.level
+
+    @abstractmethod
+    def handle(self, event: Event) -> None:
+        """Receive one accepted event."""
+
+    def close(self) -> None:
+        pass
+
+
+class CallbackSink(EventSink):
+    """Forward events to a callable (e.g. a Qt signal's emit)."""
+
+    def __init__(self, callback: Callable[[Event], None], level: int = INFO,
+                 types: Optional[Tuple[type, ...]] = None):
+        super().__init__(level, types)
+        self.callback = callback
+
+    def handle(self, event: Event) -> None:
+        self.callback(event)
+
+
+class TextFileSink(EventSink):
+    """Append formatted events to a plain-text log file."""
+
+    def __init__(self, file_path: str, level: int = INFO):
+        super().__init__(level)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        self._file = open(file_path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def handle(self, event: Event) -> None:
+        if isinstance(event, StatusChanged):
+            return
+        line = f"{time.strftime('%Y-%m-%d %H:%M:%S')} {LEVEL_NAMES.get(event.event_level, '')} {event.format()}\n"
+        with self._lock:
+            self._file.write(line)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class JsonLinesSink(EventSink):
+    """Write one JSON object per event, for machine-readable run logs."""
+
+    def __init__(self, file_path: str, level: int = DEBUG):
+        super().__init__(level)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        self._file = open(file_path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def handle(self, event: Event) -> None:
+        data = event.to_dict()
+        data["ts"] = time.time()
+        line = json.dumps(data, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class MetricsSink(EventSink):
+    """Aggregate counts per event type and total time per timing phase."""
+
+    def __init__(self):
+        super().__init__(DEBUG, (SurveyStarted, SurveyFinished, PageScanned, GroupAnswered, Timing))
+        self.counts: Dict[str, int] = {}
+        self.phase_seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def handle(self, event: Event) -> None:
+        name = event.__class__.__name__
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            if isinstance(event, Timing):
+                self.phase_seconds[event.phase] = self.phase_seconds.get(event.phase, 0.0) + event.seconds
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {"counts": dict(self.counts), "phase_seconds": dict(self.phase_seconds)}
+
+
+class EventBus:
+    """
+    Luồng sự kiện có kiểu của worker, thay cho log_callback dạng chuỗi.
+
+    Nơi phát sự kiện tốn kém nên hỏi wants(EventType) trước: nếu không có sink nào
+    ở mức đó thì không dựng sự kiện (và không định dạng chuỗi) nào cả.
+    """
+
+    def __init__(self):
+        self._sinks: List[EventSink] = []
+        self._wants: Dict[Tuple[type, int], bool] = {}
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink: EventSink) -> EventSink:
+        with self._lock:
+            self._sinks = self._sinks + [sink]
+            self._wants = {}
+        return sink
+
+    def remove_sink(self, sink: EventSink) -> None:
+        with self._lock:
+            self._sinks = [s for s in self._sinks if s is not sink]
+            self._wants = {}
+
+    def wants(self, event_type: type, level: Optional[int] = None) -> bool:
+        """Whether any attached sink would receive an event of this type and level."""
+        level = event_type.level if level is None else level
+        key = (event_type, level)
+        cached = self._wants.get(key)
+        if cached is None:
+            cached = any(sink.accepts(event_type, level) for sink in self._sinks)
+            self._wants[key] = cached
+        return cached
+
+    def emit(self, event: Event) -> None:
+        event_type, level = type(event), event.event_level
+        for sink in self._sinks:
+            if sink.accepts(event_type, level):
+                try:
+                    sink.handle(event)
+                except Exception as e:
+                    print(f"Error in event sink {sink.__class__.__name__}: {e}")
+
+    def log(self, text: str, level: Optional[int] = None) -> None:
+        """Emit a free-form log message; the level defaults from its [ERROR]/[WARNING] prefix."""
+        if level is None:
+            if text.startswith("[ERROR]"):
+                level = ERROR
+            elif text.startswith("[WARNING]"):
+                level = WARNING
+            else:
+                level = INFO
+        if self.wants(LogMessage, level):
+            self.emit(LogMessage(text, level))
+
+    def status(self, text: str) -> None:
+        self.emit(StatusChanged(text))
+
+    def find_sink(self, sink_type: type) -> Optional[EventSink]:
+        """Return the first attached sink of the given type, if any."""
+        for sink in self._sinks:
+            if isinstance(sink, sink_type):
+                return sink
+        return None
+
+    def close(self) -> None:
+        for sink in self._sinks:
+            try:
+                sink.close()
+            except Exception:
+                pass
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.edge.options import Options as EdgeOptions
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.remote.webelement import WebElement
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
 
 # Global state variables
 paused = False
-stop_thread = False
+profile_next_survey = False
+cancel_token = CancelToken()
 driver = None
 
+# Thư mục lưu cấu hình và dữ liệu của tool
+CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".tool_khaosat")
+HISTORY_DB_PATH = os.path.join(CONFIG_DIR, "history.db")
+
+# Trang danh sách phiếu khảo sát trên portal sinh viên
+PORTAL_SURVEY_URL = 'https://student.uit.edu.vn/sinhvien/phieukhaosat'
+# Cookie phiên portal lưu sau mỗi lần đăng nhập, cho chế độ --watch
+PORTAL_COOKIES_PATH = os.path.join(CONFIG_DIR, "portal_cookies.json")
+WATCH_STATE_PATH = os.path.join(CONFIG_DIR, "watch_state.json")
+
+
+class LatencyEstimator:
+    """
+    Ước lượng độ trễ quan sát được của portal.
+
+    Kết hợp EWMA (phản ứng nhanh khi portal chậm đi) với một percentile sketch
+    trên cửa sổ trượt các mẫu gần nhất (bắt được độ trễ đuôi).
+
+    Lần chờ hết thời gian được ghi như mẫu bị cắt (censored): thời gian đã chờ là cận
+    dưới của độ trễ thật, nên ước lượng không bị lệch thấp vì chỉ thấy các lần thành công.
+    """
+
+    def __init__(self, alpha: float = 0.2, window: int = 256):
+        self.alpha = alpha
+        self.ewma: Optional[float] = None
+        self._samples = deque(maxlen=window)
+        self.censored = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, censored: bool = False) -> None:
+        """
+        Record one observed latency sample in seconds.
+
+        Args:
+            seconds: Observed latency, or time waited before giving up
+            censored: The wait timed out; the real latency is at least `seconds`
+        """
+        with self._lock:
+            self.censored += int(censored)
+            if self.ewma is None:
+                self.ewma = seconds
+            else:
+                self.ewma = self.alpha * seconds + (1 - self.alpha) * self.ewma
+            self._samples.append(seconds)
+
+    @property
+    def count(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the q-quantile (0..1) of the recent samples, or None if empty."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(q * len(samples)))
+        return samples[index]
+
+    def timeout(self, fallback: float, maximum: float = 90.0, min_samples: int = 5) -> float:
+        """
+        Timeout đề xuất cho một lần chờ: không bao giờ ngắn hơn fallback của nơi gọi,
+        chỉ được kéo dài khi portal chậm hơn mức đó.
+
+        Args:
+            fallback: Timeout cố định của nơi gọi (cận dưới)
+            maximum: Timeout lớn nhất khi kéo dài
+            min_samples: Số mẫu tối thiểu trước khi tin vào ước lượng
+
+        Returns:
+            Timeout in seconds
+        """
+        if self.count < min_samples:
+            return fallback
+        estimate = max(self.percentile(0.99) * 2.0, self.ewma * 4.0) + 0.5
+        return max(fallback, min(maximum, estimate))
+
+    def poll_interval(self, minimum: float = 0.05, maximum: float = 0.5,
+                      min_samples: int = 5) -> float:
+        """Polling interval đề xuất: khoảng 1/10 độ trễ trung vị."""
+        if self.count < min_samples:
+            return maximum
+        return max(minimum, min(maximum, self.percentile(0.5) / 10.0))
+
+
+class PortalLatency:
+    """Các bộ ước lượng độ trễ cho tải trang và chờ phần tử."""
+
+    def __init__(self):
+        self.navigation = LatencyEstimator()
+        # Tổng hợp mọi lần chờ phần tử, cho ngân sách khảo sát và log
+        self.element = LatencyEstimator()
+        # Một estimator cho mỗi loại chờ: các lần chờ <body> gần như tức thì không được
+        # kéo timeout của nút gửi hay bảng danh sách xuống
+        self._waits: Dict[str, LatencyEstimator] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, kind: str) -> LatencyEstimator:
+        """Estimator of one kind of wait (created on first use)."""
+        with self._lock:
+            if kind not in self._waits:
+                self._waits[kind] = LatencyEstimator()
+            return self._waits[kind]
+
+    def survey_budget(self, max_pages: int, default: float = 300.0) -> float:
+        """
+        Tổng ngân sách thời gian cho một khảo sát, chia dần cho các lần chờ.
+
+        Args:
+            max_pages: Maximum number of pages a survey may have
+            default: Budget used before enough samples are observed
+
+        Returns:
+            Budget in seconds
+        """
+        nav = self.navigation.percentile(0.95)
+        elem = self.element.percentile(0.95)
+        if self.navigation.count < 3 or nav is None or elem is None:
+            return default
+        return max(60.0, min(600.0, max_pages * (nav + elem) * 3.0 + 30.0))
+
+    def describe(self) -> str:
+        """Mô tả ngắn trạng thái ước lượng để ghi log."""
+        parts = []
+        for name, estimator in (("tải trang", self.navigation), ("phần tử", self.element)):
+            if estimator.count:
+                parts.append(f"{name} ~{estimator.ewma:.2f}s (p95 {estimator.percentile(0.95):.2f}s)")
+        return ", ".join(parts) if parts else "chưa có dữ liệu"
+
+
+class DeadlineBudget:
+    """
+    Ngân sách thời gian tổng cho một khảo sát, được chia cho từng lần chờ.
+
+    Mỗi lần chờ chỉ được dùng tối đa slack lần phần chia đều của ngân sách còn lại
+    cho các lần chờ dự kiến, nên một lần chờ chậm không lấy hết thời gian của các
+    lần sau; lần chờ xong sớm để lại phần dư cho các lần còn lại.
+    """
+
+    def __init__(self, total: float, waits: int = 1, slack: float = 2.0):
+        self.total = total
+        self.deadline = time.monotonic() + total
+        self.waits_left = max(1, waits)
+        self.slack = slack
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cap(self, timeout: float) -> float:
+        """Giới hạn timeout của một lần chờ bởi phần ngân sách của nó và tính lần chờ đó."""
+        remaining = self.remaining()
+        share = min(remaining, remaining * self.slack / self.waits_left)
+        self.waits_left = max(1, self.waits_left - 1)
+        return min(timeout, share)
+
+
+portal_latency = PortalLatency()
+
+# Timeout tải trang mặc định của WebDriver (giây)
+PAGE_LOAD_TIMEOUT = 180
+
+
+class PortalRateLimiter:
+    """
+    Token bucket dùng chung cho mọi request tới portal: điều hướng, gửi form và HTTP.
+
+    Mỗi request lấy một token (rate token/giây, tích tối đa burst token); khi portal
+    trả 429/5xx hoặc timeout, mọi request sau đó cùng chờ một khoảng backoff lũy thừa
+    có jitter. Thời gian bị giữ lại được cộng dồn để chỉnh rate theo số đo.
+    """
+
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self, rate: float = 2.0, burst: int = 4, max_retries: int = 2,
+                 base_delay: float = 1.0, max_delay: float = 30.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._failures = 0
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def configure(self, config: Dict[str, str]) -> None:
+        """
+        Apply rate_limit (requests/second, 0 disables), rate_burst and rate_retries.
+
+        Args:
+            config: Configuration dictionary
+        """
+        try:
+            self.rate = float(config.get('rate_limit') or self.rate)
+            self.burst = max(1, int(config.get('rate_burst') or self.burst))
+            self.max_retries = max(0, int(config.get('rate_retries') or self.max_retries))
+        except ValueError:
+            pass
+        with self._lock:
+            self._tokens = min(self._tokens, float(self.burst))
+
+    def reset_stats(self) -> None:
+        self.requests = 0
+        self.throttled_seconds = 0.0
+        self.backoffs = 0
+
+    def _reserve(self) -> float:
+        """Take a token and return how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self.requests += 1
+            wait = 0.0
+            if self.rate > 0:
+                self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = -self._tokens / self.rate
+            wait = max(wait, self._blocked_until - now)
+            self.throttled_seconds += wait
+            return wait
+
+    def acquire(self) -> float:
+        """Wait for a token (cancellable); returns the seconds waited."""
+        wait = self._reserve()
+        if wait > 0:
+            cancel_token.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        """Same as acquire, without blocking the event loop."""
+        wait = self._reserve()
+        if wait > 0:
+            await async_sleep(wait)
+        return wait
+
+    def _backoff_left(self) -> float:
+        with self._lock:
+            wait = max(0.0, self._blocked_until - time.monotonic())
+            self.throttled_seconds += wait
+            return wait
+
+    def wait_backoff(self) -> float:
+        """Wait (cancellable) until the current backoff is over; returns the seconds waited."""
+        wait = self._backoff_left()
+        if wait > 0:
+            cancel_token.sleep(wait)
+        return wait
+
+    async def wait_backoff_async(self) -> float:
+        """Same as wait_backoff, without blocking the event loop."""
+        wait = self._backoff_left()
+        if wait > 0:
+            await async_sleep(wait)
+        return wait
+
+    def report_failure(self) -> float:
+        """
+        Record a 429/5xx/timeout and hold back every caller for a jittered exponential delay.
+
+        Returns:
+            The delay applied, in seconds
+        """
+        with self._lock:
+            self._failures += 1
+            self.backoffs += 1
+            delay = random.uniform(0.5, 1.0) * min(self.max_delay, self.base_delay * 2 ** (self._failures - 1))
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            return delay
+
+    def report_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+
+    def describe(self) -> str:
+        """Mô tả ngắn để ghi log cuối lượt chạy."""
+        limit = f"{self.rate:g} req/s" if self.rate > 0 else "không giới hạn"
+        return (f"{self.requests} request tới portal ({limit}), bị giữ lại {self.throttled_seconds:.1f}s, "
+                f"{self.backoffs} lần backoff")
+
+
+portal_limiter = PortalRateLimiter()
+
+# Mã HTTP của lần điều hướng gần nhất (Navigation Timing; null nếu trình duyệt không hỗ trợ)
+NAVIGATION_STATUS_JS = """
+var entry = performance.getEntriesByType('navigation')[0];
+return entry && entry.responseStatus ? entry.responseStatus : null;
+"""
+
+
 def read_config(file_path: str) -> Dict[str, str]:
     """
     Read configuration from file.
@@ -73,600 +801,4968 @@ def save_config_to_file(config: Dict[str, str], file_path: str) -> None:
         print(f"Error saving config file: {e}")
 
 
-def setup_edge_driver() -> Optional[webdriver.Edge]:
+def installed_browser_version(registry_path: str, registry_value: str,
+                              binaries: List[str]) -> Optional[str]:
     """
-    Setup and return Edge WebDriver with optimized options.
-    
+    Phiên bản trình duyệt đang cài, đọc nhanh từ registry (Windows) hoặc `--version`.
+
+    Args:
+        registry_path: Registry key under HKCU/HKLM holding the version (Windows)
+        registry_value: Value name inside that key
+        binaries: Candidate executables (absolute paths or names on PATH) elsewhere
+
     Returns:
-        WebDriver instance or None if setup fails
+        Version string such as "131.0.2903.70", or None if it cannot be determined
+    """
+    try:
+        if os.name == "nt":
+            import winreg
+            for hive in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+                try:
+                    with winreg.OpenKey(hive, registry_path) as key:
+                        match = re.search(r'(\d+(?:\.\d+)+)', str(winreg.QueryValueEx(key, registry_value)[0]))
+                        return match.group(1) if match else None
+                except OSError:
+                    continue
+            return None
+        for binary in binaries:
+            binary = binary if os.path.isabs(binary) else (shutil.which(binary) or "")
+            if binary and os.path.exists(binary):
+                output = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=5).stdout
+                match = re.search(r'(\d+(?:\.\d+)+)', output)
+                return match.group(1) if match else None
+    except Exception:
+        pass
+    return None
+
+
+class DriverCache:
+    """
+    Đường dẫn và phiên bản WebDriver đã phân giải, lưu trong ~/.tool_khaosat/.
+
+    Lần đầu selenium-manager tìm/tải driver; các lần sau dùng thẳng đường dẫn đã lưu
+    qua một Service tường minh, nên khởi động không tốn thời gian dò tìm và chạy
+    được khi không có mạng. Chỉ phân giải lại khi phiên bản chính của trình duyệt
+    thay đổi hoặc driver đã lưu không khởi động được.
+    """
+
+    def __init__(self, file_path: str, version_probe: Callable[[], Optional[str]]):
+        self.file_path = file_path
+        self.version_probe = version_probe
+
+    def load(self) -> Optional[Dict[str, str]]:
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def cached_path(self) -> Optional[str]:
+        """
+        Cached driver path, if it still exists and matches the installed browser.
+
+        Returns:
+            Path to the driver binary, or None when the driver must be resolved again
+        """
+        entry = self.load()
+        if not entry or not os.path.isfile(entry.get("driver_path", "")):
+            return None
+        installed = self.version_probe()
+        cached = entry.get("browser_version", "")
+        if installed and installed.split(".")[0] != cached.split(".")[0]:
+            return None
+        return entry["driver_path"]
+
+    def remember(self, driver_path: str, driver_version: str, browser_version: str) -> None:
+        """Store the driver path and versions of a successfully started session."""
+        if not driver_path or not os.path.isfile(driver_path):
+            return
+        try:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            with open(self.file_path, 'w', encoding='utf-8') as f:
+                json.dump({"driver_path": driver_path, "driver_version": driver_version,
+                           "browser_version": browser_version}, f)
+        except OSError as e:
+            print(f"Error saving driver cache: {e}")
+
+    def discard(self) -> None:
+        try:
+            os.remove(self.file_path)
+        except OSError:
+            pass
+
+
+# Ngoài Windows, driver chạy trong process group riêng để khi hủy có thể dừng cả
+# trình duyệt con bằng os.killpg, kể cả khi không cài psutil
+DRIVER_POPEN_KW: Dict = {} if os.name == "nt" else {"start_new_session": True}
+
+
+class BrowserBackend(ABC):
+    """
+    Một loại trình duyệt điều khiển qua WebDriver (Edge, Chrome/Chromium, Firefox).
+
+    Mỗi backend tự dựng options tương đương nhau và khởi động driver qua DriverCache;
+    phần còn lại của tool chỉ làm việc với WebDriver chung nên không cần biết backend.
     """
-    options = EdgeOptions()
+
+    name = ""
+    display_name = ""
+    registry_path = ""
+    registry_value = "version"
+    binaries: List[str] = []
+
+    def __init__(self):
+        self.driver_cache = DriverCache(os.path.join(CONFIG_DIR, f"driver_cache_{self.name}.json"),
+                                        self.installed_version)
+
+    def installed_version(self) -> Optional[str]:
+        return installed_browser_version(self.registry_path, self.registry_value, self.binaries)
+
+    def available(self) -> bool:
+        """Whether the browser seems to be installed on this machine."""
+        return self.installed_version() is not None
+
+    @abstractmethod
+    def build_options(self, headless: bool):
+        """Browser options (headless only for benchmarks and replay)."""
+
+    @abstractmethod
+    def create(self, options, service=None):
+        """Start the WebDriver; without a service, selenium-manager resolves the driver."""
+
+    @abstractmethod
+    def make_service(self, driver_path: Optional[str]):
+        """Service running the given driver binary (None lets selenium-manager resolve it)."""
+
+    def driver_version(self, capabilities: Dict) -> str:
+        return ""
+
+    def start(self, headless: bool = False):
+        """
+        Start a WebDriver session, preferring the cached driver binary.
+
+        Args:
+            headless: Run the browser without a window
+
+        Returns:
+            WebDriver instance (raises if the browser cannot be started)
+        """
+        options = self.build_options(headless)
+        cached_path = self.driver_cache.cached_path()
+        if cached_path:
+            try:
+                return self.create(options, self.make_service(cached_path))
+            except Exception as e:
+                print(f"Cached {self.display_name} driver failed, resolving again: {e}")
+                self.driver_cache.discard()
+        driver = self.create(options, self.make_service(None))
+        capabilities = driver.capabilities or {}
+        self.driver_cache.remember(getattr(driver.service, "path", ""), self.driver_version(capabilities),
+                                   capabilities.get("browserVersion", ""))
+        return driver
+
+
+def add_chromium_arguments(options, headless: bool) -> None:
+    """Fast, low-noise options shared by the Chromium-based backends."""
     options.add_argument("--disable-gpu")
     options.add_argument("--disable-extensions")
     options.add_argument("--log-level=3")
-    options.add_argument("--inprivate")
     options.add_argument("--window-size=1920,1080")
     options.add_argument("--disable-blink-features=AutomationControlled")
+    if os.name != "nt":
+        options.add_argument("--disable-dev-shm-usage")
+    if headless:
+        options.add_argument("--headless=new")
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
-    
-    try:
-        driver = webdriver.Edge(options=options)
-        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-        driver.set_page_load_timeout(180)
-        # Small delay for stabilization - GIẢM DELAY
-        time.sleep(1)  # Giảm từ 2s xuống 1s để tăng tốc khởi tạo
-        return driver
-    except Exception as e:
-        print(f"Error setting up Edge driver: {e}")
-        return None
 
 
-def find_and_select_comprehensive_questions(driver: webdriver.Edge, log_callback) -> bool:
-    """
-    Tìm và chọn tất cả câu hỏi bắt buộc trên trang hiện tại với logic toàn diện.
-    Cải thiện để chọn đáp án tích cực cho việc đánh giá giáo viên.
-    
-    Args:
+class EdgeBackend(BrowserBackend):
+    name = "edge"
+    display_name = "Microsoft Edge"
+    registry_path = r"Software\Microsoft\Edge\BLBeacon"
+    binaries = ["/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge",
+                "microsoft-edge", "microsoft-edge-stable"]
+
+    def available(self) -> bool:
+        # Edge luôn có sẵn trên Windows, kể cả khi không đọc được registry
+        return os.name == "nt" or super().available()
+
+    def build_options(self, headless: bool):
+        options = EdgeOptions()
+        add_chromium_arguments(options, headless)
+        options.add_argument("--inprivate")
+        return options
+
+    def create(self, options, service=None):
+        return webdriver.Edge(options=options, service=service) if service else webdriver.Edge(options=options)
+
+    def make_service(self, driver_path: Optional[str]):
+        return EdgeService(executable_path=driver_path, popen_kw=dict(DRIVER_POPEN_KW))
+
+    def driver_version(self, capabilities: Dict) -> str:
+        return capabilities.get("msedge", {}).get("msedgedriverVersion", "").split(" ")[0]
+
+
+class ChromeBackend(BrowserBackend):
+    name = "chrome"
+    display_name = "Chrome/Chromium"
+    registry_path = r"Software\Google\Chrome\BLBeacon"
+    binaries = ["/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+                "google-chrome", "google-chrome-stable", "chromium", "chromium-browser"]
+
+    def build_options(self, headless: bool):
+        from selenium.webdriver.chrome.options import Options as ChromeOptions
+        options = ChromeOptions()
+        add_chromium_arguments(options, headless)
+        options.add_argument("--incognito")
+        for binary in self.binaries:
+            path = binary if os.path.isabs(binary) else shutil.which(binary)
+            if path and os.path.exists(path) and "chromium" in binary:
+                options.binary_location = path
+                break
+        return options
+
+    def create(self, options, service=None):
+        return webdriver.Chrome(options=options, service=service) if service else webdriver.Chrome(options=options)
+
+    def make_service(self, driver_path: Optional[str]):
+        from selenium.webdriver.chrome.service import Service as ChromeService
+        return ChromeService(executable_path=driver_path, popen_kw=dict(DRIVER_POPEN_KW))
+
+    def driver_version(self, capabilities: Dict) -> str:
+        return capabilities.get("chrome", {}).get("chromedriverVersion", "").split(" ")[0]
+
+
+class FirefoxBackend(BrowserBackend):
+    name = "firefox"
+    display_name = "Firefox"
+    registry_path = r"SOFTWARE\Mozilla\Mozilla Firefox"
+    registry_value = "CurrentVersion"
+    binaries = ["/Applications/Firefox.app/Contents/MacOS/firefox", "firefox"]
+
+    def build_options(self, headless: bool):
+        from selenium.webdriver.firefox.options import Options as FirefoxOptions
+        options = FirefoxOptions()
+        options.add_argument("-private")
+        options.add_argument("--width=1920")
+        options.add_argument("--height=1080")
+        if headless:
+            options.add_argument("-headless")
+        options.set_preference("dom.webdriver.enabled", False)
+        options.set_preference("useAutomationExtension", False)
+        options.set_preference("browser.shell.checkDefaultBrowser", False)
+        options.set_preference("datareporting.policy.dataSubmissionEnabled", False)
+        return options
+
+    def create(self, options, service=None):
+        return webdriver.Firefox(options=options, service=service) if service else webdriver.Firefox(options=options)
+
+    def make_service(self, driver_path: Optional[str]):
+        from selenium.webdriver.firefox.service import Service as FirefoxService
+        return FirefoxService(executable_path=driver_path, popen_kw=dict(DRIVER_POPEN_KW))
+
+    def driver_version(self, capabilities: Dict) -> str:
+        return str(capabilities.get("moz:geckodriverVersion", ""))
+
+
+BROWSER_BACKENDS: Dict[str, BrowserBackend] = {
+    backend.name: backend for backend in (EdgeBackend(), ChromeBackend(), FirefoxBackend())
+}
+BROWSER_BENCH_PATH = os.path.join(CONFIG_DIR, "browser_bench.json")
+
+
+def select_browser_backend(config: Dict[str, str]) -> BrowserBackend:
+    """
+    Backend trình duyệt cho lần chạy này.
+
+    Config key browser: edge/chrome/firefox, or "auto" (default) for the fastest
+    backend measured by --bench-startup, falling back to Edge.
+
+    Args:
+        config: Configuration dictionary
+
+    Returns:
+        The selected BrowserBackend
+    """
+    name = config.get('browser', 'auto').lower()
+    if name in BROWSER_BACKENDS:
+        return BROWSER_BACKENDS[name]
+    try:
+        with open(BROWSER_BENCH_PATH, 'r', encoding='utf-8') as f:
+            fastest = json.load(f).get("fastest")
+        if fastest in BROWSER_BACKENDS:
+            return BROWSER_BACKENDS[fastest]
+    except (OSError, ValueError):
+        pass
+    return BROWSER_BACKENDS["edge"]
+
+
+def setup_driver(backend: BrowserBackend, headless: bool = False,
+                 config: Optional[Dict[str, str]] = None):
+    """
+    Setup and return a WebDriver of the given backend with optimized options.
+    
+    Args:
+        backend: Browser backend to start
+        headless: Run the browser without a window
+        config: Settings; webdriver_pool_size, webdriver_connect_timeout,
+            webdriver_read_timeout and webdriver_keep_alive tune the transport
+    
+    Returns:
+        WebDriver instance or None if setup fails
+    """
+    config = config or {}
+    # Kiểm tra cấu hình trước khi mở trình duyệt để giá trị sai không bỏ lại trình duyệt đang chạy
+    try:
+        transport = {
+            "pool_size": int(config.get('webdriver_pool_size') or 4),
+            "connect_timeout": float(config.get('webdriver_connect_timeout') or 5),
+            "read_timeout": float(config.get('webdriver_read_timeout') or 200),
+            "keep_alive": config.get('webdriver_keep_alive', '1') != '0',
+        }
+        if transport["pool_size"] < 1 or transport["connect_timeout"] <= 0 or transport["read_timeout"] <= 0:
+            raise ValueError("pool size and timeouts must be positive")
+    except ValueError as e:
+        print(f"Invalid webdriver_* setting: {e}")
+        return None
+    
+    driver = None
+    try:
+        driver = backend.start(headless)
+        tune_driver_transport(driver, **transport)
+        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        # Small delay for stabilization - GIẢM DELAY
+        cancel_token.sleep(1)  # Giảm từ 2s xuống 1s để tăng tốc khởi tạo
+        return driver
+    except Exception as e:
+        print(f"Error setting up {backend.display_name} driver: {e}")
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception:
+                abort_driver(driver)
+        return None
+
+
+def tune_driver_transport(driver: webdriver.Edge, pool_size: int = 4, connect_timeout: float = 5.0,
+                          read_timeout: float = 200.0, keep_alive: bool = True) -> bool:
+    """
+    Thay connection pool HTTP giữa selenium và driver (msedgedriver, ...) bằng một pool
+    giữ kết nối với timeout rõ ràng.
+
+    Mỗi lệnh WebDriver là một request HTTP tới driver cục bộ; dùng lại kết nối tránh
+    bắt tay TCP cho từng lệnh, pool nhiều kết nối cho phép lệnh từ thread khác (hủy,
+    theo dõi) không phải mở kết nối mới, và không retry để lỗi hiện ra ngay.
+    Read timeout phải lớn hơn page load timeout (180s).
+
+    Args:
+        driver: WebDriver instance
+        pool_size: Connections kept open to the driver
+        connect_timeout: Seconds to open a connection
+        read_timeout: Seconds to wait for a command's response
+        keep_alive: False opens a new connection per command (baseline for benchmarks)
+
+    Returns:
+        True if the transport was replaced
+    """
+    executor = getattr(driver, "command_executor", None)
+    if executor is None or (keep_alive and not hasattr(executor, "_conn")):
+        return False
+    try:
+        import urllib3
+    except ImportError:
+        return False
+    timeout = urllib3.Timeout(connect=connect_timeout, read=read_timeout)
+    # selenium < 4.26 đọc executor.keep_alive, bản mới hơn đọc ClientConfig
+    client_config = getattr(executor, "_client_config", None)
+    if client_config is not None:
+        try:
+            client_config.keep_alive = keep_alive
+            client_config.timeout = read_timeout
+        except AttributeError:
+            pass
+    executor.keep_alive = keep_alive
+    old_pool = getattr(executor, "_conn", None)
+    if keep_alive:
+        executor._conn = urllib3.PoolManager(num_pools=1, maxsize=pool_size, block=False,
+                                             timeout=timeout, retries=False)
+    if old_pool is not None:
+        old_pool.clear()
+    return True
+
+
+def abort_driver(driver: webdriver.Edge) -> None:
+    """
+    Cắt ngang mọi request WebDriver đang chạy bằng cách dừng hẳn msedgedriver
+    (và trình duyệt con của nó). Dùng khi hủy để không phải đợi page-load timeout.
+
+    Args:
+        driver: WebDriver instance
+    """
+    kill_process_tree(getattr(getattr(driver, "service", None), "process", None))
+
+
+def kill_process_tree(process: Optional[subprocess.Popen]) -> None:
+    """
+    Dừng một driver server cùng mọi tiến trình con (cửa sổ trình duyệt) của nó.
+
+    Args:
+        process: Driver server process (None hoặc đã thoát thì bỏ qua)
+    """
+    if process is None or process.poll() is not None:
+        return
+    kill_pid_tree(process.pid)
+    if os.name != "nt":
+        try:
+            process.kill()
+        except Exception:
+            pass
+
+
+def kill_pid_tree(pid: Optional[int]) -> None:
+    """
+    Dừng một tiến trình theo pid cùng mọi tiến trình con của nó.
+
+    Dùng khi chỉ biết pid, vd. driver của một tiến trình worker đã chết hoặc bị terminate.
+
+    Args:
+        pid: Process id (None thì bỏ qua)
+    """
+    if pid is None:
+        return
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)],
+                           capture_output=True, creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+            return
+        try:
+            import psutil
+            for child in psutil.Process(pid).children(recursive=True):
+                child.kill()
+        except ImportError:
+            # Không có psutil: driver là trưởng process group riêng (DRIVER_POPEN_KW)
+            try:
+                if os.getpgid(pid) == pid:
+                    os.killpg(pid, signal.SIGKILL)
+            except OSError:
+                pass
+        except Exception:
+            pass
+        os.kill(pid, signal.SIGKILL)
+    except Exception:
+        pass
+
+
+# Selector cho các khối câu hỏi của LimeSurvey
+QUESTION_CONTAINER_SELECTOR = ".question-container, div[id^='question']"
+
+# MutationObserver ghi lại các node được thêm mới hoặc vừa hiện ra (relevance của LimeSurvey)
+REVEAL_OBSERVER_JS = """
+if (!window.__uitRevealObserver && document.body) {
+    window.__uitRevealed = [];
+    var observer = new MutationObserver(function(mutations) {
+        for (var i = 0; i < mutations.length; i++) {
+            var m = mutations[i];
+            if (m.type === 'childList') {
+                for (var j = 0; j < m.addedNodes.length; j++) {
+                    if (m.addedNodes[j].nodeType === 1) {
+                        window.__uitRevealed.push(m.addedNodes[j]);
+                    }
+                }
+            } else if (m.target.nodeType === 1) {
+                window.__uitRevealed.push(m.target);
+            }
+        }
+    });
+    observer.observe(document.body, {
+        childList: true, subtree: true,
+        attributes: true, attributeFilter: ['style', 'class', 'hidden']
+    });
+    window.__uitRevealObserver = observer;
+}
+"""
+
+# Đọc lại (và xóa) các khối câu hỏi vừa hiện ra mà vẫn còn phần chưa trả lời
+COLLECT_REVEALED_JS = """
+var nodes = window.__uitRevealed || [];
+window.__uitRevealed = [];
+var selector = arguments[0];
+function visible(el) {
+    return !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+}
+function needsAnswer(c) {
+    var groups = {};
+    var radios = c.querySelectorAll("input[type='radio']");
+    for (var i = 0; i < radios.length; i++) {
+        var r = radios[i];
+        if (r.disabled || !r.name) continue;
+        groups[r.name] = groups[r.name] || r.checked;
+    }
+    for (var name in groups) {
+        if (!groups[name]) return true;
+    }
+    var selects = c.querySelectorAll("select");
+    for (var i = 0; i < selects.length; i++) {
+        if (!selects[i].disabled && selects[i].options.length > 1 && selects[i].selectedIndex <= 0) return true;
+    }
+    var texts = c.querySelectorAll("input[type='text'], textarea");
+    for (var i = 0; i < texts.length; i++) {
+        var t = texts[i];
+        if ((t.required || (t.className || '').indexOf('mandatory') >= 0) && !t.value.trim()) return true;
+    }
+    return false;
+}
+var out = [];
+for (var i = 0; i < nodes.length; i++) {
+    var n = nodes[i];
+    if (!n.isConnected) continue;
+    var c = (n.closest && n.closest(selector)) || n;
+    if (out.indexOf(c) >= 0 || !visible(c) || !needsAnswer(c)) continue;
+    out.push(c);
+}
+return out.filter(function(c) {
+    return !out.some(function(o) { return o !== c && o.contains(c); });
+});
+"""
+
+
+def install_reveal_observer(driver: webdriver.Edge) -> bool:
+    """
+    Cài MutationObserver lên trang hiện tại để theo dõi câu hỏi được hiện ra có điều kiện.
+
+    Args:
+        driver: WebDriver instance
+
+    Returns:
+        True if the observer is installed, False otherwise
+    """
+    try:
+        driver.execute_script(REVEAL_OBSERVER_JS)
+        return True
+    except Exception:
+        return False
+
+
+def collect_revealed_question_nodes(driver: webdriver.Edge) -> List[WebElement]:
+    """
+    Lấy các khối câu hỏi mới được thêm hoặc vừa hiện ra kể từ lần đọc trước.
+
+    Args:
+        driver: WebDriver instance
+
+    Returns:
+        List of question container elements that still need an answer
+    """
+    try:
+        return driver.execute_script(COLLECT_REVEALED_JS, QUESTION_CONTAINER_SELECTOR) or []
+    except Exception:
+        return []
+
+
+# Câu trả lời tích cực điền cho các ô text bắt buộc
+POSITIVE_FEEDBACK = "Rất hài lòng với chất lượng giảng dạy"
+
+# Fingerprint cấu trúc form: mã câu hỏi và giá trị đáp án, không đọc nội dung hiển thị
+FORM_FINGERPRINT_JS = """
+var parts = [];
+var radios = document.querySelectorAll("input[type='radio']");
+for (var i = 0; i < radios.length; i++) {
+    parts.push('r:' + radios[i].name + '=' + radios[i].value);
+}
+var selects = document.querySelectorAll('select');
+for (var i = 0; i < selects.length; i++) {
+    parts.push('s:' + (selects[i].name || selects[i].id || '#' + i) + ':' + selects[i].options.length);
+}
+var texts = document.querySelectorAll("input[type='text'], textarea");
+for (var i = 0; i < texts.length; i++) {
+    parts.push('t:' + (texts[i].name || texts[i].id || '#' + i));
+}
+return parts;
+"""
+
+# Trích xuất mô hình câu hỏi (nội dung câu hỏi, nhãn đáp án) trong một lần gọi
+EXTRACT_QUESTION_MODEL_JS = """
+var roots = (arguments[0] && arguments[0].length) ? arguments[0] : [document];
+function visible(el) {
+    return !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+}
+function text(el) {
+    return el ? (el.innerText || '').trim() : '';
+}
+function up(el, n) {
+    while (el && n-- > 0) el = el.parentElement;
+    return el;
+}
+function collect(selector) {
+    var out = [];
+    for (var i = 0; i < roots.length; i++) {
+        var found = roots[i].querySelectorAll(selector);
+        for (var j = 0; j < found.length; j++) {
+            if (out.indexOf(found[j]) < 0) out.push(found[j]);
+        }
+    }
+    return out;
+}
+function keyOf(el, selector) {
+    return el.name || el.id || '#' + Array.prototype.indexOf.call(document.querySelectorAll(selector), el);
+}
+function labelOf(radio) {
+    var texts = [];
+    var sibling = radio.nextElementSibling;
+    while (sibling && sibling.tagName !== 'LABEL') sibling = sibling.nextElementSibling;
+    if (sibling) texts.push(text(sibling));
+    var parentLabel = radio.parentElement && radio.parentElement.querySelector(':scope > label');
+    if (parentLabel) texts.push(text(parentLabel));
+    var parentText = text(radio.parentElement);
+    if (parentText && texts.indexOf(parentText) < 0) texts.push(parentText);
+    var best = '';
+    for (var i = 0; i < texts.length; i++) {
+        if (texts[i].length > best.length && texts[i].length < 100) best = texts[i];
+    }
+    return best;
+}
+var groups = {}, order = [];
+var radios = collect("input[type='radio']");
+for (var i = 0; i < radios.length; i++) {
+    var r = radios[i];
+    if (!r.name) continue;
+    if (!groups[r.name]) {
+        groups[r.name] = {name: r.name, selected: false, radios: []};
+        order.push(groups[r.name]);
+    }
+    groups[r.name].radios.push(r);
+    if (r.checked) groups[r.name].selected = true;
+}
+var radioGroups = order.map(function(g) {
+    var available = g.radios.filter(function(r) { return !r.disabled && visible(r); });
+    var question = '';
+    if (available.length) {
+        var levels = [3, 2, 1];
+        for (var i = 0; i < levels.length; i++) {
+            var t = text(up(available[0], levels[i]));
+            if (t.length > question.length) question = t;
+            if (t.length > 20) break;
+        }
+    }
+    return {
+        name: g.name,
+        selected: g.selected,
+        question: question,
+        options: available.map(function(r) {
+            return {value: r.value, label: labelOf(r), index: g.radios.indexOf(r)};
+        })
+    };
+});
+var selects = collect('select').map(function(s) {
+    return {
+        key: keyOf(s, 'select'),
+        displayed: visible(s),
+        disabled: s.disabled,
+        optionCount: s.options.length,
+        atDefault: !s.value || (s.options.length > 0 && s.value === s.options[0].value)
+    };
+});
+var texts = collect("input[type='text'], textarea").map(function(t) {
+    return {
+        key: keyOf(t, "input[type='text'], textarea"),
+        mandatory: t.required || (t.className || '').indexOf('mandatory') >= 0,
+        empty: !t.value.trim()
+    };
+});
+return {radios: radioGroups, selects: selects, texts: texts};
+"""
+
+# Thực thi kế hoạch trả lời trên trang trong một lần gọi
+APPLY_PLAN_JS = """
+var actions = arguments[0];
+var applied = [], missing = [];
+function visible(el) {
+    return !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+}
+function fire(el, type) {
+    el.dispatchEvent(new Event(type, {bubbles: true}));
+}
+function byKey(selector, key) {
+    if (key.charAt(0) === '#') return document.querySelectorAll(selector)[parseInt(key.slice(1), 10)] || null;
+    var all = document.querySelectorAll(selector);
+    for (var i = 0; i < all.length; i++) {
+        if (all[i].name === key || all[i].id === key) return all[i];
+    }
+    return null;
+}
+for (var i = 0; i < actions.length; i++) {
+    var a = actions[i];
+    if (a.kind === 'radio') {
+        var radios = Array.prototype.filter.call(document.getElementsByName(a.name),
+            function(r) { return r.type === 'radio'; });
+        if (!radios.length) { missing.push(i); continue; }
+        if (radios.some(function(r) { return r.checked; })) continue;
+        var target = radios.filter(function(r) { return r.value === a.value; })[0] || radios[a.index];
+        if (!target || target.disabled) { missing.push(i); continue; }
+        if (!visible(target)) continue;
+        target.click();
+        applied.push(i);
+    } else if (a.kind === 'select') {
+        var s = byKey('select', a.key);
+        if (!s) { missing.push(i); continue; }
+        if (s.disabled || s.options.length <= 1 || !visible(s)) continue;
+        if (s.value && s.value !== s.options[0].value) continue;
+        s.selectedIndex = Math.min(a.index, s.options.length - 1);
+        fire(s, 'change');
+        applied.push(i);
+    } else if (a.kind === 'text') {
+        var t = byKey("input[type='text'], textarea", a.key);
+        if (!t) { missing.push(i); continue; }
+        if (t.value.trim() || t.disabled || !visible(t)) continue;
+        t.value = a.text;
+        fire(t, 'input');
+        fire(t, 'keyup');
+        fire(t, 'change');
+        applied.push(i);
+    }
+}
+return {applied: applied, missing: missing};
+"""
+
+
+@lru_cache(maxsize=4096)
+def fold_text(text: str) -> str:
+    """
+    Chuẩn hóa văn bản để so khớp: bỏ dấu (NFC/NFD như nhau), đ -> d, nbsp -> khoảng
+    trắng, chữ thường, gộp khoảng trắng và bỏ khoảng trắng trước '%'.
+
+    Nhãn đáp án lặp lại qua mọi câu hỏi và khảo sát nên kết quả được cache.
+    """
+    text = "".join(c for c in unicodedata.normalize("NFD", text) if not unicodedata.combining(c))
+    text = text.replace("đ", "d").replace("Đ", "D").lower()
+    return re.sub(r"\s+%", "%", " ".join(text.split()))
+
+
+# Từ khóa cho câu hỏi "khác" (đã bỏ dấu): từ tích cực, từ nhấn mạnh và phủ định
+POSITIVE_WORDS = re.compile(r"\b(?:tot|hai long|dong y|cao|nhieu|day du|4)\b")
+INTENSIFIER_WORDS = re.compile(r"\b(?:rat|hoan toan)\b")
+NEGATION_WORDS = re.compile(r"\b(?:khong|chua|kem|it|thap)\b")
+
+
+def attendance_lower_bound(label: str) -> float:
+    """
+    Cận dưới (%) của một khoảng thời gian lên lớp trong nhãn đã bỏ dấu.
+
+    "duoi 50%" -> 0, "tu 50% den 80%" -> 50, "> 80%" / "tren 80%" / "tu 80% tro len" -> 80.5,
+    "81% - 100%" -> 81; nhãn không có số -> -1.
+    """
+    numbers = [int(n) for n in re.findall(r"\d+", label)]
+    if not numbers:
+        return -1.0
+    if ("duoi" in label or "<" in label) and not ("tu" in label.split() or "tren" in label or ">" in label):
+        return 0.0
+    lower = float(min(numbers))
+    if ">" in label or "tren" in label or "tro len" in label:
+        lower += 0.5
+    return lower
+
+
+def select_best_answer_for_group(question_text: str, labels: List[str], values: List[str],
+                                 group_identifier: str = "") -> Tuple[int, str]:
+    """
+    Chọn đáp án tốt nhất cho một nhóm radio buttons dựa trên nội dung.
+
+    Hàm thuần (không gọi WebDriver), dùng chung cho planner, replay và benchmark. Văn bản
+    được so khớp sau fold_text nên NFC/NFD, nbsp và nhãn không dấu cho cùng kết quả.
+
+    Args:
+        question_text: Question text
+        labels: Option labels of the available radios
+        values: Value attributes of the available radios
+        group_identifier: Group name used in fallback reasons
+
+    Returns:
+        Tuple of (index of the chosen option, reason)
+    """
+    selected = None
+    reason = ""
+    question = fold_text(question_text)
+    folded = [fold_text(label) for label in labels]
+
+    # 1. Câu hỏi về % chuẩn đầu ra - CHỌN 70-90%
+    if ("chuan dau ra" in question or "dat duoc" in question) and "%" in question:
+        for i, label in enumerate(folded):
+            if "70" in label and "90" in label:
+                selected = i
+                reason = f"Chọn 'Từ 70 đến dưới 90%' cho câu hỏi chuẩn đầu ra"
+                break
+
+        # Fallback: chọn option có 70-90
+        if selected is None:
+            for i, label in enumerate(folded):
+                if "70" in label or "80" in label:
+                    selected = i
+                    reason = f"Chọn option chứa 70-80% cho chuẩn đầu ra"
+                    break
+
+    # 2. Câu hỏi về tỷ lệ thời gian lên lớp - CHỌN >80% (khoảng có cận dưới cao nhất)
+    elif ("thoi gian" in question and ("len lop" in question or "mon hoc" in question)) or \
+            any("%" in label for label in folded):
+        best = -1.0
+        for i, label in enumerate(folded):
+            lower = attendance_lower_bound(label)
+            if lower >= 0 and lower >= best:
+                best = lower
+                selected = i
+                reason = f"Chọn '{labels[i][:20]}' (cao nhất) cho câu hỏi thời gian lên lớp"
+
+    # 3. Câu hỏi đánh giá giáo viên (rating scale 1-4) - CHỌN 4
+    elif ("danh gia" in question or "giang vien" in question or
+          "giao vien" in question or "hoat dong giang day" in question or
+          "phuong phap" in question or "moodle" in question or
+          len([l for l in folded if any(kw in l for kw in ["1", "2", "3", "4"])]) >= 3):
+
+        # Tìm option có value cao nhất (thường là 4)
+        max_value = 0
+        for i, value in enumerate(values):
+            if value and value.isdigit():
+                val = int(value)
+                if val > max_value:
+                    max_value = val
+                    selected = i
+                    reason = f"Chọn option {val} (cao nhất) cho đánh giá giảng viên"
+
+        # Nếu không có value, chọn option cuối cùng (thường là tốt nhất)
+        if selected is None:
+            selected = len(labels) - 1
+            reason = f"Chọn option cuối cùng (tích cực nhất) cho đánh giá"
+
+    # 4. Các câu hỏi khác - chọn option tích cực nhất
+    else:
+        # Điểm tích cực: từ khóa tích cực, cộng thêm khi có "rất"/"hoàn toàn";
+        # nhãn phủ định ("không hài lòng") không bao giờ được chọn vì từ khóa
+        best_score = 0
+        for i, label in enumerate(folded):
+            if NEGATION_WORDS.search(label) or not POSITIVE_WORDS.search(label):
+                continue
+            score = 1 + len(INTENSIFIER_WORDS.findall(label))
+            if score >= best_score:
+                best_score = score
+                selected = i
+                reason = f"Chọn option tích cực: {labels[i][:30]}"
+
+        # Nếu không tìm được từ khóa tích cực, chọn theo value cao nhất
+        if selected is None:
+            max_value = 0
+            for i, value in enumerate(values):
+                if value and value.isdigit():
+                    val = int(value)
+                    if val > max_value:
+                        max_value = val
+                        selected = i
+                        reason = f"Chọn value cao nhất: {val}"
+
+        # Fallback: chọn option cuối cùng
+        if selected is None:
+            selected = len(labels) - 1
+            reason = "Chọn option cuối cùng (fallback)"
+
+    if selected is None:
+        # Fallback cuối cùng - chọn option cuối cùng thay vì đầu tiên
+        return len(labels) - 1, f"⚠ Chọn option cuối cùng (fallback) cho group {group_identifier}"
+    return selected, reason
+
+
+def page_fingerprint(driver: webdriver.Edge) -> Optional[str]:
+    """
+    Tính fingerprint cấu trúc của form trên trang hiện tại.
+
+    Chỉ dựa trên mã câu hỏi (name) và giá trị đáp án, không dựa trên tên môn học,
+    nên mọi khảo sát dùng chung một mẫu form có cùng fingerprint.
+
+    Args:
+        driver: WebDriver instance
+
+    Returns:
+        Hex digest of the form structure, or None if the page has no questions
+    """
+    try:
+        return fingerprint_from_parts(driver.execute_script(FORM_FINGERPRINT_JS) or [])
+    except Exception:
+        return None
+
+
+def fingerprint_from_parts(parts: List[str]) -> Optional[str]:
+    """Hash the structure parts returned by FORM_FINGERPRINT_JS (None if empty)."""
+    if not parts:
+        return None
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def extract_question_model(driver: webdriver.Edge, roots: Optional[List[WebElement]] = None) -> Dict:
+    """
+    Extract the question model of the page (or of the given containers) in one call.
+
+    Args:
+        driver: WebDriver instance
+        roots: Optional question containers to restrict the extraction to
+
+    Returns:
+        Dictionary with "radios", "selects" and "texts" entries
+    """
+    return normalize_question_model(driver.execute_script(EXTRACT_QUESTION_MODEL_JS, roots or []) or {})
+
+
+def normalize_question_model(model: Dict) -> Dict:
+    """Lower-case question texts and option labels the way the classifier expects."""
+    for group in model.get("radios", []):
+        group["question"] = (group.get("question") or "").lower()
+        for option in group.get("options", []):
+            option["label"] = (option.get("label") or "").lower()
+    return model
+
+
+def build_page_plan(model: Dict, events: EventBus) -> List[Dict]:
+    """
+    Planner: phân tích mô hình câu hỏi và lập kế hoạch trả lời cho trang.
+
+    Args:
+        model: Question model returned by extract_question_model
+        events: Event bus receiving log messages and typed events
+
+    Returns:
+        List of answer actions (radio / select / text)
+    """
+    actions = []
+    analysis_wanted = events.wants(GroupAnalyzed)
+
+    for group in model.get("radios", []):
+        name = group.get("name", "")
+        try:
+            options = group.get("options", [])
+            # Bỏ qua nếu đã có selection hoặc không có option khả dụng
+            if group.get("selected") or not options:
+                continue
+
+            question_text = group.get("question", "")
+            labels = [option["label"] for option in options]
+            values = [option.get("value") or "" for option in options]
+
+            if analysis_wanted:
+                events.emit(GroupAnalyzed(name, question_text, labels))
+
+            index, reason = select_best_answer_for_group(question_text, labels, values, f"named-{name}")
+            actions.append({
+                "kind": "radio",
+                "name": name,
+                "value": values[index],
+                "index": options[index].get("index", index),
+                "label": labels[index],
+                "reason": reason,
+            })
+        except Exception as e:
+            events.log(f"Lỗi khi xử lý group named-{name}: {e}")
+
+    for select in model.get("selects", []):
+        if select.get("disabled") or not select.get("displayed"):
+            continue
+        if select.get("optionCount", 0) > 1 and select.get("atDefault"):
+            # Chọn option tích cực nhất (thường là cuối cùng)
+            actions.append({
+                "kind": "select",
+                "key": select["key"],
+                "index": select["optionCount"] - 1,
+                "reason": f"Đã chọn option tích cực nhất cho select dropdown {select['key']}",
+            })
+
+    for text_input in model.get("texts", []):
+        if text_input.get("mandatory") and text_input.get("empty"):
+            actions.append({
+                "kind": "text",
+                "key": text_input["key"],
+                "text": POSITIVE_FEEDBACK,
+                "reason": f"Đã điền feedback tích cực cho input bắt buộc {text_input['key']}",
+            })
+
+    return actions
+
+
+def apply_page_plan(driver: webdriver.Edge, plan: List[Dict], events: EventBus) -> Dict[str, List[int]]:
+    """
+    Executor: áp dụng kế hoạch trả lời lên trang trong một lần gọi WebDriver.
+
+    Args:
+        driver: WebDriver instance
+        plan: List of answer actions
+        events: Event bus receiving log messages and typed events
+
+    Returns:
+        Dictionary with indexes of "applied" and "missing" actions
+    """
+    if not plan:
+        return {"applied": [], "missing": []}
+    result = driver.execute_script(APPLY_PLAN_JS, plan) or {}
+    applied = result.get("applied", [])
+    if events.wants(GroupAnswered):
+        for index in applied:
+            action = plan[index]
+            events.emit(GroupAnswered(action["kind"], action.get("name") or action.get("key", ""), action["reason"]))
+    return {"applied": applied, "missing": result.get("missing", [])}
+
+
+def log_page_plan(plan: List[Dict], events: EventBus) -> None:
+    """Print an answer plan for auditing (dry-run mode)."""
+    for action in plan:
+        if action["kind"] == "radio":
+            target = f"{action['name']} = {action['value']} ({action.get('label', '')[:40]})"
+        elif action["kind"] == "select":
+            target = f"select {action['key']} → option {action['index']}"
+        else:
+            target = f"text {action['key']} ← \"{action['text']}\""
+        events.log(f"[DRY-RUN] {target}: {action['reason']}")
+
+
+class PlanCache:
+    """
+    Cache kế hoạch trả lời theo fingerprint cấu trúc form.
+
+    Mọi khảo sát môn học trong một học kỳ dùng chung mẫu form, nên kế hoạch lập
+    cho khảo sát đầu tiên được dùng lại nguyên vẹn cho các khảo sát sau.
+    """
+
+    VERSION = 1
+
+    def __init__(self, file_path: Optional[str] = None):
+        self.file_path = file_path
+        self.plans: Dict[str, List[Dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint: str) -> Optional[List[Dict]]:
+        with self._lock:
+            return self.plans.get(fingerprint)
+
+    def put(self, fingerprint: str, plan: List[Dict]) -> None:
+        """Store a plan, keeping only the first action for each (kind, name) target."""
+        seen = set()
+        unique = []
+        for action in plan:
+            target = (action.get("kind"), action.get("name", action.get("key")))
+            if target not in seen:
+                seen.add(target)
+                unique.append(action)
+        with self._lock:
+            self.plans[fingerprint] = unique
+
+    def discard(self, fingerprint: str) -> None:
+        with self._lock:
+            self.plans.pop(fingerprint, None)
+
+    def load(self) -> None:
+        """Load cached plans from disk, ignoring files from other versions."""
+        if not self.file_path or not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                with self._lock:
+                    self.plans.update(data.get("plans", {}))
+        except Exception as e:
+            print(f"Error reading plan cache: {e}")
+
+    def save(self) -> None:
+        """Persist cached plans to disk."""
+        if not self.file_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            with self._lock:
+                data = {"version": self.VERSION, "plans": dict(self.plans)}
+            with open(self.file_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"Error saving plan cache: {e}")
+
+
+plan_cache = PlanCache(os.path.join(CONFIG_DIR, "plan_cache.json"))
+
+# Bản sao DOM đã làm sạch: bỏ script/iframe/stylesheet ngoài, xóa token ẩn và action
+# của form; thêm CSS tối thiểu để các câu hỏi bị ẩn vẫn ẩn khi phát lại offline
+SANITIZED_DOM_JS = """
+var root = document.documentElement.cloneNode(true);
+root.querySelectorAll('script, noscript, iframe, link[rel="stylesheet"], link[rel="preload"]').forEach(function (el) {
+    el.remove();
+});
+root.querySelectorAll('input[type="hidden"]').forEach(function (el) { el.setAttribute('value', ''); });
+root.querySelectorAll('form[action]').forEach(function (el) { el.setAttribute('action', '#'); });
+var style = document.createElement('style');
+style.textContent = '.ls-hidden, .ls-irrelevant, .hidden, .d-none { display: none !important; }';
+(root.querySelector('head') || root).appendChild(style);
+return '<!DOCTYPE html>\\n' + root.outerHTML;
+"""
+
+
+# Dữ liệu cá nhân hiển thị trên trang khảo sát: MSSV (8 chữ số), phần sau nhãn họ tên/MSSV
+# và tên trong lời chào. Dùng chung cho Python (HTML, mô hình câu hỏi) và JS (che trước
+# khi chụp màn hình); nhóm 1, nếu có, là phần nhãn được giữ lại.
+PERSONAL_DATA_PATTERNS = (
+    r"\b\d{8}\b",
+    r"((?:Họ\s+(?:và\s+)?tên|Sinh\s+viên|MSSV|Mã\s+số\s+sinh\s+viên)\s*:\s*)[^<>\n,;|]+",
+    r"((?:Xin\s+|Thân\s+)?chào\s+(?:bạn\s+)?)(?!mừng)[^<>\n,.!:;]+",
+)
+REDACTED = "[đã ẩn]"
+
+# Làm mờ các phần tử có dữ liệu cá nhân trước khi chụp màn hình chẩn đoán
+MASK_PERSONAL_JS = """
+var patterns = arguments[0].map(function (p) { return new RegExp(p, 'i'); });
+var terms = arguments[1].map(function (t) { return t.toLowerCase(); });
+var walker = document.createTreeWalker(document.body || document.documentElement, NodeFilter.SHOW_TEXT);
+var masked = 0;
+while (walker.nextNode()) {
+    var text = walker.currentNode.nodeValue, el = walker.currentNode.parentElement;
+    if (!el || el.hasAttribute('data-uit-masked') || !text.trim()) continue;
+    var lower = text.toLowerCase();
+    if (patterns.some(function (r) { return r.test(text); }) ||
+            terms.some(function (t) { return lower.indexOf(t) >= 0; })) {
+        el.setAttribute('data-uit-masked', el.style.filter || '');
+        el.style.filter = 'blur(8px)';
+        masked++;
+    }
+}
+return masked;
+"""
+
+UNMASK_PERSONAL_JS = """
+document.querySelectorAll('[data-uit-masked]').forEach(function (el) {
+    el.style.filter = el.getAttribute('data-uit-masked');
+    el.removeAttribute('data-uit-masked');
+});
+"""
+
+
+def personal_terms(config: Dict[str, str]) -> List[str]:
+    """Known personal strings of the user (email and its local part, usually the MSSV)."""
+    email = config.get('email', '').strip()
+    terms = [email, email.split('@')[0]] if email else []
+    return [term for term in terms if len(term) >= 4]
+
+
+def redact_personal_data(value, terms: List[str] = ()):
+    """
+    Thay dữ liệu cá nhân (terms và PERSONAL_DATA_PATTERNS) trong mọi chuỗi của value.
+
+    Args:
+        value: String, or list/dict of values (e.g. a question model)
+        terms: Known personal strings, matched case-insensitively
+
+    Returns:
+        A redacted copy of value
+    """
+    if isinstance(value, str):
+        for term in terms:
+            value = re.sub(re.escape(term), REDACTED, value, flags=re.IGNORECASE)
+        for pattern in PERSONAL_DATA_PATTERNS:
+            value = re.sub(pattern, lambda m: (m.group(1) if m.re.groups else "") + REDACTED,
+                           value, flags=re.IGNORECASE)
+        return value
+    if isinstance(value, list):
+        return [redact_personal_data(item, terms) for item in value]
+    if isinstance(value, dict):
+        return {key: redact_personal_data(item, terms) for key, item in value.items()}
+    return value
+
+
+class PageRecorder:
+    """
+    Ghi lại từng trang khảo sát (DOM đã làm sạch, mô hình câu hỏi, quyết định trả lời)
+    vào một thư mục để phát lại offline bằng --replay. Họ tên và MSSV được ẩn trước khi ghi.
+    """
+
+    def __init__(self, directory: str, terms: List[str] = ()):
+        self.directory = directory
+        self.terms = list(terms)
+        self.count = 0
+
+    def record(self, survey_index: int, page_number: int, fingerprint: Optional[str],
+               html: str, model: Dict, plan: List[Dict]) -> None:
+        """
+        Save one page as s<survey>-p<page>.html and .json.
+
+        Args:
+            survey_index: 1-based survey number
+            page_number: 1-based page number
+            fingerprint: Form fingerprint of the page
+            html: Sanitized DOM captured before answering
+            model: Question model extracted from the page
+            plan: Answer plan decided for the page
+        """
+        base = os.path.join(self.directory, f"s{survey_index:02d}-p{page_number:02d}")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(base + ".html", 'w', encoding='utf-8') as f:
+                f.write(redact_personal_data(html, self.terms))
+            with open(base + ".json", 'w', encoding='utf-8') as f:
+                json.dump({"fingerprint": fingerprint, "captured_at": time.time(),
+                           "model": redact_personal_data(model, self.terms),
+                           "plan": redact_personal_data(plan, self.terms)}, f, ensure_ascii=False, indent=1)
+            self.count += 1
+        except OSError as e:
+            print(f"Error saving page capture: {e}")
+
+
+# Một lần gọi lấy URL, HTML đã làm sạch và mô hình câu hỏi của trang cho ảnh chụp chẩn đoán
+DIAGNOSTICS_JS = (
+    "var model = null;\n"
+    "try { model = (function () {" + EXTRACT_QUESTION_MODEL_JS + "}).call(null, []); }\n"
+    "catch (e) { model = {error: String(e)}; }\n"
+    "return {url: location.href, title: document.title, model: model,\n"
+    "        html: (function () {" + SANITIZED_DOM_JS + "})()};\n"
+)
+
+
+class DiagnosticsWriter:
+    """
+    Lưu ảnh chụp chẩn đoán khi một khảo sát lỗi (HTML, screenshot, URL, mô hình câu hỏi,
+    lỗi) vào ~/.tool_khaosat/diagnostics/, mỗi lần lỗi một file .zip.
+
+    Worker chỉ tốn một execute_script và một screenshot; việc nén và ghi đĩa do một
+    writer thread làm, nên worker chuyển sang khảo sát tiếp theo ngay. Khi thư mục vượt
+    max_bytes, các ảnh chụp cũ nhất bị xóa.
+
+    Họ tên và MSSV được làm mờ trên trang trước khi chụp màn hình và được thay trong
+    HTML/thông tin trước khi ghi (redact_terms: các chuỗi cá nhân đã biết).
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 50 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.redact_terms: List[str] = []
+        self._queue: "queue.Queue[Optional[Tuple[str, Dict, Optional[bytes]]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, snapshot: Dict, screenshot: Optional[bytes]) -> None:
+        """
+        Queue one snapshot; returns immediately.
+
+        Args:
+            name: File name without extension
+            snapshot: JSON-serialisable data; an "html" entry is stored as page.html
+            screenshot: PNG bytes, if one could be taken
+        """
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, daemon=True)
+                self._writer.start()
+        self._queue.put((name, snapshot, screenshot))
+
+    def capture(self, driver: webdriver.Edge, survey_index: int, link: str, error: str) -> None:
+        """
+        Snapshot the current page of a failed survey and queue it for writing.
+
+        Args:
+            driver: WebDriver instance showing the failed page
+            survey_index: 1-based survey number
+            link: Survey URL
+            error: Error message (and traceback) of the failure
+        """
+        snapshot: Dict = {"survey": survey_index, "link": link, "error": error, "captured_at": time.time()}
+        screenshot = None
+        try:
+            snapshot.update(driver.execute_script(DIAGNOSTICS_JS) or {})
+            driver.execute_script(MASK_PERSONAL_JS, list(PERSONAL_DATA_PATTERNS), self.redact_terms)
+            try:
+                screenshot = driver.get_screenshot_as_png()
+            finally:
+                driver.execute_script(UNMASK_PERSONAL_JS)
+        except Exception as e:
+            snapshot["capture_error"] = str(e)
+        self.submit(time.strftime("%Y%m%d-%H%M%S-") + f"s{survey_index:02d}", snapshot, screenshot)
+
+    async def capture_async(self, session: "AsyncWebDriver", survey_index: int, link: str, error: str) -> None:
+        """Same as capture, for a session of the asyncio client."""
+        snapshot: Dict = {"survey": survey_index, "link": link, "error": error, "captured_at": time.time()}
+        screenshot = None
+        try:
+            snapshot.update(await session.execute_script(DIAGNOSTICS_JS) or {})
+            await session.execute_script(MASK_PERSONAL_JS, list(PERSONAL_DATA_PATTERNS), self.redact_terms)
+            try:
+                screenshot = base64.b64decode(await session.command("GET", "/screenshot"))
+            finally:
+                await session.execute_script(UNMASK_PERSONAL_JS)
+        except Exception as e:
+            snapshot["capture_error"] = str(e)
+        self.submit(time.strftime("%Y%m%d-%H%M%S-") + f"s{survey_index:02d}", snapshot, screenshot)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Write queued snapshots and stop the writer thread."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join(timeout)
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            name, snapshot, screenshot = item
+            snapshot = redact_personal_data(snapshot, self.redact_terms)
+            html = snapshot.pop("html", None)
+            path = os.path.join(self.directory, name + ".zip")
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+                    archive.writestr("info.json", json.dumps(snapshot, ensure_ascii=False, indent=1))
+                    if html:
+                        archive.writestr("page.html", html)
+                    if screenshot:
+                        # PNG đã nén sẵn
+                        archive.writestr("screenshot.png", screenshot, zipfile.ZIP_STORED)
+                self._enforce_cap()
+            except (OSError, TypeError, ValueError) as e:
+                print(f"Error saving diagnostics: {e}")
+
+    def _enforce_cap(self) -> None:
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".zip"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        # Luôn giữ ảnh chụp mới nhất, kể cả khi riêng nó vượt giới hạn
+        for _, size, path in sorted(files)[:-1]:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+
+failure_diagnostics = DiagnosticsWriter(os.path.join(CONFIG_DIR, "diagnostics"))
+
+
+def find_and_select_comprehensive_questions(driver: webdriver.Edge, events: EventBus,
+                                            watch_reveals: bool = True,
+                                            max_reveal_rounds: int = 5,
+                                            budget: Optional[DeadlineBudget] = None,
+                                            dry_run: bool = False,
+                                            survey_index: int = 0,
+                                            page_number: int = 0,
+                                            recorder: Optional[PageRecorder] = None) -> bool:
+    """
+    Tìm và chọn tất cả câu hỏi bắt buộc trên trang hiện tại với logic toàn diện.
+    Cải thiện để chọn đáp án tích cực cho việc đánh giá giáo viên.
+
+    Planner lập kế hoạch trả lời từ mô hình câu hỏi của trang; kế hoạch được cache
+    theo fingerprint cấu trúc form nên các khảo sát cùng mẫu chỉ cần replay.
+
+    Khi watch_reveals bật, một MutationObserver được cài lúc trang tải xong; sau khi
+    trả lời, chỉ các câu hỏi vừa được hiện ra (do điều kiện relevance) mới được
+    phân tích và trả lời tiếp, không cần quét lại cả trang.
+
+    Args:
+        driver: WebDriver instance
+        events: Event bus receiving log messages and typed events
+        watch_reveals: Re-scan only newly revealed questions after answering
+        max_reveal_rounds: Maximum number of incremental re-scan rounds
+        budget: Optional per-survey deadline budget for the page-load wait
+        dry_run: Print the answer plan for auditing without answering the page
+        survey_index: 1-based survey number, reported in PageScanned events
+        page_number: 1-based page number, reported in PageScanned events
+        recorder: Optional recorder capturing the page before it is answered
+
+    Returns:
+        True if all questions were handled, False otherwise
+    """
+    try:
+        # Wait for page to load completely
+        adaptive_wait(driver, EC.presence_of_element_located((By.TAG_NAME, "body")), 15, budget, kind="body")
+
+        # Theo dõi các câu hỏi hiện ra có điều kiện ngay từ đầu
+        if watch_reveals:
+            watch_reveals = install_reveal_observer(driver)
+
+        # Kiểm tra pause ngay đầu
+        while paused and not cancel_token.cancelled:
+            cancel_token.sleep(0.05)  # Giảm delay pause check
+
+        if cancel_token.cancelled:
+            return False
+
+        plan_start = time.perf_counter()
+        fingerprint = page_fingerprint(driver)
+        plan = plan_cache.get(fingerprint) if fingerprint else None
+        from_cache = plan is not None
+
+        model = extract_question_model(driver) if (recorder or not from_cache) else None
+        if not from_cache:
+            plan = build_page_plan(model, events)
+        planning_seconds = time.perf_counter() - plan_start
+        events.emit(PageScanned(survey_index, page_number, fingerprint or "", from_cache,
+                                len(plan), planning_seconds * 1000))
+        if events.wants(Timing):
+            events.emit(Timing("plan", planning_seconds))
+
+        if recorder:
+            recorder.record(survey_index, page_number, fingerprint,
+                            driver.execute_script(SANITIZED_DOM_JS) or "", model,
+                            plan if not from_cache else build_page_plan(model, EventBus()))
+
+        if dry_run:
+            # Chạy thử chỉ lập kế hoạch, không chọn đáp án nào trên trang
+            log_page_plan(plan, events)
+            return True
+
+        apply_start = time.perf_counter()
+        result = apply_page_plan(driver, plan, events)
+        if events.wants(Timing):
+            events.emit(Timing("apply", time.perf_counter() - apply_start))
+        if from_cache and result["missing"]:
+            # Kế hoạch đã lưu không khớp với trang, phân tích lại từ đầu
+            events.log("[WARNING] Kế hoạch đã lưu không khớp với trang, đang phân tích lại...")
+            plan_cache.discard(fingerprint)
+            from_cache = False
+            plan = build_page_plan(extract_question_model(driver), events)
+            result = apply_page_plan(driver, plan, events)
+
+        total_questions_handled = len(result["applied"])
+
+        # Xử lý phần thay đổi: chỉ các câu hỏi vừa được hiện ra sau khi trả lời
+        revealed_plan = []
+        reveal_round = 0
+        while watch_reveals and reveal_round < max_reveal_rounds and not cancel_token.cancelled:
+            # Cho relevance của LimeSurvey cập nhật DOM xong
+            cancel_token.sleep(0.1)
+            revealed_nodes = collect_revealed_question_nodes(driver)
+            if not revealed_nodes:
+                break
+
+            reveal_round += 1
+            if events.wants(LogMessage):
+                events.log(f"Phát hiện {len(revealed_nodes)} câu hỏi mới hiện ra (lượt {reveal_round}), chỉ xử lý phần thay đổi...")
+
+            try:
+                delta_plan = build_page_plan(extract_question_model(driver, revealed_nodes), events)
+                total_questions_handled += len(apply_page_plan(driver, delta_plan, events)["applied"])
+                revealed_plan.extend(delta_plan)
+            except Exception as e:
+                events.log(f"Lỗi khi xử lý câu hỏi mới hiện ra: {e}")
+                break
+
+        # Lưu kế hoạch (kể cả phần hiện ra có điều kiện) cho các khảo sát cùng mẫu
+        if fingerprint and (not from_cache or revealed_plan):
+            plan_cache.put(fingerprint, plan + revealed_plan)
+
+        if events.wants(LogMessage):
+            events.log(f"✅ Đã xử lý tổng cộng {total_questions_handled} câu hỏi/thành phần với logic đánh giá tích cực.")
+        return True
+
+    except Exception as e:
+        if not cancel_token.cancelled:
+            events.log(f"Lỗi trong find_and_select_comprehensive_questions: {e}")
+        return False
+
+
+# Bảng danh sách khảo sát trên trang phieukhaosat
+SURVEY_TABLE_XPATH = "//*[@id='block-system-main']/div/table/tbody"
+
+# Thu thập tín hiệu trạng thái đăng nhập trong một lần gọi
+LOGIN_STATE_JS = """
+var table = document.evaluate(arguments[0], document, null,
+    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+var error = document.querySelector('.messages.error, .alert-danger');
+return {
+    url: location.href,
+    ready: document.readyState === 'complete',
+    table: !!table,
+    loginForm: document.getElementsByName('name').length > 0 && document.getElementsByName('pass').length > 0,
+    error: error ? error.innerText.trim().slice(0, 200) : ''
+};
+"""
+
+
+def has_session_cookie(driver: webdriver.Edge) -> bool:
+    """Check whether the browser holds a Drupal session cookie for the portal."""
+    try:
+        return any(c.get('name', '').startswith(('SESS', 'SSESS')) for c in driver.get_cookies())
+    except Exception:
+        return False
+
+
+def wait_for_login_completion(driver: webdriver.Edge, survey_url: str, events: EventBus,
+                              timeout: float = 600.0, poll_interval: float = 0.25) -> bool:
+    """
+    Tự động phát hiện khi người dùng hoàn tất đăng nhập (kể cả CAPTCHA).
+
+    Theo dõi URL, cookie phiên và DOM; trả quyền điều khiển ngay khi bảng danh
+    sách khảo sát xuất hiện. Nếu portal chuyển sang trang khác sau khi đăng nhập,
+    tự mở lại trang danh sách khảo sát.
+
+    Args:
+        driver: WebDriver instance
+        survey_url: URL of the survey list page
+        events: Event bus receiving log messages, status and typed events
+        timeout: Maximum time to wait for the user in seconds
+        poll_interval: Delay between two state checks in seconds
+
+    Returns:
+        True once the survey table is available, False on timeout or stop
+    """
+    survey_path = urlparse(survey_url).path
+    start = time.monotonic()
+    last_cookie_check = 0.0
+    last_navigation = 0.0
+    session_cookie = False
+    reported_error = ""
+
+    while not cancel_token.cancelled:
+        now = time.monotonic()
+        if now - start > timeout:
+            return False
+
+        try:
+            state = driver.execute_script(LOGIN_STATE_JS, SURVEY_TABLE_XPATH) or {}
+        except Exception:
+            # Trang đang chuyển hướng, thử lại ở lượt sau
+            state = {}
+
+        if state.get('table'):
+            return True
+
+        error = state.get('error', '')
+        if error and error != reported_error:
+            events.log(f"[WARNING] Portal báo: {error}")
+            reported_error = error
+
+        if now - last_cookie_check >= 1.0:
+            session_cookie = has_session_cookie(driver)
+            last_cookie_check = now
+
+        # Đã đăng nhập: không còn form đăng nhập và có cookie phiên hoặc đã rời trang đăng nhập
+        on_survey_page = survey_path in state.get('url', '')
+        logged_in = (state.get('ready') and not state.get('loginForm')
+                     and (session_cookie or not on_survey_page))
+        if logged_in and now - last_navigation >= 5.0:
+            events.status("Đã đăng nhập, đang mở danh sách khảo sát...")
+            last_navigation = now
+            try:
+                timed_get(driver, survey_url)
+            except Exception:
+                pass
+            continue
+
+        cancel_token.sleep(poll_interval)
+
+    return False
+
+
+def adaptive_wait(driver: webdriver.Edge, condition, fallback_timeout: float,
+                  budget: Optional[DeadlineBudget] = None,
+                  token: Optional[CancelToken] = None, kind: str = "element"):
+    """
+    Chờ điều kiện với timeout và polling interval lấy từ độ trễ quan sát được của
+    cùng loại chờ; timeout chỉ dài hơn fallback khi portal chậm, không bao giờ ngắn hơn.
+
+    Thay cho WebDriverWait: mỗi lát chờ kiểm tra token hủy nên việc dừng có hiệu
+    lực ngay, không phải đợi hết timeout.
+
+    Args:
+        driver: WebDriver instance
+        condition: Expected condition to wait for
+        fallback_timeout: Minimum timeout (used as is until enough latency samples exist)
+        budget: Optional per-survey deadline budget capping this wait
+        token: Cancellation token (defaults to the global one)
+        kind: Kind of wait, each with its own latency estimator
+
+    Returns:
+        Result of the expected condition
+
+    Raises:
+        TimeoutException: If the condition is not met in time or the budget is spent
+        CancelledError: If the run is cancelled while waiting
+    """
+    token = token or cancel_token
+    estimator = portal_latency.wait(kind)
+    timeout = estimator.timeout(fallback_timeout)
+    if budget is not None:
+        timeout = budget.cap(timeout)
+        if timeout <= 0:
+            raise TimeoutException("Đã hết ngân sách thời gian của khảo sát")
+
+    poll_interval = estimator.poll_interval()
+    start = time.monotonic()
+    deadline = start + timeout
+    while True:
+        token.raise_if_cancelled()
+        try:
+            result = condition(driver)
+            if result:
+                estimator.observe(time.monotonic() - start)
+                portal_latency.element.observe(time.monotonic() - start)
+                return result
+        except (NoSuchElementException, StaleElementReferenceException):
+            pass
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            estimator.observe(time.monotonic() - start, censored=True)
+            portal_latency.element.observe(time.monotonic() - start, censored=True)
+            raise TimeoutException(f"Hết thời gian chờ ({timeout:.1f}s)")
+        token.sleep(min(poll_interval, remaining))
+
+
+def timed_get(driver: webdriver.Edge, url: str, budget: Optional[DeadlineBudget] = None) -> None:
+    """
+    Navigate to a URL through the portal rate limiter and feed the page-load time
+    into the latency estimator. Timeouts and 429/5xx answers are retried after backoff.
+
+    Args:
+        driver: WebDriver instance
+        url: URL to open
+        budget: Optional per-survey deadline budget; every attempt is charged to it
+            and its page-load timeout is capped by the attempt's share
+
+    Raises:
+        TimeoutException: If the last attempt times out or the budget is spent
+    """
+    for attempt in range(portal_limiter.max_retries + 1):
+        page_load_timeout = PAGE_LOAD_TIMEOUT
+        if budget is not None:
+            page_load_timeout = budget.cap(PAGE_LOAD_TIMEOUT)
+            if page_load_timeout <= 0:
+                raise TimeoutException("Đã hết ngân sách thời gian của khảo sát")
+        portal_limiter.acquire()
+        start = time.monotonic()
+        try:
+            if page_load_timeout < PAGE_LOAD_TIMEOUT:
+                driver.set_page_load_timeout(page_load_timeout)
+            try:
+                driver.get(url)
+            finally:
+                if page_load_timeout < PAGE_LOAD_TIMEOUT:
+                    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        except TimeoutException:
+            if attempt == portal_limiter.max_retries or cancel_token.cancelled:
+                raise
+            portal_limiter.report_failure()
+            continue
+        portal_latency.navigation.observe(time.monotonic() - start)
+        if not report_navigation_status(driver) or attempt == portal_limiter.max_retries:
+            return
+
+
+def report_navigation_status(driver: webdriver.Edge) -> bool:
+    """
+    Report the HTTP status of the last navigation to the rate limiter.
+
+    Returns:
+        True if the portal answered 429/5xx (the limiter is now backing off)
+    """
+    try:
+        status = driver.execute_script(NAVIGATION_STATUS_JS)
+    except Exception:
+        status = None
+    if status in PortalRateLimiter.RETRY_STATUS:
+        portal_limiter.report_failure()
+        return True
+    portal_limiter.report_success()
+    return False
+
+
+def await_portal_response(driver: webdriver.Edge, budget: Optional[DeadlineBudget] = None) -> bool:
+    """
+    After a click that sent a form to the portal (next/submit): wait for the page it
+    loaded, report its HTTP status to the rate limiter and, on 429/5xx, wait out the
+    backoff before the caller moves on to the next click.
+
+    Args:
+        driver: WebDriver instance
+        budget: Optional per-survey deadline budget for the page-load wait
+
+    Returns:
+        True if the portal answered 429/5xx
+    """
+    try:
+        adaptive_wait(driver, lambda d: d.execute_script("return document.readyState") == "complete",
+                      10, budget, kind="navigation")
+    except TimeoutException:
+        pass
+    if not report_navigation_status(driver):
+        return False
+    portal_limiter.wait_backoff()
+    return True
+
+
+def wait_for_element_and_click(driver: webdriver.Edge, locator: tuple, timeout: int = 10,
+                               budget: Optional[DeadlineBudget] = None,
+                               rate_limited: bool = False) -> bool:
+    """
+    Wait for an element to be clickable and click it.
+    
+    Args:
+        driver: WebDriver instance
+        locator: Tuple of (By.TYPE, value)
+        timeout: Fallback time to wait in seconds (before latency is known)
+        budget: Optional per-survey deadline budget
+        rate_limited: The click sends a request to the portal (next/submit); take a
+            token from the rate limiter first
+        
+    Returns:
+        True if element was clicked successfully, False otherwise
+    """
+    try:
+        element = adaptive_wait(driver, EC.element_to_be_clickable(locator), timeout, budget,
+                                kind=f"click:{locator[1]}")
+        if rate_limited:
+            portal_limiter.acquire()
+        element.click()
+        return True
+    except TimeoutException:
+        return False
+    except Exception:
+        return False
+
+# Trạng thái của khảo sát chưa thực hiện trong bảng danh sách
+PENDING_STATUS = "(Chưa khảo sát)"
+
+
+class SurveyListParser(HTMLParser):
+    """
+    Streaming parser cho bảng danh sách khảo sát trên trang phieukhaosat.
+
+    Tương đương XPath //*[@id='block-system-main']/div/table/tbody/tr với link ở
+    td[2]/strong/a và trạng thái ở td[3]; dừng ngay khi đọc hết tbody.
+    """
+
+    def __init__(self, base_url: str):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.rows: List[Tuple[str, str]] = []
+        self.login_form = False
+        self.done = False
+        self._in_block = False
+        self._in_tbody = False
+        self._cell = 0
+        self._in_cell = False
+        self._in_strong = False
+        self._link = ""
+        self._status: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "input" and attrs.get("name") == "pass":
+            self.login_form = True
+        if self.done:
+            return
+        if attrs.get("id") == "block-system-main":
+            self._in_block = True
+        elif self._in_block and tag == "tbody":
+            self._in_tbody = True
+        elif self._in_tbody and tag == "tr":
+            self._cell = 0
+            self._link = ""
+            self._status = []
+        elif self._in_tbody and tag == "td":
+            self._cell += 1
+            self._in_cell = True
+        elif self._in_cell and tag == "strong":
+            self._in_strong = True
+        elif self._in_strong and tag == "a" and self._cell == 2 and not self._link:
+            self._link = urljoin(self.base_url, attrs.get("href") or "")
+
+    def handle_endtag(self, tag):
+        if not self._in_tbody:
+            return
+        if tag == "strong":
+            self._in_strong = False
+        elif tag == "td":
+            self._in_cell = False
+        elif tag == "tr":
+            if self._link:
+                self.rows.append((self._link, "".join(self._status).strip()))
+        elif tag == "tbody":
+            self._in_tbody = False
+            self._in_block = False
+            self.done = True
+
+    def handle_data(self, data):
+        if self._in_tbody and self._in_cell and self._cell == 3:
+            self._status.append(data)
+
+
+class PortalHttpClient:
+    """
+    Đọc danh sách khảo sát bằng HTTP thuần, dùng lại cookie của trình duyệt.
+
+    Không cần render trang: một request nhỏ qua requests.Session có connection pool.
+    """
+
+    def __init__(self, survey_url: str, pool_size: int = 4, timeout: float = 15.0):
+        self.survey_url = survey_url
+        self.timeout = timeout
+        # True khi lần đọc danh sách gần nhất gặp trang đăng nhập (phiên hết hạn)
+        self.login_required = False
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def sync_cookies(self, driver: webdriver.Edge) -> None:
+        """
+        Copy the browser's cookies and user agent into the HTTP session.
+
+        Args:
+            driver: WebDriver instance holding the logged-in session
+        """
+        self.session.cookies.clear()
+        for cookie in driver.get_cookies():
+            self.session.cookies.set(cookie['name'], cookie['value'],
+                                     domain=cookie.get('domain'), path=cookie.get('path', '/'))
+        try:
+            self.session.headers['User-Agent'] = driver.execute_script("return navigator.userAgent;")
+        except Exception:
+            pass
+
+    def browser_cookies(self) -> List[Dict[str, str]]:
+        """
+        Session cookies of the portal host, in the form WebDriver's add_cookie accepts
+        (the reverse of sync_cookies; the browser must be on the portal origin).
+        """
+        host = urlparse(self.survey_url).hostname or ""
+        cookies = []
+        for cookie in self.session.cookies:
+            domain = (cookie.domain or host).lstrip(".")
+            if host == domain or host.endswith("." + domain):
+                cookies.append({"name": cookie.name, "value": cookie.value, "path": cookie.path or "/"})
+        return cookies
+
+    def save_cookies(self, file_path: str) -> None:
+        """
+        Persist the session cookies and user agent (readable by the owner only).
+
+        Args:
+            file_path: JSON file to write
+        """
+        data = {"user_agent": self.session.headers.get('User-Agent'),
+                "cookies": [{"name": cookie.name, "value": cookie.value, "domain": cookie.domain,
+                             "path": cookie.path} for cookie in self.session.cookies]}
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+        except OSError as e:
+            print(f"Error saving portal cookies: {e}")
+
+    def load_cookies(self, file_path: str) -> bool:
+        """
+        Load cookies saved by save_cookies.
+
+        Args:
+            file_path: JSON file to read
+
+        Returns:
+            True if cookies were loaded
+        """
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.session.cookies.clear()
+        for cookie in data.get("cookies", []):
+            self.session.cookies.set(cookie['name'], cookie['value'],
+                                     domain=cookie.get('domain'), path=cookie.get('path') or '/')
+        if data.get("user_agent"):
+            self.session.headers['User-Agent'] = data["user_agent"]
+        return bool(data.get("cookies"))
+
+    def fetch_survey_list(self) -> Optional[List[Tuple[str, str]]]:
+        """
+        Fetch the survey list page and parse it while streaming.
+
+        The request goes through the portal rate limiter; 429/5xx answers and
+        timeouts are retried after backoff.
+
+        Returns:
+            List of (survey link, status) tuples, or None if the session is not
+            valid or the request failed
+        """
+        self.login_required = False
+        for attempt in range(portal_limiter.max_retries + 1):
+            parser = SurveyListParser(self.survey_url)
+            portal_limiter.acquire()
+            try:
+                with self.session.get(self.survey_url, stream=True, timeout=self.timeout) as response:
+                    if response.status_code in PortalRateLimiter.RETRY_STATUS:
+                        portal_limiter.report_failure()
+                        continue
+                    portal_limiter.report_success()
+                    if response.status_code != 200:
+                        return None
+                    # requests đoán ISO-8859-1 cho text/html không khai báo charset, làm hỏng
+                    # trạng thái tiếng Việt; portal (Drupal) luôn trả UTF-8
+                    if 'charset' not in response.headers.get('Content-Type', '').lower():
+                        response.encoding = 'utf-8'
+                    for chunk in response.iter_content(chunk_size=8192, decode_unicode=True):
+                        parser.feed(chunk)
+                        if parser.done:
+                            break
+                break
+            except (requests.Timeout, requests.ConnectionError):
+                portal_limiter.report_failure()
+            except requests.RequestException:
+                return None
+        else:
+            return None
+
+        if not parser.done:
+            # Không thấy bảng danh sách (thường là trang đăng nhập)
+            self.login_required = parser.login_form
+            return None
+        return parser.rows
+
+    def pending_links(self) -> Optional[List[str]]:
+        """Return links of surveys still marked as not done, or None on failure."""
+        rows = self.fetch_survey_list()
+        if rows is None:
+            return None
+        return [link for link, status in rows if status == PENDING_STATUS]
+
+    def is_completed(self, survey_link: str) -> Optional[bool]:
+        """
+        Check whether a survey is no longer pending on the list page.
+
+        Args:
+            survey_link: Link of the survey as found in the list
+
+        Returns:
+            True if completed, False if still pending, None if it cannot be verified
+            (including when the survey is not in the list)
+        """
+        rows = self.fetch_survey_list()
+        if rows is None:
+            return None
+        for link, status in rows:
+            if link == survey_link:
+                return status != PENDING_STATUS
+        return None
+
+    def close(self) -> None:
+        self.session.close()
+
+
+# Đọc phần trăm tiến độ của LimeSurvey (thanh progress) trên trang hiện tại
+PROGRESS_JS = """
+var bar = document.querySelector('.progress-bar, [role="progressbar"]');
+if (!bar) return null;
+var now = parseFloat(bar.getAttribute('aria-valuenow'));
+if (!isNaN(now)) return now;
+var m = ((bar.innerText || '') + ' ' + (bar.style.width || '')).match(/(\\d+(?:\\.\\d+)?)\\s*%/);
+return m ? parseFloat(m[1]) : null;
+"""
+
+
+def read_progress_percent(driver: webdriver.Edge) -> Optional[float]:
+    """Return the survey progress indicator value in percent, if the page shows one."""
+    try:
+        value = driver.execute_script(PROGRESS_JS)
+        return float(value) if value is not None else None
+    except Exception:
+        return None
+
+
+def survey_form_key(survey_link: str) -> str:
+    """
+    Khóa mẫu form của một khảo sát (survey id của LimeSurvey), dùng cho lịch sử.
+
+    Args:
+        survey_link: URL of the survey
+
+    Returns:
+        The LimeSurvey survey id when found, otherwise the URL path
+    """
+    match = re.search(r'(?:sid[=/]|index\.php/)(\d+)', survey_link)
+    if match:
+        return match.group(1)
+    return urlparse(survey_link).path
+
+
+def format_duration(seconds: float) -> str:
+    """Format a duration as m:ss for the status label."""
+    seconds = max(0, int(round(seconds)))
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class SurveyHistory:
+    """Lịch sử số trang và thời gian thực hiện theo mẫu form, lưu giữa các lần chạy."""
+
+    def __init__(self, file_path: Optional[str] = None):
+        self.file_path = file_path
+        self.forms: Dict[str, Dict[str, float]] = {}
+        self.seconds_per_page = 10.0
+
+    def load(self) -> None:
+        if not self.file_path or not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.forms = data.get("forms", {})
+            self.seconds_per_page = data.get("seconds_per_page", self.seconds_per_page)
+        except Exception as e:
+            print(f"Error reading survey history: {e}")
+
+    def save(self) -> None:
+        if not self.file_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            with open(self.file_path, 'w', encoding='utf-8') as f:
+                json.dump({"forms": self.forms, "seconds_per_page": self.seconds_per_page}, f)
+        except Exception as e:
+            print(f"Error saving survey history: {e}")
+
+    def estimate(self, form_key: str) -> Optional[Dict[str, float]]:
+        return self.forms.get(form_key)
+
+    def record(self, form_key: str, pages: int, seconds: float, alpha: float = 0.3) -> None:
+        """Update the running averages of a form with one completed survey."""
+        entry = self.forms.get(form_key)
+        if entry is None:
+            self.forms[form_key] = {"pages": float(pages), "seconds": seconds, "runs": 1}
+        else:
+            entry["pages"] = alpha * pages + (1 - alpha) * entry["pages"]
+            entry["seconds"] = alpha * seconds + (1 - alpha) * entry["seconds"]
+            entry["runs"] = entry.get("runs", 0) + 1
+        if pages > 0:
+            self.seconds_per_page = alpha * (seconds / pages) + (1 - alpha) * self.seconds_per_page
+
+
+survey_history = SurveyHistory(os.path.join(CONFIG_DIR, "survey_history.json"))
+
+
+class SurveyScheduler:
+    """
+    Lập lịch shortest-job-first cho các khảo sát.
+
+    Ước lượng thời lượng mỗi khảo sát từ lịch sử mẫu form (hoặc thanh tiến độ khi
+    đang làm), làm khảo sát ngắn trước để tối đa số khảo sát hoàn thành mỗi phút
+    nếu phiên hết hạn hoặc người dùng dừng giữa chừng, và tính ETA còn lại.
+
+    Mẫu form chưa có lịch sử (lần chạy đầu, khảo sát mới) được làm xen kẽ: mỗi mẫu
+    một khảo sát trước, số trang đo được (thanh tiến độ hoặc số trang thực tế) rồi
+    dùng để xếp các khảo sát còn lại cùng mẫu.
+    """
+
+    def __init__(self, survey_links: List[str], history: SurveyHistory, default_pages: int = 3):
+        self.history = history
+        self.default_pages = default_pages
+        self.pending = list(survey_links)
+        self.total = len(survey_links)
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.run_started = time.monotonic()
+        self.current_link: Optional[str] = None
+        self.current_started = 0.0
+        self.current_pages = 0
+        self.current_estimate = 0.0
+        self.current_page_estimate = 0
+        self.pages_seen = 0
+        self.survey_seconds = 0.0
+        # Số trang đo được trong lượt này cho các mẫu form chưa có lịch sử
+        self.observed_pages: Dict[str, float] = {}
+        # Mẫu form đã có khảo sát được bắt đầu trong lượt này
+        self.sampled_forms: set = set()
+
+    def estimate_pages(self, survey_link: str) -> float:
+        """Estimated number of pages of a survey."""
+        form_key = survey_form_key(survey_link)
+        entry = self.history.estimate(form_key)
+        if entry:
+            return entry["pages"]
+        return self.observed_pages.get(form_key, float(self.default_pages))
+
+    def estimate_seconds(self, survey_link: str) -> float:
+        """Estimated time to complete a survey, in seconds."""
+        entry = self.history.estimate(survey_form_key(survey_link))
+        if entry:
+            return entry["seconds"]
+        return self.estimate_pages(survey_link) * self.history.seconds_per_page
+
+    def is_measured(self, form_key: str) -> bool:
+        """True if the form's size is known from history or from this run."""
+        return self.history.estimate(form_key) is not None or form_key in self.observed_pages
+
+    def _order_keys(self, survey_links: List[str]) -> List[Tuple[bool, float]]:
+        """
+        Sort keys (deferred, estimated seconds) in table order.
+
+        A survey is deferred while another survey of its unmeasured form comes
+        earlier (or already ran), so every unknown form is sampled once first.
+        """
+        sampled = set(self.sampled_forms)
+        keys = []
+        for survey_link in survey_links:
+            form_key = survey_form_key(survey_link)
+            deferred = not self.is_measured(form_key) and form_key in sampled
+            sampled.add(form_key)
+            keys.append((deferred, self.estimate_seconds(survey_link)))
+        return keys
+
+    def ordered(self) -> List[str]:
+        """Pending surveys, unknown forms interleaved, then shortest estimated first."""
+        keys = self._order_keys(self.pending)
+        order = sorted(range(len(self.pending)), key=lambda i: keys[i])
+        return [self.pending[i] for i in order]
+
+    def next(self) -> Optional[str]:
+        """Pop the next pending survey (see ordered) and mark it as in progress."""
+        if not self.pending:
+            return None
+        keys = self._order_keys(self.pending)
+        survey_link = self.pending[min(range(len(self.pending)), key=lambda i: keys[i])]
+        self.pending.remove(survey_link)
+        self.sampled_forms.add(survey_form_key(survey_link))
+        self.started += 1
+        self.current_link = survey_link
+        self.current_started = time.monotonic()
+        self.current_pages = 0
+        self.current_estimate = self.estimate_seconds(survey_link)
+        self.current_page_estimate = round(self.estimate_pages(survey_link))
+        return survey_link
+
+    def on_page(self, page: int, progress: Optional[float]) -> None:
+        """
+        Refine the in-progress survey's estimate from the page reached and its progress bar.
+
+        Args:
+            page: 1-based page number just reached
+            progress: Progress indicator in percent, if shown
+        """
+        self.current_pages = page
+        self.pages_seen += 1
+        pages_estimate = None
+        if progress and progress > 0:
+            pages_estimate = max(page, round(page * 100.0 / progress))
+        elif self.history.estimate(survey_form_key(self.current_link or "")) is None:
+            pages_estimate = max(page, self.default_pages)
+        if pages_estimate is not None:
+            self.current_estimate = pages_estimate * self.history.seconds_per_page
+            self.current_page_estimate = pages_estimate
+            if progress and progress > 0:
+                # Thanh tiến độ cho biết cỡ của cả mẫu form: xếp lại các khảo sát cùng mẫu
+                self.observed_pages[survey_form_key(self.current_link or "")] = float(pages_estimate)
+
+    def finish(self, success: bool) -> None:
+        """Record the outcome of the in-progress survey into the history."""
+        if self.current_link is None:
+            return
+        elapsed = time.monotonic() - self.current_started
+        self.survey_seconds += elapsed
+        if success:
+            self.completed += 1
+            self.history.record(survey_form_key(self.current_link), self.current_pages, elapsed)
+        else:
+            self.failed += 1
+            if self.current_pages:
+                self.observed_pages.setdefault(survey_form_key(self.current_link), float(self.current_pages))
+        self.current_link = None
+
+    def eta_seconds(self) -> float:
+        """Estimated remaining time for the in-progress and pending surveys."""
+        remaining = sum(self.estimate_seconds(link) for link in self.pending)
+        if self.current_link is not None:
+            remaining += max(0.0, self.current_estimate - (time.monotonic() - self.current_started))
+        return remaining
+
+    def pages_remaining(self) -> float:
+        """Estimated pages left in the in-progress and pending surveys."""
+        remaining = sum(self.estimate_pages(link) for link in self.pending)
+        if self.current_link is not None:
+            remaining += max(0, self.current_page_estimate - self.current_pages)
+        return remaining
+
+    def seconds_per_page(self) -> Optional[float]:
+        """Average seconds per page over this run, None before the first page."""
+        if not self.pages_seen:
+            return None
+        seconds = self.survey_seconds
+        if self.current_link is not None:
+            seconds += time.monotonic() - self.current_started
+        return seconds / self.pages_seen
+
+    def surveys_per_minute(self) -> float:
+        elapsed = time.monotonic() - self.run_started
+        return self.completed * 60.0 / elapsed if elapsed > 0 else 0.0
+
+    def status_text(self) -> str:
+        """Status label text with progress and live ETA."""
+        text = f"Đang làm khảo sát {self.started}/{self.total}"
+        if self.current_pages:
+            text += f" (trang {self.current_pages})"
+        return f"{text} · Còn lại ~{format_duration(self.eta_seconds())}"
+
+
+class RunMetrics:
+    """
+    Bộ đếm dùng chung giữa worker và giao diện cho bảng số liệu trực tiếp.
+
+    Worker chỉ gán lại các trường đơn giản (atomic dưới GIL) sau mỗi trang/khảo sát;
+    giao diện đọc chúng trên timer 1 giây sẵn có, không cần signal cho từng chỉ số.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.active = False
+        self.surveys_total = 0
+        self.surveys_done = 0
+        self.surveys_per_minute = 0.0
+        self.seconds_per_page: Optional[float] = None
+        self.pages_remaining = 0.0
+        self.eta_seconds = 0.0
+        self.published_at = time.monotonic()
+        self.browser_pid: Optional[int] = None
+        self.throttled_seconds = 0.0
+        self.rate_limit_backoffs = 0
+
+    def publish(self, scheduler: SurveyScheduler) -> None:
+        """Copy the scheduler's current figures (called from the worker thread)."""
+        self.surveys_total = scheduler.total
+        self.surveys_done = scheduler.completed
+        self.surveys_per_minute = scheduler.surveys_per_minute()
+        self.seconds_per_page = scheduler.seconds_per_page()
+        self.pages_remaining = scheduler.pages_remaining()
+        self.eta_seconds = scheduler.eta_seconds()
+        self.throttled_seconds = portal_limiter.throttled_seconds
+        self.rate_limit_backoffs = portal_limiter.backoffs
+        self.published_at = time.monotonic()
+
+    def eta_now(self) -> float:
+        """Published ETA counted down to now."""
+        return max(0.0, self.eta_seconds - (time.monotonic() - self.published_at))
+
+    def to_dict(self) -> Dict:
+        """Compact snapshot for sending to the GUI process."""
+        return {"active": self.active, "surveys_total": self.surveys_total,
+                "surveys_done": self.surveys_done, "surveys_per_minute": self.surveys_per_minute,
+                "seconds_per_page": self.seconds_per_page, "pages_remaining": self.pages_remaining,
+                "eta_seconds": self.eta_now(), "browser_pid": self.browser_pid,
+                "throttled_seconds": self.throttled_seconds, "rate_limit_backoffs": self.rate_limit_backoffs}
+
+    def update_from(self, snapshot: Dict) -> None:
+        """Apply a snapshot received from the worker process."""
+        for key, value in snapshot.items():
+            setattr(self, key, value)
+        self.published_at = time.monotonic()
+
+
+run_metrics = RunMetrics()
+
+
+def browser_memory_mb(pid: Optional[int]) -> Optional[float]:
+    """
+    Tổng bộ nhớ (RSS) của driver và các tiến trình trình duyệt con, tính bằng MB.
+
+    Dùng psutil khi có; nếu không, đọc /proc (Linux).
+
+    Args:
+        pid: Process id of msedgedriver
+
+    Returns:
+        Memory in MB, or None when unknown (no pid, process gone, or neither psutil nor /proc)
+    """
+    if pid is None:
+        return None
+    try:
+        import psutil
+    except ImportError:
+        return proc_tree_memory_mb(pid)
+    try:
+        root = psutil.Process(pid)
+        total = 0
+        for process in [root] + root.children(recursive=True):
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def proc_tree_memory_mb(pid: int) -> Optional[float]:
+    """
+    Tổng RSS của một tiến trình và mọi tiến trình con, đọc trực tiếp từ /proc.
+
+    Args:
+        pid: Process id of the root of the tree
+
+    Returns:
+        Memory in MB, or None when /proc is unavailable or the process is gone
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as stat_file:
+                stat = stat_file.read()
+            # Tên tiến trình có thể chứa khoảng trắng và ")": ppid là trường thứ hai sau ")" cuối
+            ppid = int(stat.rsplit(b")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/statm") as statm_file:
+                total += int(statm_file.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            if current == pid:
+                return None
+            continue
+        pending.extend(children.get(current, []))
+    return total / (1024 * 1024)
+
+
+class SessionExpiredError(Exception):
+    """Raised when a navigation lands on the portal login form mid-run."""
+
+
+def is_login_page(driver: webdriver.Edge) -> bool:
+    """
+    Check whether the current page is the portal login form.
+
+    Args:
+        driver: WebDriver instance
+
+    Returns:
+        True if both login fields are present, False otherwise
+    """
+    try:
+        return bool(driver.find_elements(By.NAME, "name")) and bool(driver.find_elements(By.NAME, "pass"))
+    except Exception:
+        return False
+
+
+def saved_portal_cookies(config: Dict[str, str], survey_url: str) -> List[Dict[str, str]]:
+    """
+    Cookie phiên đã lưu, chỉ khi worker được khởi động lại sau sự cố (resume_session=1).
+
+    Nạp chúng vào trình duyệt trước khi đăng nhập giúp dùng lại phiên cũ thay vì bắt
+    người dùng đăng nhập (và giải CAPTCHA) lại.
+
+    Returns:
+        Cookies to add to the browser (empty when not resuming or nothing was saved)
+    """
+    if config.get('resume_session') != '1':
+        return []
+    client = PortalHttpClient(survey_url)
+    try:
+        return client.browser_cookies() if client.load_cookies(PORTAL_COOKIES_PATH) else []
+    finally:
+        client.close()
+
+
+def select_run_links(survey_links: List[str], config: Dict[str, str], events: EventBus) -> List[str]:
+    """
+    Chọn các khảo sát lượt chạy này làm (mỗi khóa cấu hình là danh sách link, mỗi dòng một link).
+
+    only_links (khi có, kể cả rỗng): chỉ làm các link này, vd. phần khảo sát mới mà
+    --watch phát hiện. skip_links: bỏ các khảo sát đã gửi trước khi worker khởi động
+    lại, vì danh sách trên portal có thể chưa kịp cập nhật trạng thái của chúng.
+
+    Args:
+        survey_links: Pending links read from the portal
+        config: Configuration dictionary
+        events: Event bus receiving log messages
+
+    Returns:
+        The links this run should process
+    """
+    selected = survey_links
+    if 'only_links' in config:
+        only_links = set(config['only_links'].split())
+        selected = [link for link in selected if link in only_links]
+        if len(selected) < len(survey_links):
+            events.log(f"Chỉ làm {len(selected)}/{len(survey_links)} khảo sát được yêu cầu.")
+    skip_links = set(config.get('skip_links', '').split())
+    if skip_links:
+        remaining = [link for link in selected if link not in skip_links]
+        if len(remaining) < len(selected):
+            events.log(f"Bỏ qua {len(selected) - len(remaining)} khảo sát đã gửi trước khi worker khởi động lại.")
+        selected = remaining
+    return selected
+
+
+def login_to_portal(driver: webdriver.Edge, config: Dict[str, str], survey_url: str,
+                    events: EventBus) -> bool:
+    """
+    Mở trang khảo sát, điền thông tin đăng nhập và chờ người dùng hoàn tất.
+
+    Dùng cho cả lần đăng nhập đầu tiên và khi đăng nhập lại sau khi phiên hết hạn.
+
+    Args:
+        driver: WebDriver instance
+        config: Configuration dictionary containing email and password
+        survey_url: URL of the survey list page
+        events: Event bus receiving log messages, status and typed events
+
+    Returns:
+        True once the survey list is available, False otherwise
+    """
+    # Navigate to survey page
+    events.status("Đang mở trang khảo sát...")
+    events.log("Đang mở trang khảo sát...")
+    timed_get(driver, survey_url)
+    
+    # Fill login information
+    events.status("Đang điền thông tin đăng nhập...")
+    events.log("Đang điền thông tin đăng nhập...")
+    
+    try:
+        adaptive_wait(driver, EC.any_of(
+            EC.presence_of_element_located((By.NAME, "name")),
+            EC.presence_of_element_located((By.XPATH, SURVEY_TABLE_XPATH))
+        ), 30, kind="login_form")
+        
+        if not is_login_page(driver):
+            # Phiên cũ vẫn còn hiệu lực
+            events.log("Phiên đăng nhập vẫn còn hiệu lực.")
+            return True
+        
+        email_field = driver.find_element(By.NAME, "name")
+        password_field = driver.find_element(By.NAME, "pass")
+        
+        email_field.clear()
+        email_field.send_keys(config.get('email', ''))
+        password_field.clear()
+        password_field.send_keys(config.get('password', ''))
+        
+        events.log("Đã điền thông tin đăng nhập.")
+        
+    except TimeoutException:
+        events.log("[ERROR] Không tìm thấy form đăng nhập!")
+        events.status("Lỗi: Không tìm thấy form đăng nhập")
+        return False
+    
+    # Show login banner and detect login completion automatically
+    events.status("Chờ hoàn tất đăng nhập...")
+    events.emit(LoginPrompt(True))
+    logged_in = wait_for_login_completion(driver, survey_url, events)
+    events.emit(LoginPrompt(False))
+    
+    if cancel_token.cancelled:
+        events.status("Đã dừng")
+        return False
+    if not logged_in:
+        events.log("[ERROR] Hết thời gian chờ hoàn tất đăng nhập!")
+        events.status("Lỗi: Chưa hoàn tất đăng nhập")
+        return False
+    
+    events.log("Đã phát hiện đăng nhập thành công.")
+    return True
+
+
+def process_survey(driver: webdriver.Edge, survey_link: str, survey_url: str,
+                   current_survey: int, events: EventBus,
+                   http_client: Optional[PortalHttpClient] = None,
+                   dry_run: bool = False,
+                   page_callback: Optional[Callable[[int, Optional[float]], None]] = None,
+                   recorder: Optional[PageRecorder] = None) -> bool:
+    """
+    Thực hiện và gửi một khảo sát.
+
+    Args:
         driver: WebDriver instance
-        log_callback: Function to log messages
+        survey_link: URL of the survey to complete
+        survey_url: URL of the survey list page to return to
+        current_survey: 1-based index of the survey, for logging
+        events: Event bus receiving log messages, status and typed events
+        http_client: Optional HTTP client used to verify completion without rendering
+        dry_run: Print the first page's answer plan and stop before any navigation
+            (moving to the next page already saves answers in LimeSurvey)
+        page_callback: Optional callback receiving (page number, progress percent)
+        recorder: Optional recorder capturing each page for offline replay
+
+    Returns:
+        True if the survey was submitted, False otherwise
+
+    Raises:
+        SessionExpiredError: If a navigation (opening the survey, next page or submit)
+            landed on the portal login form
+    """
+    # Process survey pages
+    page_count = 0
+    max_pages = 10  # Safety limit to prevent infinite loops
+    
+    # Ngân sách thời gian tổng cho khảo sát, chia cho từng lần chờ: mỗi trang chờ
+    # <body>, nút tiếp theo và trang mới tải, cộng lần mở khảo sát, nút gửi và trang kết quả
+    budget = DeadlineBudget(portal_latency.survey_budget(max_pages), waits=3 * max_pages + 3)
+    
+    # Navigate to survey
+    phase_start = time.perf_counter()
+    timed_get(driver, survey_link, budget)
+    if events.wants(Timing):
+        events.emit(Timing("navigate", time.perf_counter() - phase_start))
+    if is_login_page(driver):
+        raise SessionExpiredError(survey_link)
+    
+    while page_count < max_pages:
+        if cancel_token.cancelled:
+            break
+            
+        # Handle pause state - KIỂM TRA PAUSE NHIỀU LẦN HỖN
+        while paused and not cancel_token.cancelled:
+            cancel_token.sleep(0.05)  # Giảm từ 0.1 xuống 0.05 để responsive hơn
+            # Update status khi đang pause
+            events.status("Đã tạm dừng - Nhấn 'Tiếp tục' để tiếp tục")
+        
+        if cancel_token.cancelled:
+            break
+        
+        page_count += 1
+        if events.wants(LogMessage):
+            events.log(f"Đang xử lý trang {page_count} của khảo sát {current_survey}")
+        if page_callback:
+            page_callback(page_count, read_progress_percent(driver))
+        
+        # KIỂM TRA PAUSE TRƯỚC KHI XỬ LÝ CÂU HỎI
+        while paused and not cancel_token.cancelled:
+            cancel_token.sleep(0.05)  # Giảm delay pause check
+            events.status("Đã tạm dừng - Nhấn 'Tiếp tục' để tiếp tục")
+        
+        if cancel_token.cancelled:
+            break
+        
+        # Handle mandatory questions on current page
+        if not find_and_select_comprehensive_questions(driver, events, budget=budget, dry_run=dry_run,
+                                                       survey_index=current_survey, page_number=page_count,
+                                                       recorder=recorder):
+            events.log(f"[WARNING] Không thể trả lời tất cả câu hỏi bắt buộc ở trang {page_count}")
+        
+        # KIỂM TRA PAUSE TRƯỚC KHI CHUYỂN TRANG
+        while paused and not cancel_token.cancelled:
+            cancel_token.sleep(0.05)  # Giảm delay pause check
+            events.status("Đã tạm dừng - Nhấn 'Tiếp tục' để tiếp tục")
+        
+        if cancel_token.cancelled or dry_run:
+            break
+        
+        # Try to click next button
+        phase_start = time.perf_counter()
+        if wait_for_element_and_click(driver, (By.ID, "movenextbtn"), timeout=5, budget=budget,
+                                      rate_limited=True):
+            if events.wants(LogMessage):
+                events.log(f"Đã chuyển sang trang tiếp theo (trang {page_count + 1})")
+            # Wait for page transition - GIẢM DELAY
+            cancel_token.sleep(0.5)  # Giảm từ 1s xuống 0.5s để tăng tốc
+            if await_portal_response(driver, budget):
+                events.log("[WARNING] Portal báo quá tải khi chuyển trang, đã chờ backoff trước khi tiếp tục.")
+            if is_login_page(driver):
+                raise SessionExpiredError(survey_link)
+            if events.wants(Timing):
+                events.emit(Timing("next_page", time.perf_counter() - phase_start))
+        else:
+            # No more next button, try to submit
+            events.log("Không tìm thấy nút 'Tiếp theo', thử gửi khảo sát...")
+            break
+    
+    if cancel_token.cancelled:
+        return False
+    
+    if dry_run:
+        events.log(f"[DRY-RUN] Dừng ở trang 1 của khảo sát {current_survey}: chuyển trang hoặc gửi "
+                   "sẽ lưu câu trả lời lên LimeSurvey.")
+        return False
+    
+    # Submit the survey
+    phase_start = time.perf_counter()
+    if wait_for_element_and_click(driver, (By.ID, "movesubmitbtn"), timeout=10, budget=budget,
+                                  rate_limited=True):
+        events.log(f"Đã gửi khảo sát {current_survey} thành công!")
+        
+        # Wait for submission to complete - GIẢM DELAY
+        cancel_token.sleep(1)  # Giảm từ 2s xuống 1s để tăng tốc
+        # Không gửi lại form khi portal báo lỗi, chỉ chờ backoff trước request tiếp theo
+        if await_portal_response(driver, budget):
+            events.log("[WARNING] Portal báo quá tải sau khi gửi khảo sát, đã chờ backoff trước khi tiếp tục.")
+        if is_login_page(driver):
+            # Phiên hết hạn đúng lúc gửi: form chưa được nhận, làm lại sau khi đăng nhập lại
+            raise SessionExpiredError(survey_link)
+        if events.wants(Timing):
+            events.emit(Timing("submit", time.perf_counter() - phase_start))
+        
+        # Xác minh qua HTTP, không cần render lại trang danh sách
+        completed = http_client.is_completed(survey_link) if http_client else None
+        if completed is None:
+            # Return to main survey page
+            timed_get(driver, survey_url)
+            events.log(f"Khảo sát {current_survey} hoàn thành, đã quay lại trang chính.")
+        elif completed:
+            events.log(f"Khảo sát {current_survey} hoàn thành (đã xác minh trên danh sách).")
+        else:
+            events.log(f"[WARNING] Khảo sát {current_survey} vẫn ở trạng thái {PENDING_STATUS} sau khi gửi!")
+        if events.wants(LogMessage):
+            events.log(f"Độ trễ portal: {portal_latency.describe()}")
+        return True
+    
+    events.log(f"[ERROR] Không thể gửi khảo sát {current_survey}")
+    return False
+
+
+def save_survey_profile(profiler: cProfile.Profile, survey_index: int) -> str:
+    """
+    Lưu kết quả cProfile của một khảo sát vào ~/.tool_khaosat/profiles/.
+
+    Ghi file .prof (mở bằng snakeviz/pstats) và bản tóm tắt .txt theo cumulative time.
+
+    Args:
+        profiler: Profiler that covered the survey
+        survey_index: Index of the profiled survey in this run
+
+    Returns:
+        Path of the .prof file
+    """
+    profiles_dir = os.path.join(CONFIG_DIR, "profiles")
+    os.makedirs(profiles_dir, exist_ok=True)
+    path = os.path.join(profiles_dir, time.strftime(f"survey{survey_index}-%Y%m%d-%H%M%S.prof"))
+    profiler.dump_stats(path)
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(40)
+    with open(path[:-len(".prof")] + ".txt", 'w', encoding='utf-8') as f:
+        f.write(summary.getvalue())
+    return path
+
+
+W3C_ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+
+# Điền form đăng nhập bằng một lệnh executeScript
+FILL_LOGIN_JS = """
+var fields = [[document.getElementsByName('name')[0], arguments[0]],
+              [document.getElementsByName('pass')[0], arguments[1]]];
+fields.forEach(function (pair) {
+    if (!pair[0]) return;
+    pair[0].value = pair[1];
+    pair[0].dispatchEvent(new Event('input', {bubbles: true}));
+    pair[0].dispatchEvent(new Event('change', {bubbles: true}));
+});
+return fields.every(function (pair) { return !!pair[0]; });
+"""
+
+# Liên kết các khảo sát còn chờ trong bảng danh sách
+PENDING_LINKS_JS = """
+var body = document.evaluate(arguments[0], document, null,
+    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (!body) return null;
+var pendingStatus = arguments[1];
+var links = [];
+body.querySelectorAll('tr').forEach(function (row) {
+    var link = row.querySelector('td:nth-child(2) strong a');
+    var status = row.querySelector('td:nth-child(3)');
+    if (link && status && status.innerText.trim() === pendingStatus) links.push(link.href);
+});
+return links;
+"""
+
+
+class WebDriverError(Exception):
+    """Error response of a WebDriver server (W3C error code and message)."""
+
+    def __init__(self, error: str, message: str = ""):
+        super().__init__(f"{error}: {message}")
+        self.error = error
+
+
+class AsyncHttpPool:
+    """
+    Pool kết nối HTTP/1.1 keep-alive tối giản trên asyncio streams, đủ cho giao thức
+    WebDriver tới driver server cục bộ (JSON, Content-Length hoặc chunked).
+
+    Mỗi request có timeout kết nối và timeout trả lời riêng: một socket treo chỉ làm
+    lỗi lệnh đó (TimeoutError) thay vì chặn session mãi mãi. Timeout trả lời mặc định
+    dài hơn timeout tải trang mà driver tự áp dụng.
+    """
+
+    def __init__(self, host: str, port: int, size: int = 8, connect_timeout: float = 10.0,
+                 read_timeout: float = PAGE_LOAD_TIMEOUT + 30.0):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def request(self, method: str, path: str, body: Optional[Dict] = None) -> Tuple[int, Dict]:
+        """
+        Send one request, reusing an idle connection when possible.
+
+        Returns:
+            (HTTP status, decoded JSON body)
+
+        Raises:
+            TimeoutError: If connecting or waiting for the answer takes too long
+        """
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\nContent-Length: {len(payload)}\r\n"
+                f"Connection: keep-alive\r\n\r\n").encode("latin-1")
+
+        async def exchange(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            writer.write(head + payload)
+            await writer.drain()
+            return await self._read_response(reader)
+
+        async with self._slots:
+            for attempt in range(2):
+                reused = bool(self._idle)
+                if reused:
+                    reader, writer = self._idle.pop()
+                else:
+                    try:
+                        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port),
+                                                                self.connect_timeout)
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(f"Không kết nối được driver server sau {self.connect_timeout:g}s")
+                try:
+                    status, headers, data = await asyncio.wait_for(exchange(reader, writer), self.read_timeout)
+                except asyncio.TimeoutError:
+                    # Kết nối đang dở một response: không dùng lại được
+                    writer.close()
+                    raise TimeoutError(f"Driver server không trả lời {method} {path} sau {self.read_timeout:g}s")
+                except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                    writer.close()
+                    # Kết nối keep-alive có thể đã bị server đóng: thử lại một lần trên kết nối mới
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                if headers.get("connection", "").lower() == "close":
+                    writer.close()
+                else:
+                    self._idle.append((reader, writer))
+                return status, json.loads(data.decode("utf-8")) if data else {}
+        raise ConnectionError("unreachable")
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str], bytes]:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        if "content-length" in headers:
+            return status, headers, await reader.readexactly(int(headers["content-length"]))
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            return status, headers, b"".join(chunks)
+        headers["connection"] = "close"
+        return status, headers, await reader.read()
+
+    def close(self) -> None:
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class AsyncWebDriver:
+    """Một session W3C WebDriver trên AsyncHttpPool, chỉ với các lệnh tool cần dùng."""
+
+    def __init__(self, pool: AsyncHttpPool, session_id: str):
+        self.pool = pool
+        self.session_id = session_id
+
+    @classmethod
+    async def create(cls, pool: AsyncHttpPool, capabilities: Dict) -> "AsyncWebDriver":
+        status, data = await pool.request("POST", "/session", {"capabilities": {"alwaysMatch": capabilities}})
+        value = data.get("value") or {}
+        if status >= 400 or "error" in value:
+            raise WebDriverError(value.get("error", str(status)), value.get("message", ""))
+        return cls(pool, value["sessionId"])
+
+    async def command(self, method: str, path: str, body: Optional[Dict] = None):
+        status, data = await self.pool.request(method, f"/session/{self.session_id}{path}", body)
+        value = data.get("value")
+        if status >= 400 or (isinstance(value, dict) and "error" in value):
+            value = value if isinstance(value, dict) else {}
+            raise WebDriverError(value.get("error", str(status)), value.get("message", ""))
+        return value
+
+    async def get(self, url: str) -> None:
+        await portal_limiter.acquire_async()
+        try:
+            await self.command("POST", "/url", {"url": url})
+        except TimeoutError:
+            portal_limiter.report_failure()
+            raise
+        await self.report_navigation_status()
+
+    async def report_navigation_status(self) -> bool:
+        """Async counterpart of report_navigation_status."""
+        try:
+            status = await self.execute_script(NAVIGATION_STATUS_JS)
+        except WebDriverError:
+            status = None
+        if status in PortalRateLimiter.RETRY_STATUS:
+            portal_limiter.report_failure()
+            return True
+        portal_limiter.report_success()
+        return False
+
+    async def execute_script(self, script: str, *args):
+        return await self.command("POST", "/execute/sync", {"script": script, "args": list(args)})
+
+    async def find_element(self, using: str, value: str) -> Optional[Dict]:
+        try:
+            return await self.command("POST", "/element", {"using": using, "value": value})
+        except WebDriverError as e:
+            if e.error == "no such element":
+                return None
+            raise
+
+    async def click(self, element: Dict) -> None:
+        await self.command("POST", f"/element/{element[W3C_ELEMENT_KEY]}/click", {})
+
+    async def get_cookies(self) -> List[Dict]:
+        return await self.command("GET", "/cookie") or []
+
+    async def add_cookie(self, cookie: Dict) -> None:
+        await self.command("POST", "/cookie", {"cookie": cookie})
+
+    async def quit(self) -> None:
+        try:
+            await self.command("DELETE", "")
+        except Exception:
+            pass
+
+
+def start_driver_server(backend: BrowserBackend) -> Tuple[subprocess.Popen, int]:
+    """
+    Chạy driver server (msedgedriver/chromedriver/geckodriver) trên một cổng trống.
+
+    Lần đầu chưa có cache thì để selenium-manager phân giải driver qua một session
+    selenium ngắn, sau đó luôn dùng đường dẫn đã cache.
+
+    Returns:
+        (driver process, port)
+    """
+    driver_path = backend.driver_cache.cached_path()
+    if driver_path is None:
+        backend.start(headless=True).quit()
+        driver_path = backend.driver_cache.cached_path()
+    if driver_path is None:
+        raise RuntimeError(f"Không tìm thấy WebDriver cho {backend.display_name}")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen([driver_path, f"--port={port}"], stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL,
+                               creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0) if os.name == "nt" else 0,
+                               **DRIVER_POPEN_KW)
+    return process, port
+
+
+async def async_sleep(seconds: float) -> bool:
+    """asyncio sleep that returns early (True) once the run is cancelled."""
+    deadline = time.monotonic() + seconds
+    while not cancel_token.cancelled:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(remaining, 0.1))
+    return True
+
+
+async def async_wait_for(check: Callable, timeout: float, interval: float = 0.25):
+    """Poll an async check until it returns a truthy value, the timeout or cancellation."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not cancel_token.cancelled:
+        result = await check()
+        if result:
+            return result
+        await async_sleep(interval)
+    return None
+
+
+async def async_login(session: AsyncWebDriver, config: Dict[str, str], survey_url: str,
+                      events: EventBus, timeout: float = 600.0) -> bool:
+    """
+    Đăng nhập portal trên một session async và chờ người dùng hoàn tất (CAPTCHA nếu có).
+
+    Returns:
+        True once the survey list is shown
+    """
+    await session.get(survey_url)
+    state = await session.execute_script(LOGIN_STATE_JS, SURVEY_TABLE_XPATH) or {}
+    if state.get("table"):
+        events.log("Phiên đăng nhập vẫn còn hiệu lực.")
+        return True
+    if not state.get("loginForm") or not await session.execute_script(
+            FILL_LOGIN_JS, config.get('email', ''), config.get('password', '')):
+        events.log("[ERROR] Không tìm thấy form đăng nhập!")
+        return False
+
+    events.status("Chờ hoàn tất đăng nhập...")
+    events.emit(LoginPrompt(True))
+    last_redirect = 0.0
+
+    async def logged_in():
+        nonlocal last_redirect
+        login_state = await session.execute_script(LOGIN_STATE_JS, SURVEY_TABLE_XPATH) or {}
+        if login_state.get("table"):
+            return True
+        # Đã đăng nhập nhưng portal chuyển sang trang khác: mở lại danh sách khảo sát
+        if (login_state.get("ready") and not login_state.get("loginForm")
+                and time.monotonic() - last_redirect > 5):
+            last_redirect = time.monotonic()
+            await session.get(survey_url)
+        return False
+
+    try:
+        return bool(await async_wait_for(logged_in, timeout, 0.5))
+    finally:
+        events.emit(LoginPrompt(False))
+
+
+async def async_is_login_page(session: AsyncWebDriver) -> bool:
+    """Async counterpart of is_login_page: True if the session landed on the portal login form."""
+    try:
+        state = await session.execute_script(LOGIN_STATE_JS, SURVEY_TABLE_XPATH) or {}
+    except Exception:
+        return False
+    return bool(state.get("loginForm"))
+
+
+# Đánh dấu trang hiện tại trước khi click; beforeunload cho biết form đã thực sự được gửi
+CLICK_MARK_JS = """
+window.__uitNavigating = true;
+window.__uitUnloading = false;
+window.addEventListener('beforeunload', function () { window.__uitUnloading = true; });
+"""
+
+# 'loaded': trang mới đã tải xong; 'same': vẫn trang cũ và chưa rời đi; 'leaving'/'loading': đang chuyển
+CLICK_STATE_JS = """
+if (window.__uitNavigating) return window.__uitUnloading ? 'leaving' : 'same';
+return document.readyState === 'complete' ? 'loaded' : 'loading';
+"""
+
+
+async def async_click_and_wait(session: AsyncWebDriver, element: Dict, timeout: float = 60.0,
+                               stay_grace: float = 3.0) -> bool:
+    """
+    Click an element and wait until the page it triggers has loaded.
+
+    A click that leaves the page where it is (e.g. LimeSurvey rejects the answers) is
+    not a portal failure: only a navigation that does not finish in time or a 429/5xx
+    answer is reported to the rate limiter.
+
+    Args:
+        session: Async WebDriver session
+        element: Element reference to click
+        timeout: Seconds to wait for the next page
+        stay_grace: Seconds after which a page that has not started unloading counts as not navigating
+
+    Returns:
+        True if a new page loaded without a 429/5xx status
+    """
+    await session.execute_script(CLICK_MARK_JS)
+    await portal_limiter.acquire_async()
+    await session.click(element)
+    clicked = time.monotonic()
+
+    async def settled():
+        state = await session.execute_script(CLICK_STATE_JS)
+        if state == "loaded" or (state == "same" and time.monotonic() - clicked >= stay_grace):
+            return state
+        return None
+
+    state = await async_wait_for(settled, timeout, 0.1)
+    if state is None:
+        if not cancel_token.cancelled:
+            portal_limiter.report_failure()
+        return False
+    if state == "same":
+        return False
+    if await session.report_navigation_status():
+        await portal_limiter.wait_backoff_async()
+        return False
+    return True
+
+
+async def async_answer_page(session: AsyncWebDriver, events: EventBus, survey_index: int,
+                            page_number: int, dry_run: bool, max_rounds: int = 5) -> int:
+    """
+    Lập kế hoạch và trả lời trang hiện tại (phiên bản async của
+    find_and_select_comprehensive_questions, dùng chung planner và plan_cache).
+
+    Sau mỗi lượt áp dụng, mô hình được trích xuất lại: chỉ các câu hỏi vừa hiện ra
+    (chưa trả lời) còn sinh hành động, tương đương vòng lặp reveal của bản đồng bộ.
+
+    Returns:
+        Number of answer actions applied
+    """
+    plan_start = time.perf_counter()
+    fingerprint = fingerprint_from_parts(await session.execute_script(FORM_FINGERPRINT_JS) or [])
+    plan = plan_cache.get(fingerprint) if fingerprint else None
+    from_cache = plan is not None
+    if not from_cache:
+        plan = build_page_plan(normalize_question_model(
+            await session.execute_script(EXTRACT_QUESTION_MODEL_JS, []) or {}), events)
+    events.emit(PageScanned(survey_index, page_number, fingerprint or "", from_cache, len(plan),
+                            (time.perf_counter() - plan_start) * 1000))
+
+    if dry_run:
+        # Chạy thử chỉ lập kế hoạch, không chọn đáp án nào trên trang
+        log_page_plan(plan, events)
+        return 0
+
+    applied = 0
+    full_plan = list(plan)
+    for _ in range(max_rounds):
+        result = await session.execute_script(APPLY_PLAN_JS, plan) if plan else {}
+        applied += len(result.get("applied", []))
+        plan = build_page_plan(normalize_question_model(
+            await session.execute_script(EXTRACT_QUESTION_MODEL_JS, []) or {}), events)
+        if not plan:
+            break
+        from_cache = False
+        full_plan.extend(plan)
+    if fingerprint and not from_cache:
+        plan_cache.put(fingerprint, full_plan)
+    return applied
+
+
+async def async_process_survey(session: AsyncWebDriver, survey_link: str, survey_index: int,
+                               events: EventBus, dry_run: bool = False, max_pages: int = 10) -> Tuple[bool, int]:
+    """
+    Làm một khảo sát trên một session async.
+
+    Returns:
+        (submitted, number of pages)
+
+    Raises:
+        SessionExpiredError: If a navigation lands on the portal login form
+    """
+    await session.get(survey_link)
+    if await async_is_login_page(session):
+        raise SessionExpiredError(survey_link)
+    page_count = 0
+    while page_count < max_pages and not cancel_token.cancelled:
+        while paused and not cancel_token.cancelled:
+            await asyncio.sleep(0.05)
+        page_count += 1
+        await async_answer_page(session, events, survey_index, page_count, dry_run)
+        if dry_run:
+            # Chuyển trang sẽ lưu câu trả lời lên LimeSurvey
+            break
+        next_button = await session.find_element("css selector", "#movenextbtn")
+        if next_button is None:
+            break
+        navigated = await async_click_and_wait(session, next_button)
+        if await async_is_login_page(session):
+            raise SessionExpiredError(survey_link)
+        if not navigated:
+            break
+    if cancel_token.cancelled or dry_run:
+        return False, page_count
+    submit_button = await session.find_element("css selector", "#movesubmitbtn")
+    if submit_button is None:
+        return False, page_count
+    submitted = await async_click_and_wait(session, submit_button)
+    if await async_is_login_page(session):
+        raise SessionExpiredError(survey_link)
+    return submitted, page_count
+
+
+async def async_survey_main(config: Dict[str, str], events: EventBus, session_count: int) -> None:
+    """
+    Phiên bản asyncio của survey_main: nhiều session WebDriver trên một event loop.
+
+    Một driver server phục vụ mọi session qua một pool kết nối keep-alive; session
+    đầu tiên đăng nhập (người dùng xử lý CAPTCHA nếu có), cookie được chép sang các
+    session còn lại, rồi các session lấy khảo sát từ một hàng đợi chung (ngắn trước)
+    nên thời gian chờ mạng của chúng chồng lên nhau.
+
+    Args:
+        config: Configuration dictionary
+        events: Event bus receiving log messages, status and typed events
+        session_count: Number of concurrent browser sessions
+    """
+    survey_url = PORTAL_SURVEY_URL
+    dry_run = config.get('dry_run') == '1'
+    diagnostics = config.get('diagnostics', '1') != '0'
+    backend = select_browser_backend(config)
+    plan_cache.load()
+    survey_history.load()
+    events.emit(RunStarted(dry_run))
+    events.log(f"Chế độ async: {session_count} session {backend.display_name} trên một event loop.")
+
+    driver_start = time.perf_counter()
+    process, port = start_driver_server(backend)
+    # Dừng cả cây tiến trình: chỉ kill driver server sẽ bỏ lại các cửa sổ trình duyệt
+    cancel_token.on_cancel(lambda: kill_process_tree(process))
+    pool = AsyncHttpPool("127.0.0.1", port, size=session_count * 2)
+    sessions: List[AsyncWebDriver] = []
+    outcome, completed, failed = "error", 0, 0
+    try:
+        async def server_ready():
+            try:
+                return (await pool.request("GET", "/status"))[1].get("value", {}).get("ready")
+            except (ConnectionError, OSError):
+                return False
+
+        if not await async_wait_for(server_ready, 15, 0.1):
+            events.log(f"[ERROR] Driver server của {backend.display_name} không phản hồi.")
+            return
+        # Cùng timeout tải trang với bản đồng bộ, ngắn hơn timeout trả lời của pool
+        capabilities = dict(backend.build_options(False).to_capabilities(),
+                            timeouts={"pageLoad": PAGE_LOAD_TIMEOUT * 1000})
+        sessions = list(await asyncio.gather(*(AsyncWebDriver.create(pool, capabilities)
+                                               for _ in range(session_count))))
+        events.emit(DriverStarted(backend.name, time.perf_counter() - driver_start))
+
+        saved_cookies = saved_portal_cookies(config, survey_url)
+        if saved_cookies:
+            await sessions[0].get("{0.scheme}://{0.netloc}/".format(urlparse(survey_url)))
+            for cookie in saved_cookies:
+                await sessions[0].add_cookie(cookie)
+        if not await async_login(sessions[0], config, survey_url, events):
+            outcome = "stopped" if cancel_token.cancelled else "login_failed"
+            return
+        login = {"cookies": await sessions[0].get_cookies(), "generation": 0, "failed": False}
+        login_lock = asyncio.Lock()
+        origin = "{0.scheme}://{0.netloc}/".format(urlparse(survey_url))
+
+        async def share_login(session: AsyncWebDriver) -> None:
+            await session.get(origin)
+            for cookie in login["cookies"]:
+                await session.add_cookie({key: cookie[key] for key in ("name", "value", "path", "secure")
+                                          if key in cookie})
+
+        await asyncio.gather(*(share_login(session) for session in sessions[1:]))
+
+        async def relogin(session: AsyncWebDriver, generation: int) -> bool:
+            # Một session đăng nhập lại; các session khác gặp hết hạn sau đó chỉ chép cookie mới
+            async with login_lock:
+                if login["failed"]:
+                    return False
+                if login["generation"] != generation:
+                    await share_login(session)
+                    return True
+                events.log("[WARNING] Phiên đăng nhập đã hết hạn, đang đăng nhập lại...")
+                events.status("Phiên hết hạn - Đang đăng nhập lại...")
+                if not await async_login(session, config, survey_url, events):
+                    events.log("[ERROR] Không thể đăng nhập lại, dừng hàng đợi khảo sát.")
+                    login["failed"] = True
+                    return False
+                login["cookies"] = await session.get_cookies()
+                login["generation"] += 1
+                return True
+
+        survey_links = select_run_links(
+            await sessions[0].execute_script(PENDING_LINKS_JS, SURVEY_TABLE_XPATH, PENDING_STATUS) or [],
+            config, events)
+        if not survey_links:
+            outcome = "no_surveys"
+            events.log("Không có khảo sát nào cần thực hiện.")
+            events.status("Hoàn thành: Không có khảo sát nào cần làm")
+            return
+        ordered = SurveyScheduler(survey_links, survey_history).ordered()
+        total = len(ordered)
+        events.log(f"Tìm thấy {total} khảo sát chưa thực hiện.")
+        pending: "asyncio.Queue[Tuple[int, str]]" = asyncio.Queue()
+        for index, link in enumerate(ordered, 1):
+            pending.put_nowait((index, link))
+
+        async def worker(session: AsyncWebDriver) -> None:
+            nonlocal completed, failed
+            while not cancel_token.cancelled and not login["failed"] and not pending.empty():
+                index, link = pending.get_nowait()
+                events.emit(SurveyStarted(index, total, link))
+                events.status(f"Đang làm {total - pending.qsize()}/{total} khảo sát "
+                              f"({session_count} session song song)")
+                started = time.monotonic()
+                submitted, pages = False, 0
+                failure = ""
+                generation = login["generation"]
+                try:
+                    try:
+                        submitted, pages = await async_process_survey(session, link, index, events, dry_run)
+                    except SessionExpiredError:
+                        if await relogin(session, generation):
+                            events.log(f"Thử lại khảo sát {index}/{total} sau khi đăng nhập lại...")
+                            submitted, pages = await async_process_survey(session, link, index, events, dry_run)
+                except SessionExpiredError:
+                    events.log(f"[ERROR] Phiên vẫn hết hạn sau khi đăng nhập lại, bỏ qua khảo sát {index}")
+                except Exception as e:
+                    if not cancel_token.cancelled:
+                        events.log(f"[ERROR] Lỗi khi xử lý khảo sát {index}: {e}")
+                        failure = traceback.format_exc()
+                if diagnostics and not submitted and not dry_run and not cancel_token.cancelled:
+                    await failure_diagnostics.capture_async(session, index, link,
+                                                            failure or "Khảo sát không được gửi")
+                seconds = time.monotonic() - started
+                events.emit(SurveyFinished(index, submitted, pages, seconds))
+                if submitted:
+                    completed += 1
+                    survey_history.record(survey_form_key(link), pages, seconds)
+                else:
+                    failed += 1
+
+        await asyncio.gather(*(worker(session) for session in sessions))
+        if cancel_token.cancelled:
+            outcome = "stopped"
+        elif login["failed"]:
+            outcome = "aborted"
+        else:
+            outcome = "completed"
+            events.log("Hoàn thành tất cả khảo sát!")
+            events.status("Hoàn thành tất cả khảo sát!")
+        events.log(f"Giới hạn tốc độ: {portal_limiter.describe()}")
+    except Exception as e:
+        if cancel_token.cancelled:
+            outcome = "stopped"
+            events.status("Đã dừng")
+        else:
+            events.log(f"[ERROR] Lỗi không mong muốn (async): {e}")
+            events.status("Lỗi: Đã xảy ra lỗi không mong muốn")
+    finally:
+        events.emit(RunFinished(outcome, completed, failed))
+        if not cancel_token.cancelled:
+            await asyncio.gather(*(session.quit() for session in sessions), return_exceptions=True)
+        pool.close()
+        kill_process_tree(process)
+        plan_cache.save()
+        survey_history.save()
+        failure_diagnostics.close()
+
+
+def survey_main(config: Dict[str, str], events: EventBus) -> None:
+    """
+    Chạy một lượt khảo sát rồi luôn đóng event bus (flush và join các sink ghi
+    file/lịch sử), kể cả khi lượt chạy dừng sớm vì thiếu thông tin hoặc lỗi trình duyệt.
+
+    Args:
+        config: Configuration dictionary containing email and password
+        events: Event bus receiving log messages, status and typed events
+    """
+    try:
+        run_survey(config, events)
+    finally:
+        events.close()
+
+
+def run_survey(config: Dict[str, str], events: EventBus) -> None:
+    """
+    Main survey automation function with improved reliability and UX.
+    
+    With async_sessions=N (N > 1) in the config, the run is delegated to
+    async_survey_main, which drives N browser sessions on one asyncio loop.
+    
+    Args:
+        config: Configuration dictionary containing email and password
+        events: Event bus receiving log messages, status and typed events
+    """
+    global driver, profile_next_survey
+    
+    load_automation_modules()
+    survey_url = PORTAL_SURVEY_URL
+    email = config.get('email', '')
+    password = config.get('password', '')
+    dry_run = config.get('dry_run') == '1'
+    diagnostics = config.get('diagnostics', '1') != '0'
+    portal_limiter.configure(config)
+    portal_limiter.reset_stats()
+    max_mb = config.get('diagnostics_max_mb', '')
+    if max_mb.isdigit():
+        failure_diagnostics.max_bytes = int(max_mb) * 1024 * 1024
+    failure_diagnostics.redact_terms = personal_terms(config)
+    
+    if not email or not password:
+        events.log("[ERROR] Email hoặc mật khẩu không được để trống!")
+        events.status("Lỗi: Thiếu thông tin đăng nhập")
+        return
+    
+    recorder = None
+    if config.get('capture') == '1':
+        recorder = PageRecorder(os.path.join(CONFIG_DIR, "captures", time.strftime("run-%Y%m%d-%H%M%S")),
+                                personal_terms(config))
+        events.log(f"[INFO] Chế độ ghi trang: lưu vào {recorder.directory}")
+    
+    # Đăng nhập cần người dùng giải CAPTCHA trong cửa sổ trình duyệt, nên lượt chạy thật
+    # không bao giờ headless (headless chỉ dùng cho --bench-startup, --bench-transport, --replay)
+    if config.get('headless') == '1':
+        events.log("[WARNING] Bỏ qua headless=1: cần cửa sổ trình duyệt để đăng nhập.")
+    
+    # Nhiều session song song trên một event loop asyncio
+    async_sessions = config.get('async_sessions', '')
+    if async_sessions.isdigit() and int(async_sessions) > 1:
+        asyncio.run(async_survey_main(config, events, int(async_sessions)))
+        return
+    
+    # Initialize browser
+    backend = select_browser_backend(config)
+    events.status("Đang khởi tạo trình duyệt...")
+    events.log(f"Khởi tạo trình duyệt {backend.display_name}...")
+    
+    driver_start = time.perf_counter()
+    driver = setup_driver(backend, config=config)
+    if not driver:
+        events.log(f"[ERROR] Không thể khởi tạo trình duyệt {backend.display_name}!")
+        events.log(f"Vui lòng kiểm tra lại {backend.display_name} và WebDriver tương ứng")
+        events.status("Lỗi: Không thể khởi tạo trình duyệt")
+        return
+    events.emit(DriverStarted(backend.name, time.perf_counter() - driver_start))
+    
+    # Đếm lệnh WebDriver cho lịch sử chạy
+    webdriver_commands.reset()
+    instrument_driver(driver, webdriver_commands)
+    run_metrics.reset()
+    process = getattr(getattr(driver, "service", None), "process", None)
+    run_metrics.browser_pid = process.pid if process is not None else None
+    
+    # Khi hủy: dừng msedgedriver để cắt ngang request đang chạy
+    current_driver = driver
+    cancel_token.on_cancel(lambda: abort_driver(current_driver))
+    if cancel_token.cancelled:
+        abort_driver(current_driver)
+    
+    plan_cache.load()
+    survey_history.load()
+    if dry_run:
+        events.log("[DRY-RUN] Chế độ chạy thử: chỉ in kế hoạch trả lời trang đầu, "
+                   "không chuyển trang và không gửi khảo sát.")
+    
+    events.emit(RunStarted(dry_run))
+    outcome = "error"
+    scheduler = None
+    http_client = None
+    try:
+        saved_cookies = saved_portal_cookies(config, survey_url)
+        if saved_cookies:
+            try:
+                timed_get(driver, "{0.scheme}://{0.netloc}/".format(urlparse(survey_url)))
+                for cookie in saved_cookies:
+                    driver.add_cookie(cookie)
+                events.log("Dùng lại phiên đăng nhập đã lưu sau khi worker khởi động lại.")
+            except Exception as e:
+                events.log(f"[WARNING] Không khôi phục được phiên đã lưu: {e}")
+        if not login_to_portal(driver, config, survey_url, events):
+            outcome = "stopped" if cancel_token.cancelled else "login_failed"
+            return
+        
+        # After user completes login, continue with survey processing
+        events.status("Đang tìm kiếm khảo sát...")
+        events.log("Đang lấy danh sách khảo sát chưa thực hiện...")
+        
+        # Thử lấy danh sách qua HTTP trước (không render), dùng cookie của trình duyệt
+        http_client = PortalHttpClient(survey_url)
+        cancel_token.on_cancel(http_client.close)
+        http_client.sync_cookies(driver)
+        fetch_start = time.monotonic()
+        survey_links = http_client.pending_links()
+        if survey_links is not None:
+            events.log(f"Đã lấy danh sách khảo sát qua HTTP ({(time.monotonic() - fetch_start) * 1000:.0f} ms).")
+            http_client.save_cookies(PORTAL_COOKIES_PATH)
+        else:
+            events.log("Không lấy được danh sách qua HTTP, chuyển sang đọc từ trình duyệt...")
+            http_client.close()
+            http_client = None
+        
+        # Get survey list with retry mechanism
+        max_retries = 0 if survey_links is not None else 3
+        for attempt in range(max_retries):
+            try:
+                # Wait for the survey table to load
+                adaptive_wait(driver, EC.presence_of_element_located((By.XPATH, SURVEY_TABLE_XPATH)), 20,
+                              kind="survey_table")
+                
+                rows = driver.find_elements(By.XPATH, SURVEY_TABLE_XPATH + "/tr")
+                survey_links = []
+                
+                for row in rows:
+                    try:
+                        survey_link = row.find_element(By.XPATH, "./td[2]/strong/a").get_attribute("href")
+                        status_element = row.find_element(By.XPATH, "./td[3]")
+                        status = status_element.text.strip()
+                        
+                        if status == PENDING_STATUS:
+                            survey_links.append(survey_link)
+                            
+                    except (NoSuchElementException, Exception):
+                        continue
+                        
+                break  # Success, exit retry loop
+                
+            except TimeoutException:
+                if attempt < max_retries - 1:
+                    events.log(f"Thử lại lần {attempt + 2}/{max_retries}...")
+                    cancel_token.sleep(2)
+                else:
+                    events.log("[ERROR] Không thể tải danh sách khảo sát!")
+                    events.status("Lỗi: Không thể tải danh sách khảo sát")
+                    return
+        
+        survey_links = select_run_links(survey_links or [], config, events)
+        if not survey_links:
+            outcome = "no_surveys"
+            events.log("Không có khảo sát nào cần thực hiện.")
+            events.status("Hoàn thành: Không có khảo sát nào cần làm")
+            return
+            
+        events.log(f"Tìm thấy {len(survey_links)} khảo sát chưa thực hiện.")
+        
+        # Sắp xếp khảo sát ngắn trước theo lịch sử mẫu form
+        scheduler = SurveyScheduler(survey_links, survey_history)
+        run_metrics.publish(scheduler)
+        run_metrics.active = True
+        events.log(f"Sắp xếp {scheduler.total} khảo sát theo thời lượng ước tính (ngắn trước), "
+                   f"dự kiến ~{format_duration(scheduler.eta_seconds())}.")
+        
+        def on_page(page: int, progress: Optional[float]) -> None:
+            scheduler.on_page(page, progress)
+            run_metrics.publish(scheduler)
+            events.status(scheduler.status_text())
+        
+        # Process each survey
+        queue_aborted = False
+        while not queue_aborted:
+            if cancel_token.cancelled:
+                events.status("Đã dừng")
+                break
+            
+            survey_link = scheduler.next()
+            if survey_link is None:
+                break
+            run_metrics.publish(scheduler)
+                
+            current_survey = scheduler.started
+            total_surveys = scheduler.total
+            
+            events.status(scheduler.status_text())
+            events.emit(SurveyStarted(current_survey, total_surveys, survey_link))
+            
+            # Profile đúng một khảo sát khi người dùng bật nút Profile
+            profiler = None
+            if profile_next_survey:
+                profile_next_survey = False
+                profiler = cProfile.Profile()
+                profiler.enable()
+            
+            submitted = False
+            failure = ""
+            try:
+                try:
+                    submitted = process_survey(driver, survey_link, survey_url, current_survey,
+                                               events, http_client, dry_run, on_page, recorder)
+                except SessionExpiredError:
+                    # Tạm dừng hàng đợi, đăng nhập lại một lần rồi làm lại khảo sát đang dở
+                    events.log("[WARNING] Phiên đăng nhập đã hết hạn, đang đăng nhập lại...")
+                    events.status("Phiên hết hạn - Đang đăng nhập lại...")
+                    if not login_to_portal(driver, config, survey_url, events):
+                        events.log("[ERROR] Không thể đăng nhập lại, dừng hàng đợi khảo sát.")
+                        queue_aborted = True
+                        continue
+                    if http_client:
+                        http_client.sync_cookies(driver)
+                        http_client.save_cookies(PORTAL_COOKIES_PATH)
+                    
+                    events.status(scheduler.status_text())
+                    events.log(f"Thử lại khảo sát {current_survey}/{total_surveys} sau khi đăng nhập lại...")
+                    submitted = process_survey(driver, survey_link, survey_url, current_survey,
+                                               events, http_client, dry_run, on_page, recorder)
+                    
+            except SessionExpiredError:
+                events.log(f"[ERROR] Phiên vẫn hết hạn sau khi đăng nhập lại, bỏ qua khảo sát {current_survey}")
+            except Exception as e:
+                if not cancel_token.cancelled:
+                    events.log(f"[ERROR] Lỗi khi xử lý khảo sát {current_survey}: {e}")
+                    failure = traceback.format_exc()
+            finally:
+                if diagnostics and not submitted and not dry_run and not cancel_token.cancelled:
+                    failure_diagnostics.capture(driver, current_survey, survey_link,
+                                                failure or "Khảo sát không được gửi")
+                events.emit(SurveyFinished(current_survey, submitted, scheduler.current_pages,
+                                           time.monotonic() - scheduler.current_started))
+                scheduler.finish(submitted)
+                run_metrics.publish(scheduler)
+                survey_history.save()
+                if profiler is not None:
+                    profiler.disable()
+                    try:
+                        events.log(f"[INFO] Đã lưu profile khảo sát {current_survey}: "
+                                   f"{save_survey_profile(profiler, current_survey)}")
+                    except OSError as e:
+                        events.log(f"[WARNING] Không thể lưu profile: {e}")
+        
+        if cancel_token.cancelled:
+            outcome = "stopped"
+        elif queue_aborted:
+            outcome = "aborted"
+        else:
+            outcome = "completed"
+            events.log("Hoàn thành tất cả khảo sát!")
+            events.status("Hoàn thành tất cả khảo sát!")
         
+        metrics = events.find_sink(MetricsSink)
+        if metrics is not None:
+            snapshot = metrics.snapshot()
+            phases = ", ".join(f"{phase} {seconds:.1f}s" for phase, seconds in snapshot["phase_seconds"].items())
+            events.log(f"Tổng kết: {snapshot['counts'].get('PageScanned', 0)} trang, "
+                       f"{snapshot['counts'].get('GroupAnswered', 0)} câu trả lời"
+                       + (f" ({phases})" if phases else ""))
+        slowest_commands = webdriver_commands.latency_summary()
+        if slowest_commands:
+            events.log(f"Lệnh WebDriver tốn thời gian nhất (trung bình/p95): {slowest_commands}")
+        events.log(f"Giới hạn tốc độ: {portal_limiter.describe()}")
+        
+    except Exception as e:
+        if cancel_token.cancelled:
+            outcome = "stopped"
+            events.status("Đã dừng")
+        else:
+            events.log(f"[ERROR] Lỗi không mong muốn: {e}")
+            events.status("Lỗi: Đã xảy ra lỗi không mong muốn")
+        
+    finally:
+        run_metrics.active = False
+        failure_diagnostics.close()
+        events.emit(RunFinished(outcome, scheduler.completed if scheduler else 0,
+                                scheduler.failed if scheduler else 0))
+        plan_cache.save()
+        if http_client:
+            http_client.close()
+        if driver:
+            try:
+                driver.quit()
+                events.log("[INFO] Đã đóng trình duyệt.")
+            except Exception:
+                pass
+
+
+# Số lượt thử tối đa cho một khảo sát mới trước khi --watch thôi mở trình duyệt vì nó
+WATCH_MAX_ATTEMPTS = 3
+
+
+def watch_diff(rows: List[Tuple[str, str]], known: Set[str]) -> List[str]:
+    """
+    So danh sách khảo sát với tập link đã biết của --watch.
+
+    Link không còn "(Chưa khảo sát)" được thêm vào known (đã gửi xong); link còn chờ
+    mà chưa biết là khảo sát mới.
+
+    Args:
+        rows: (link, status) rows read from the portal
+        known: Links already handled; updated in place
+
+    Returns:
+        New pending links, in list order
+    """
+    known.update(link for link, status in rows if status != PENDING_STATUS)
+    return [link for link, status in rows if status == PENDING_STATUS and link not in known]
+
+
+def watch_surveys(config: Dict[str, str], interval: float = 600.0) -> bool:
+    """
+    Chế độ theo dõi: định kỳ đọc danh sách khảo sát bằng một request HTTP với cookie
+    đã lưu, và chỉ mở trình duyệt (survey_main) khi có khảo sát mới chưa thực hiện.
+
+    Khảo sát mới là link "(Chưa khảo sát)" chưa có trong tập link đã biết (lưu ở
+    watch_state.json). Lượt chạy chỉ làm các khảo sát mới đó; một link chỉ được coi là
+    đã biết khi danh sách đọc lại sau lượt chạy xác nhận nó đã gửi, nên khảo sát lỗi
+    được thử lại ở chu kỳ sau (tối đa WATCH_MAX_ATTEMPTS lượt). Lỗi mạng chỉ làm giãn
+    chu kỳ. Khi cookie hết hạn, đăng nhập lại cần người dùng (CAPTCHA): tool mở trình
+    duyệt đúng một lần, và nếu danh sách vẫn không đọc được sau đó thì dừng theo dõi
+    thay vì mở trình duyệt ở mỗi chu kỳ.
+
+    Args:
+        config: Configuration dictionary (as for survey_main)
+        interval: Seconds between polls (±10% jitter)
+
+    Returns:
+        False if watching stopped because the portal session could not be renewed
+    """
+    load_automation_modules()
+    portal_limiter.configure(config)
+    client = PortalHttpClient(PORTAL_SURVEY_URL, pool_size=1)
+    client.load_cookies(PORTAL_COOKIES_PATH)
+    try:
+        with open(WATCH_STATE_PATH, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        known = set(state.get("known", []))
+        attempts: Dict[str, int] = dict(state.get("attempts", {}))
+    except (OSError, ValueError, AttributeError):
+        known, attempts = set(), {}
+    print(f"Theo dõi khảo sát mới mỗi ~{interval / 60:.0f} phút ({len(known)} link đã biết). Ctrl+C để dừng.")
+
+    metrics = start_configured_metrics(config)
+
+    def run_browser(links: List[str]) -> Optional[List[Tuple[str, str]]]:
+        """Run survey_main on the given links only, then reload the saved cookies and return the list read with them."""
+        events = build_event_bus(config, CallbackSink(lambda event: print(event.format()), types=(LogMessage,)))
+        if metrics is not None:
+            events.add_sink(metrics)
+        survey_main(dict(config, only_links="\n".join(links)), events)
+        cancel_token.reset()
+        client.load_cookies(PORTAL_COOKIES_PATH)
+        return client.fetch_survey_list()
+
+    def save_state() -> None:
+        try:
+            os.makedirs(CONFIG_DIR, exist_ok=True)
+            with open(WATCH_STATE_PATH, 'w', encoding='utf-8') as f:
+                json.dump({"known": sorted(known), "attempts": attempts, "updated_at": time.time()}, f)
+        except OSError as e:
+            print(f"Error saving watch state: {e}")
+
+    failures = 0
+    try:
+        while not cancel_token.cancelled:
+            rows = client.fetch_survey_list()
+            if rows is None and client.login_required:
+                print(f"{time.strftime('%H:%M:%S')} Phiên đăng nhập portal đã hết hạn. Mở trình duyệt để "
+                      "đăng nhập lại (cần đăng nhập/giải CAPTCHA trong cửa sổ trình duyệt)...")
+                # Chỉ đăng nhập lại; khảo sát mới (nếu có) được làm ngay sau đó như bình thường
+                rows = run_browser([])
+                if rows is None:
+                    # Chỉ coi là đã đăng nhập lại khi đọc được danh sách bằng cookie mới
+                    print("Không gia hạn được phiên đăng nhập; dừng theo dõi. "
+                          "Chạy lại --watch khi có thể đăng nhập.")
+                    return False
+            new_links: List[str] = []
+            if rows is not None:
+                failures = 0
+                new_links = watch_diff(rows, known)
+            else:
+                failures += 1
+                print(f"{time.strftime('%H:%M:%S')} Không đọc được danh sách khảo sát, thử lại sau.")
+            if new_links:
+                print(f"{time.strftime('%H:%M:%S')} {len(new_links)} khảo sát mới, mở trình duyệt...")
+                rows = run_browser(new_links)
+                if rows is not None:
+                    # Chỉ link mà danh sách xác nhận đã gửi mới thành link đã biết
+                    watch_diff(rows, known)
+                for link in new_links:
+                    if link in known:
+                        attempts.pop(link, None)
+                        continue
+                    attempts[link] = attempts.get(link, 0) + 1
+                    if attempts[link] >= WATCH_MAX_ATTEMPTS:
+                        print(f"[WARNING] Khảo sát {link} vẫn chưa gửi được sau {attempts[link]} lượt, "
+                              "bỏ qua trong chế độ theo dõi.")
+                        known.add(link)
+                        attempts.pop(link)
+                save_state()
+            # Lỗi liên tiếp: giãn chu kỳ (tối đa 16 lần)
+            cancel_token.sleep(interval * min(2 ** failures, 16) * random.uniform(0.9, 1.1))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+    return True
+
+
+class LatencyHistogram:
+    """Histogram độ trễ với bucket cố định; percentile được ước lượng bằng cận trên của bucket."""
+
+    BOUNDS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self):
+        # Một bucket cho mỗi cận, thêm một bucket cuối cho giá trị vượt cận lớn nhất
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        index = 0
+        while index < len(self.BOUNDS) and seconds > self.BOUNDS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def to_list(self) -> List:
+        """[buckets, count, total, max], for sending to another process."""
+        return [list(self.buckets), self.count, self.total, self.max]
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound (seconds) of the bucket holding the given fraction of observations."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.BOUNDS, self.buckets):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative(self) -> List[int]:
+        """Cumulative counts per bound, as in a Prometheus histogram."""
+        counts, seen = [], 0
+        for count in self.buckets[:-1]:
+            seen += count
+            counts.append(seen)
+        return counts
+
+
+class CommandCounter:
+    """Đếm số lệnh WebDriver đã gửi (tổng và theo từng loại lệnh) và độ trễ của từng loại."""
+
+    def __init__(self):
+        self.total = 0
+        self.by_command: Dict[str, int] = {}
+        self.latency: Dict[str, LatencyHistogram] = {}
+        # Không bị reset giữa các lần chạy (cho counter Prometheus)
+        self.lifetime_by_command: Dict[str, int] = {}
+        self.lifetime_latency: Dict[str, LatencyHistogram] = {}
+
+    def add(self, command: str, seconds: Optional[float] = None) -> None:
+        self.total += 1
+        self.by_command[command] = self.by_command.get(command, 0) + 1
+        self.lifetime_by_command[command] = self.lifetime_by_command.get(command, 0) + 1
+        if seconds is not None:
+            self.latency.setdefault(command, LatencyHistogram()).observe(seconds)
+            self.lifetime_latency.setdefault(command, LatencyHistogram()).observe(seconds)
+
+    def reset(self) -> None:
+        self.total = 0
+        self.by_command = {}
+        self.latency = {}
+
+    def lifetime_snapshot(self) -> Dict[str, List]:
+        """Lifetime latency histograms per command, as sent from the worker process."""
+        return {command: histogram.to_list() for command, histogram in list(self.lifetime_latency.items())}
+
+    def merge_lifetime(self, snapshot: Dict[str, List], previous: Dict[str, List]) -> None:
+        """
+        Add what a worker process counted since its previous snapshot to the lifetime counters.
+
+        Args:
+            snapshot: Latest lifetime_snapshot() of the worker
+            previous: The worker's snapshot merged last time ({} for a new worker)
+        """
+        for command, (buckets, count, total, maximum) in snapshot.items():
+            old_buckets, old_count, old_total, _ = previous.get(command, ([0] * len(buckets), 0, 0.0, 0.0))
+            self.lifetime_by_command[command] = self.lifetime_by_command.get(command, 0) + count - old_count
+            histogram = self.lifetime_latency.setdefault(command, LatencyHistogram())
+            histogram.buckets = [a + b - c for a, b, c in zip(histogram.buckets, buckets, old_buckets)]
+            histogram.count += count - old_count
+            histogram.total += total - old_total
+            histogram.max = max(histogram.max, maximum)
+
+    def latency_summary(self, top: int = 5) -> str:
+        """
+        One line describing the commands that took the most time in total.
+
+        Args:
+            top: Number of commands listed
+
+        Returns:
+            "command ×count mean/p95 ms, ..." or "" if nothing was timed
+        """
+        slowest = sorted(self.latency.items(), key=lambda item: item[1].total, reverse=True)[:top]
+        return ", ".join(f"{command} ×{histogram.count} {histogram.mean() * 1000:.0f}"
+                         f"/{histogram.percentile(0.95) * 1000:.0f} ms"
+                         for command, histogram in slowest)
+
+
+webdriver_commands = CommandCounter()
+
+
+def instrument_driver(driver: webdriver.Edge, counter: CommandCounter) -> None:
+    """
+    Count and time every WebDriver command sent by this driver.
+
+    Args:
+        driver: WebDriver instance
+        counter: Counter receiving one entry (with its latency) per command
+    """
+    execute = driver.execute
+
+    def counted_execute(driver_command, params=None):
+        started = time.perf_counter()
+        try:
+            return execute(driver_command, params)
+        finally:
+            counter.add(driver_command, time.perf_counter() - started)
+
+    driver.execute = counted_execute
+
+
+def semester_label(timestamp: float) -> str:
+    """
+    Học kỳ của UIT tương ứng với một thời điểm (HK1: 9-1, HK2: 2-6, HK3/hè: 7-8).
+
+    Args:
+        timestamp: Unix timestamp
+
     Returns:
-        True if all questions were handled, False otherwise
+        Label such as "2025-2026 HK1"
     """
-    global paused, stop_thread
-    
-    try:
-        # Wait for page to load completely
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
-        
-        # Kiểm tra pause ngay đầu
-        while paused and not stop_thread:
-            time.sleep(0.05)  # Giảm delay pause check
-        
-        if stop_thread:
-            return False
-        
-        total_questions_handled = 0
-        
-        # Tìm tất cả radio button groups với nhiều cách khác nhau
-        log_callback("Đang tìm kiếm tất cả radio button groups...")
-        
-        # Method 1: Tìm theo mandatory class
-        mandatory_radio_groups = driver.find_elements(By.CSS_SELECTOR, ".form-radios.mandatory, .list-radio.mandatory")
-        
-        # Method 2: Tìm tất cả radio buttons và nhóm theo name
-        all_radios = driver.find_elements(By.CSS_SELECTOR, "input[type='radio']")
-        radio_groups_by_name = {}
-        
-        for radio in all_radios:
-            name = radio.get_attribute('name')
-            if name:
-                if name not in radio_groups_by_name:
-                    radio_groups_by_name[name] = []
-                radio_groups_by_name[name].append(radio)
-        
-        log_callback(f"Tìm thấy {len(mandatory_radio_groups)} mandatory groups và {len(radio_groups_by_name)} radio groups theo tên.")
-        
-        def select_best_answer_for_group(radios, group_identifier=""):
-            """
-            Chọn đáp án tốt nhất cho một nhóm radio buttons dựa trên nội dung
-            """
+    t = time.localtime(timestamp)
+    if t.tm_mon >= 9:
+        return f"{t.tm_year}-{t.tm_year + 1} HK1"
+    if t.tm_mon == 1:
+        return f"{t.tm_year - 1}-{t.tm_year} HK1"
+    if t.tm_mon <= 6:
+        return f"{t.tm_year - 1}-{t.tm_year} HK2"
+    return f"{t.tm_year - 1}-{t.tm_year} HK3"
+
+
+class RunHistoryStore:
+    """
+    Lịch sử các lần chạy trong SQLite (~/.tool_khaosat/history.db).
+
+    Mọi lệnh ghi được đưa vào hàng đợi và một writer thread ghi theo lô trong
+    một transaction, nên worker không bao giờ chờ I/O của database.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY, started_at REAL, finished_at REAL, semester TEXT, dry_run INTEGER,
+        outcome TEXT, surveys_done INTEGER, surveys_failed INTEGER, webdriver_commands INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS surveys (
+        run_id INTEGER, idx INTEGER, link TEXT, form_key TEXT, started_at REAL,
+        seconds REAL, pages INTEGER, submitted INTEGER, webdriver_commands INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS pages (
+        run_id INTEGER, survey_idx INTEGER, page INTEGER, fingerprint TEXT, from_cache INTEGER,
+        actions INTEGER, planning_ms REAL, seconds REAL
+    );
+    CREATE TABLE IF NOT EXISTS phases (
+        run_id INTEGER, survey_idx INTEGER, phase TEXT, seconds REAL
+    );
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 200, flush_interval: float = 0.5):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[Tuple[str, tuple]]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def execute(self, sql: str, params: tuple = ()) -> None:
+        """Queue one write; returns immediately."""
+        self._queue.put((sql, params))
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush pending writes and stop the writer thread."""
+        self._queue.put(None)
+        self._writer.join(timeout)
+
+    def _write_loop(self) -> None:
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        connection = sqlite3.connect(self.db_path)
+        connection.executescript(self.SCHEMA)
+        running = True
+        while running:
+            batch = []
             try:
-                if not radios:
-                    return False
-                
-                # Bỏ qua nếu đã có selection
-                if any(radio.is_selected() for radio in radios):
-                    return True
-                
-                # Lấy available radios
-                available_radios = [radio for radio in radios if radio.is_enabled() and radio.is_displayed()]
-                if not available_radios:
-                    return False
-                
-                # Tìm text của câu hỏi và tất cả labels để phân tích
-                question_text = ""
-                all_labels = []
-                
+                item = self._queue.get(timeout=self.flush_interval)
+                deadline = time.monotonic() + self.flush_interval
+                while item is not None:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                        break
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if item is None:
+                    running = False
+            except queue.Empty:
+                pass
+            if batch:
                 try:
-                    # Tìm parent element chứa câu hỏi
-                    first_radio = available_radios[0]
-                    
-                    # Thử nhiều cách để tìm câu hỏi
-                    parents_to_try = [
-                        first_radio.find_element(By.XPATH, "../../.."),
-                        first_radio.find_element(By.XPATH, "../.."),
-                        first_radio.find_element(By.XPATH, "..")
-                    ]
-                    
-                    for parent in parents_to_try:
-                        text = parent.text.lower()
-                        if len(text) > len(question_text):
-                            question_text = text
-                        if len(text) > 20:  # Đủ dài để chứa câu hỏi
-                            break
-                            
-                    # Lấy tất cả labels
-                    for radio in available_radios:
-                        try:
-                            # Thử nhiều cách để tìm label
-                            label_texts = []
-                            
-                            # Cách 1: Tìm label liên kết
-                            try:
-                                label = radio.find_element(By.XPATH, "following-sibling::label")
-                                label_texts.append(label.text.strip())
-                            except:
-                                pass
-                            
-                            # Cách 2: Tìm label chứa radio
-                            try:
-                                label = radio.find_element(By.XPATH, "../label")
-                                label_texts.append(label.text.strip())
-                            except:
-                                pass
-                            
-                            # Cách 3: Tìm text trong parent
-                            try:
-                                parent_text = radio.find_element(By.XPATH, "..").text.strip()
-                                if parent_text and parent_text not in label_texts:
-                                    label_texts.append(parent_text)
-                            except:
-                                pass
-                            
-                            # Lưu label tốt nhất
-                            best_label = ""
-                            for lt in label_texts:
-                                if len(lt) > len(best_label) and len(lt) < 100:
-                                    best_label = lt
-                            
-                            all_labels.append(best_label.lower())
-                            
-                        except:
-                            all_labels.append("")
-                            
-                except Exception as e:
-                    log_callback(f"Lỗi khi phân tích câu hỏi: {e}")
-                
-                log_callback(f"Phân tích: {question_text[:100]}...")
-                log_callback(f"Options: {all_labels}")
-                
-                # Logic chọn đáp án thông minh dựa trên nội dung
-                selected_radio = None
-                reason = ""
-                
-                # 1. Câu hỏi về tỷ lệ thời gian lên lớp - CHỌN >80%
-                if ("thời gian" in question_text and ("lên lớp" in question_text or "môn học" in question_text)) or \
-                   any("%" in label for label in all_labels):
-                    
-                    for i, radio in enumerate(available_radios):
-                        label = all_labels[i] if i < len(all_labels) else ""
-                        if (">80%" in label or "trên 80%" in label or 
-                            ("80" in label and "%" in label and ">" in label)):
-                            selected_radio = radio
-                            reason = f"Chọn '>80%' cho câu hỏi thời gian lên lớp"
-                            break
-                    
-                    # Nếu không tìm được >80%, tìm option có % cao nhất
-                    if not selected_radio:
-                        max_percent = 0
-                        for i, radio in enumerate(available_radios):
-                            label = all_labels[i] if i < len(all_labels) else ""
-                            # Tìm số % trong label
-                            import re
-                            percentages = re.findall(r'(\d+)%', label)
-                            for pct in percentages:
-                                if int(pct) > max_percent:
-                                    max_percent = int(pct)
-                                    selected_radio = radio
-                                    reason = f"Chọn {pct}% (cao nhất available) cho thời gian lên lớp"
-                
-                # 2. Câu hỏi về % chuẩn đầu ra - CHỌN 70-90%
-                elif ("chuẩn đầu ra" in question_text or "đạt được" in question_text) and "%" in question_text:
-                    for i, radio in enumerate(available_radios):
-                        label = all_labels[i] if i < len(all_labels) else ""
-                        if (("70" in label and "90" in label) or 
-                            ("từ 70" in label and "dưới 90" in label)):
-                            selected_radio = radio
-                            reason = f"Chọn 'Từ 70 đến dưới 90%' cho câu hỏi chuẩn đầu ra"
-                            break
-                    
-                    # Fallback: chọn option có 70-90
-                    if not selected_radio:
-                        for i, radio in enumerate(available_radios):
-                            label = all_labels[i] if i < len(all_labels) else ""
-                            if "70" in label or "80" in label:
-                                selected_radio = radio
-                                reason = f"Chọn option chứa 70-80% cho chuẩn đầu ra"
-                                break
-                
-                # 3. Câu hỏi đánh giá giáo viên (rating scale 1-4) - CHỌN 4
-                elif ("đánh giá" in question_text or "giảng viên" in question_text or 
-                      "giáo viên" in question_text or "hoạt động giảng dạy" in question_text or 
-                      "phương pháp" in question_text or "moodle" in question_text or
-                      len([l for l in all_labels if any(kw in l for kw in ["1", "2", "3", "4"])]) >= 3):
-                    
-                    # Tìm option có value cao nhất (thường là 4)
-                    max_value = 0
-                    for radio in available_radios:
-                        try:
-                            value = radio.get_attribute('value')
-                            if value and value.isdigit():
-                                val = int(value)
-                                if val > max_value:
-                                    max_value = val
-                                    selected_radio = radio
-                                    reason = f"Chọn option {val} (cao nhất) cho đánh giá giảng viên"
-                        except:
-                            continue
-                    
-                    # Nếu không có value, chọn option cuối cùng (thường là tốt nhất)
-                    if not selected_radio:
-                        selected_radio = available_radios[-1]
-                        reason = f"Chọn option cuối cùng (tích cực nhất) cho đánh giá"
-                
-                # 4. Các câu hỏi khác - chọn option tích cực nhất
-                else:
-                    # Tìm các từ khóa tích cực trong labels
-                    positive_keywords = ["rất", "tốt", "hài lòng", "đồng ý", "cao", "nhiều", "4"]
-                    
-                    for i, radio in enumerate(available_radios):
-                        label = all_labels[i] if i < len(all_labels) else ""
-                        if any(keyword in label for keyword in positive_keywords):
-                            selected_radio = radio
-                            reason = f"Chọn option tích cực: {label[:30]}"
-                            break
-                    
-                    # Nếu không tìm được từ khóa tích cực, chọn theo value cao nhất
-                    if not selected_radio:
-                        max_value = 0
-                        for radio in available_radios:
-                            try:
-                                value = radio.get_attribute('value')
-                                if value and value.isdigit():
-                                    val = int(value)
-                                    if val > max_value:
-                                        max_value = val
-                                        selected_radio = radio
-                                        reason = f"Chọn value cao nhất: {val}"
-                            except:
-                                continue
-                    
-                    # Fallback: chọn option cuối cùng
-                    if not selected_radio:
-                        selected_radio = available_radios[-1]
-                        reason = "Chọn option cuối cùng (fallback)"
-                
-                # Thực hiện click
-                if selected_radio:
-                    driver.execute_script("arguments[0].click();", selected_radio)
-                    log_callback(f"✓ {reason}")
-                    return True
-                else:
-                    # Fallback cuối cùng - chọn option cuối cùng thay vì đầu tiên
-                    driver.execute_script("arguments[0].click();", available_radios[-1])
-                    log_callback(f"⚠ Chọn option cuối cùng (fallback) cho group {group_identifier}")
-                    return True
-                    
-            except Exception as e:
-                log_callback(f"Lỗi khi xử lý group {group_identifier}: {e}")
-                return False
-        
-        # Xử lý mandatory radio groups trước
-        for i, group in enumerate(mandatory_radio_groups):
-            try:
-                radio_buttons = group.find_elements(By.CSS_SELECTOR, "input[type='radio']")
-                
-                if not radio_buttons:
-                    continue
-                
-                if select_best_answer_for_group(radio_buttons, f"mandatory-{i+1}"):
-                    total_questions_handled += 1
-                    
-            except Exception as e:
-                log_callback(f"Lỗi khi xử lý mandatory group {i+1}: {e}")
-                continue
-        
-        # Xử lý các radio groups còn lại theo tên
-        for name, radios in radio_groups_by_name.items():
-            try:
-                # Bỏ qua nếu đã có selection
-                if any(radio.is_selected() for radio in radios):
-                    continue
-                
-                if select_best_answer_for_group(radios, f"named-{name}"):
-                    total_questions_handled += 1
-                    
-            except Exception as e:
-                log_callback(f"Lỗi khi xử lý radio group '{name}': {e}")
-                continue
-        
-        # Xử lý select dropdowns
-        log_callback("Đang tìm kiếm select dropdowns...")
-        select_elements = driver.find_elements(By.CSS_SELECTOR, "select")
-        
-        for i, select in enumerate(select_elements):
+                    with connection:
+                        for sql, params in batch:
+                            connection.execute(sql, params)
+                except sqlite3.Error as e:
+                    print(f"Error writing run history: {e}")
+        connection.close()
+
+
+class HistorySink(EventSink):
+    """
+    Ghi các sự kiện của worker vào RunHistoryStore.
+
+    Trạng thái được giữ theo số thứ tự khảo sát (event.index), vì ở chế độ async các
+    session làm nhiều khảo sát xen kẽ nhau. Timing không mang số thứ tự (chỉ bản đồng
+    bộ phát ra) nên được gán cho khảo sát bắt đầu gần nhất. Số lệnh WebDriver của một
+    khảo sát chỉ được ghi khi không có khảo sát nào chạy chồng lên nó.
+    """
+
+    def __init__(self, store: RunHistoryStore, commands: CommandCounter):
+        super().__init__(DEBUG, (RunStarted, RunFinished, SurveyStarted, SurveyFinished, PageScanned, Timing))
+        self.store = store
+        self.commands = commands
+        self.run_id = int(time.time() * 1000)
+        self._current_survey = 0
+        # index -> {"link", "started", "commands", "overlapped"}
+        self._surveys: Dict[int, Dict] = {}
+        # index -> (trang đang làm, thời điểm bắt đầu trang)
+        self._pages: Dict[int, Tuple[PageScanned, float]] = {}
+
+    def _finish_page(self, survey_index: int) -> None:
+        entry = self._pages.pop(survey_index, None)
+        if entry is not None:
+            page, started = entry
+            self.store.execute(
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.run_id, page.survey, page.page, page.fingerprint, int(page.from_cache),
+                 page.actions, page.planning_ms, time.monotonic() - started))
+
+    def handle(self, event: Event) -> None:
+        now = time.time()
+        if isinstance(event, RunStarted):
+            self.store.execute("INSERT INTO runs (id, started_at, semester, dry_run) VALUES (?, ?, ?, ?)",
+                               (self.run_id, now, semester_label(now), int(event.dry_run)))
+        elif isinstance(event, SurveyStarted):
+            overlapped = bool(self._surveys)
+            for survey in self._surveys.values():
+                survey["overlapped"] = True
+            self._surveys[event.index] = {"link": event.link, "started": now,
+                                          "commands": self.commands.total, "overlapped": overlapped}
+            self._current_survey = event.index
+        elif isinstance(event, PageScanned):
+            self._finish_page(event.survey)
+            self._pages[event.survey] = (event, time.monotonic())
+        elif isinstance(event, Timing):
+            self.store.execute("INSERT INTO phases VALUES (?, ?, ?, ?)",
+                               (self.run_id, self._current_survey, event.phase, event.seconds))
+        elif isinstance(event, SurveyFinished):
+            self._finish_page(event.index)
+            survey = self._surveys.pop(event.index, None) or {"link": "", "started": now,
+                                                              "commands": self.commands.total,
+                                                              "overlapped": True}
+            self.store.execute(
+                "INSERT INTO surveys VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.run_id, event.index, survey["link"], survey_form_key(survey["link"]) if survey["link"] else "",
+                 survey["started"], event.seconds, event.pages, int(event.submitted),
+                 None if survey["overlapped"] else self.commands.total - survey["commands"]))
+        elif isinstance(event, RunFinished):
+            for survey_index in list(self._pages):
+                self._finish_page(survey_index)
+            self.store.execute(
+                "UPDATE runs SET finished_at = ?, outcome = ?, surveys_done = ?, surveys_failed = ?,"
+                " webdriver_commands = ? WHERE id = ?",
+                (now, event.outcome, event.completed, event.failed, self.commands.total, self.run_id))
+
+    def close(self) -> None:
+        self.store.close()
+
+
+def print_history_report(db_path: str, limit: int = 10) -> None:
+    """
+    In báo cáo xu hướng từ lịch sử chạy: trung vị giây/khảo sát theo học kỳ,
+    các trang câu hỏi chậm nhất và các lần chạy gần đây.
+
+    Args:
+        db_path: Path to the SQLite history database
+        limit: Number of rows in the slowest-pages and recent-runs sections
+    """
+    if not os.path.exists(db_path):
+        print(f"Chưa có lịch sử chạy ({db_path}).")
+        return
+    connection = sqlite3.connect(db_path)
+    try:
+        print("== Trung vị giây/khảo sát theo học kỳ ==")
+        by_semester: Dict[str, List[float]] = {}
+        for semester, seconds in connection.execute(
+                "SELECT r.semester, s.seconds FROM surveys s JOIN runs r ON r.id = s.run_id"
+                " WHERE s.submitted = 1 AND r.dry_run = 0"):
+            by_semester.setdefault(semester or "?", []).append(seconds)
+        for semester, values in sorted(by_semester.items()):
+            print(f"  {semester}: {statistics.median(values):.1f}s ({len(values)} khảo sát)")
+
+        print(f"== {limit} trang câu hỏi chậm nhất ==")
+        for survey_idx, page, fingerprint, seconds, planning_ms, link in connection.execute(
+                "SELECT p.survey_idx, p.page, p.fingerprint, p.seconds, p.planning_ms, s.link"
+                " FROM pages p LEFT JOIN surveys s ON s.run_id = p.run_id AND s.idx = p.survey_idx"
+                " ORDER BY p.seconds DESC LIMIT ?", (limit,)):
+            print(f"  {seconds:.1f}s (lập kế hoạch {planning_ms:.0f} ms) trang {page}"
+                  f" mẫu {(fingerprint or '')[:8]} {link or ''}")
+
+        print(f"== {limit} lần chạy gần nhất ==")
+        for started_at, semester, outcome, done, failed, commands in connection.execute(
+                "SELECT started_at, semester, outcome, surveys_done, surveys_failed, webdriver_commands"
+                " FROM runs ORDER BY started_at DESC LIMIT ?", (limit,)):
+            started = time.strftime("%Y-%m-%d %H:%M", time.localtime(started_at))
+            print(f"  {started} {semester}: {outcome or 'đang chạy/không rõ'},"
+                  f" {done or 0} xong, {failed or 0} lỗi, {commands or 0} lệnh WebDriver")
+    finally:
+        connection.close()
+
+
+def bench_browser_startup(headless: bool = False, runs: int = 2,
+                          first_page_url: str = PORTAL_SURVEY_URL) -> Optional[str]:
+    """
+    Đo thời gian từ lúc khởi động đến khi tải xong trang đầu tiên và RSS của mỗi
+    backend trình duyệt có sẵn, rồi lưu backend nhanh nhất cho chế độ browser=auto.
+
+    Args:
+        headless: Benchmark headless browsers
+        runs: Launches per backend; the fastest one counts (the first may resolve the driver)
+        first_page_url: Page loaded after launch
+
+    Returns:
+        Name of the fastest backend, or None if none could be started
+    """
+    load_automation_modules()
+    results: Dict[str, Dict[str, float]] = {}
+    for backend in BROWSER_BACKENDS.values():
+        if not backend.available():
+            print(f"{backend.display_name}: không tìm thấy, bỏ qua")
+            continue
+        best = None
+        for _ in range(runs):
+            driver = None
             try:
-                if select.get_attribute("disabled") or not select.is_displayed():
-                    continue
-                    
-                options = select.find_elements(By.CSS_SELECTOR, "option")
-                if len(options) > 1:  # Có options để chọn
-                    current_value = select.get_attribute("value")
-                    if not current_value or current_value == options[0].get_attribute("value"):
-                        # Chọn option tích cực nhất (thường là cuối cùng)
-                        best_option_index = len(options) - 1
-                        driver.execute_script(f"arguments[0].selectedIndex = {best_option_index}; arguments[0].dispatchEvent(new Event('change'));", select)
-                        log_callback(f"Đã chọn option tích cực nhất cho select dropdown {i+1}")
-                        total_questions_handled += 1
-                        
+                started = time.perf_counter()
+                driver = backend.start(headless)
+                driver.get(first_page_url)
+                seconds = time.perf_counter() - started
+                process = getattr(driver.service, "process", None)
+                memory = browser_memory_mb(process.pid if process is not None else None)
+                if best is None or seconds < best["seconds"]:
+                    best = {"seconds": seconds, "rss_mb": memory or 0.0}
             except Exception as e:
-                log_callback(f"Lỗi khi xử lý select {i+1}: {e}")
-                continue
-        
-        # Xử lý text inputs và textareas (nếu bắt buộc)
-        text_inputs = driver.find_elements(By.CSS_SELECTOR, "input[type='text'], textarea")
-        
-        for i, input_elem in enumerate(text_inputs):
+                print(f"{backend.display_name}: lỗi khởi động ({e})")
+                break
+            finally:
+                if driver is not None:
+                    try:
+                        driver.quit()
+                    except Exception:
+                        pass
+        if best is not None:
+            results[backend.name] = best
+            print(f"{backend.display_name}: {best['seconds']:.2f}s đến trang đầu, "
+                  f"RSS {best['rss_mb']:.0f} MB")
+    if not results:
+        print("Không khởi động được trình duyệt nào.")
+        return None
+    fastest = min(results, key=lambda name: results[name]["seconds"])
+    try:
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        with open(BROWSER_BENCH_PATH, 'w', encoding='utf-8') as f:
+            json.dump({"fastest": fastest, "headless": headless, "measured_at": time.time(),
+                       "results": results}, f, indent=2)
+    except OSError as e:
+        print(f"Error saving browser benchmark: {e}")
+    print(f"Nhanh nhất: {BROWSER_BACKENDS[fastest].display_name} (dùng khi browser=auto)")
+    return fastest
+
+
+# Mẫu câu hỏi/đáp án cho corpus tổng hợp: (loại, câu hỏi, [(nhãn, value)], index đáp án mong muốn)
+SYNTHETIC_COURSES = ["Nhập môn lập trình", "Cấu trúc dữ liệu và giải thuật", "Mạng máy tính",
+                     "Hệ điều hành", "Cơ sở dữ liệu", "Toán rời rạc", "Triết học Mác - Lênin",
+                     "Kiến trúc máy tính", "Trí tuệ nhân tạo", "An toàn mạng máy tính"]
+SYNTHETIC_ATTENDANCE_TOP = [">80%", "> 80%", "Trên 80%", "trên 80 %", "Từ 80% trở lên", "81% - 100%"]
+SYNTHETIC_TEMPLATES = [
+    ("attendance", ["Tỷ lệ thời gian anh/chị lên lớp đối với môn học {course}?",
+                    "Thời gian tham gia lên lớp của bạn cho môn {course}"],
+     [("Dưới 50%", "A1"), ("Từ 50% đến 80%", "A2"), ("{top}", "A3")], 2),
+    ("outcome", ["Anh/chị tự đánh giá mức độ đạt được chuẩn đầu ra của môn {course} (%)",
+                 "Mức độ đạt được chuẩn đầu ra học phần {course} (%)"],
+     [("Dưới 50%", "A1"), ("Từ 50 đến dưới 70%", "A2"), ("Từ 70 đến dưới 90%", "A3"),
+      ("Từ 90% trở lên", "A4")], 2),
+    ("rating", ["Giảng viên {course} truyền đạt rõ ràng, dễ hiểu",
+                "Phương pháp giảng dạy của giảng viên môn {course} phù hợp",
+                "Hoạt động giảng dạy trên Moodle của môn {course} hiệu quả"],
+     [("1 - Hoàn toàn không đồng ý", "1"), ("2 - Không đồng ý", "2"), ("3 - Đồng ý", "3"),
+      ("4 - Hoàn toàn đồng ý", "4")], 3),
+    ("other", ["Anh/chị có hài lòng về cơ sở vật chất phục vụ môn {course}?",
+               "Tài liệu học tập của môn {course} được cung cấp đầy đủ"],
+     [("Không hài lòng", "A1"), ("Bình thường", "A2"), ("Hài lòng", "A3"), ("Rất hài lòng", "A4")], 3),
+]
+SYNTHETIC_FORMS = ["NFC", "NFD", "nbsp", "no_diacritics"]
+
+
+def synthetic_text_form(text: str, form: str) -> str:
+    """Apply a text variant as seen on different portals/browsers, then lower-case like the extractor."""
+    if form == "NFD":
+        text = unicodedata.normalize("NFD", text)
+    elif form == "nbsp":
+        text = text.replace(" ", "\u00a0")
+    elif form == "no_diacritics":
+        text = "".join(c for c in unicodedata.normalize("NFD", text) if not unicodedata.combining(c))
+        text = text.replace("đ", "d").replace("Đ", "D")
+    else:
+        text = unicodedata.normalize("NFC", text)
+    return text.lower()
+
+
+def generate_question_corpus(size: int, seed: int = 0) -> List[Dict]:
+    """
+    Sinh corpus câu hỏi tổng hợp với biến thể dấu (NFC/NFD, không dấu), khoảng trắng
+    và định dạng phần trăm, kèm đáp án mong muốn, cho benchmark bộ phân loại.
+
+    Args:
+        size: Number of questions
+        seed: Random seed (same seed, same corpus)
+
+    Returns:
+        List of {"category", "form", "question", "labels", "values", "expected"}
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        category, questions, options, expected = rng.choice(SYNTHETIC_TEMPLATES)
+        form = rng.choice(SYNTHETIC_FORMS)
+        top = rng.choice(SYNTHETIC_ATTENDANCE_TOP)
+        question = rng.choice(questions).format(course=rng.choice(SYNTHETIC_COURSES))
+        corpus.append({
+            "category": category,
+            "form": form,
+            "question": synthetic_text_form(question, form),
+            "labels": [synthetic_text_form(label.format(top=top), form) for label, _ in options],
+            "values": [value for _, value in options],
+            "expected": expected,
+        })
+    return corpus
+
+
+def bench_classifier(size: int = 20000, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """
+    Micro-benchmark cho logic chọn đáp án (select_best_answer_for_group).
+
+    Đo số câu hỏi phân loại mỗi giây (tổng và theo nhóm), tỷ lệ chọn đúng đáp án mong muốn theo loại câu
+    hỏi và biến thể văn bản, và bộ nhớ đỉnh (tracemalloc, ở một lượt chạy riêng).
+    Kết quả được nối vào ~/.tool_khaosat/classifier_bench.jsonl và so với lần trước.
+
+    Args:
+        size: Corpus size
+        seed: Corpus seed
+
+    Returns:
+        Per-group statistics keyed by "all", "category:<name>" and "form:<name>"
+    """
+    started = time.perf_counter()
+    corpus = generate_question_corpus(size, seed)
+    print(f"Sinh corpus {size} câu hỏi trong {time.perf_counter() - started:.2f}s (seed {seed})")
+
+    stats: Dict[str, Dict[str, float]] = {}
+    for item in corpus:
+        item_started = time.perf_counter()
+        index, _ = select_best_answer_for_group(item["question"], item["labels"], item["values"])
+        elapsed = time.perf_counter() - item_started
+        for key in ("all", "category:" + item["category"], "form:" + item["form"]):
+            entry = stats.setdefault(key, {"count": 0, "correct": 0, "seconds": 0.0})
+            entry["count"] += 1
+            entry["correct"] += int(index == item["expected"])
+            entry["seconds"] += elapsed
+
+    # Thông lượng tổng: lượt nhanh nhất trong 3 lượt, không đo từng câu
+    wall_seconds = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for item in corpus:
+            select_best_answer_for_group(item["question"], item["labels"], item["values"])
+        wall_seconds = min(wall_seconds, time.perf_counter() - started)
+
+    tracemalloc.start()
+    for item in corpus:
+        select_best_answer_for_group(item["question"], item["labels"], item["values"])
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    for key, entry in sorted(stats.items()):
+        entry["per_second"] = entry["count"] / entry["seconds"] if entry["seconds"] else 0.0
+        entry["accuracy"] = entry["correct"] / entry["count"]
+        print(f"  {key:<24} {entry['per_second']:>10.0f} câu/s  đúng {entry['accuracy'] * 100:5.1f}%"
+              f"  ({entry['count']} câu)")
+    stats["all"]["wall_per_second"] = size / wall_seconds
+    print(f"Tổng: {size / wall_seconds:.0f} câu/s (wall, tốt nhất 3 lượt), "
+          f"bộ nhớ đỉnh {peak_bytes / 1024:.1f} KiB")
+
+    history_path = os.path.join(CONFIG_DIR, "classifier_bench.jsonl")
+    previous = None
+    try:
+        with open(history_path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        previous = json.loads(lines[-1]) if lines else None
+    except (OSError, ValueError):
+        pass
+    if previous and previous.get("size") == size and previous.get("seed") == seed:
+        change = (stats["all"]["wall_per_second"] / previous["per_second"] - 1) * 100
+        print(f"So với lần trước: {change:+.1f}% câu/s, đúng {previous['accuracy'] * 100:.1f}% → "
+              f"{stats['all']['accuracy'] * 100:.1f}%")
+    try:
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        with open(history_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"ts": time.time(), "size": size, "seed": seed,
+                                "per_second": stats["all"]["wall_per_second"],
+                                "accuracy": stats["all"]["accuracy"], "peak_bytes": peak_bytes}) + "\n")
+    except OSError as e:
+        print(f"Error saving classifier benchmark: {e}")
+    return stats
+
+
+def serve_directory(directory: str) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Phục vụ một thư mục qua HTTP tĩnh trên localhost (cổng ngẫu nhiên) trong thread nền.
+
+    Args:
+        directory: Directory to serve
+
+    Returns:
+        (server, base URL ending with "/"); call server.shutdown() when done
+    """
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def plan_decisions(plan: List[Dict]) -> Dict[str, str]:
+    """Decision of each question in a plan, keyed by kind and question name."""
+    decisions = {}
+    for action in plan:
+        target = action.get("name") or action.get("key", "")
+        decisions[f"{action['kind']}:{target}"] = str(action.get("value", action.get("index", action.get("text"))))
+    return decisions
+
+
+def replay_captures(capture_dir: str, backend: Optional[BrowserBackend] = None) -> int:
+    """
+    Phát lại các trang đã ghi bằng capture=1: chạy lại bộ phân loại trên mô hình đã lưu,
+    rồi mở từng trang trên một server tĩnh cục bộ để kiểm tra extractor và applier.
+
+    In các quyết định khác với lúc ghi và thời gian phân loại/áp dụng, để kiểm tra
+    cả tính đúng lẫn hồi quy tốc độ của logic câu hỏi mà không cần portal.
+
+    Args:
+        capture_dir: Directory written by PageRecorder
+        backend: Browser backend for the applier pass (None: classifier only)
+
+    Returns:
+        Number of pages whose decisions or answers differ from the capture
+    """
+    names = sorted(name[:-len(".json")] for name in os.listdir(capture_dir)
+                   if name.endswith(".json")) if os.path.isdir(capture_dir) else []
+    if not names:
+        print(f"Không có trang nào trong {capture_dir}")
+        return 0
+    quiet = EventBus()
+    mismatches = 0
+    classify_seconds = 0.0
+    for name in names:
+        with open(os.path.join(capture_dir, name + ".json"), 'r', encoding='utf-8') as f:
+            capture = json.load(f)
+        started = time.perf_counter()
+        plan = build_page_plan(capture["model"], quiet)
+        classify_seconds += time.perf_counter() - started
+        expected, actual = plan_decisions(capture["plan"]), plan_decisions(plan)
+        if expected != actual:
+            mismatches += 1
+            for key in sorted(set(expected) | set(actual)):
+                if expected.get(key) != actual.get(key):
+                    print(f"  {name} {key}: đã ghi {expected.get(key)} → hiện tại {actual.get(key)}")
+    print(f"Phân loại: {len(names)} trang, {mismatches} trang khác, "
+          f"{classify_seconds * 1000 / len(names):.2f} ms/trang")
+
+    if backend is None:
+        return mismatches
+    load_automation_modules()
+    server, base_url = serve_directory(capture_dir)
+    driver = None
+    try:
+        driver = backend.start(headless=True)
+        extract_seconds = apply_seconds = 0.0
+        for name in names:
+            driver.get(base_url + name + ".html")
+            started = time.perf_counter()
+            plan = build_page_plan(extract_question_model(driver), quiet)
+            extract_seconds += time.perf_counter() - started
+            started = time.perf_counter()
+            result = apply_page_plan(driver, plan, quiet)
+            apply_seconds += time.perf_counter() - started
+            with open(os.path.join(capture_dir, name + ".json"), 'r', encoding='utf-8') as f:
+                expected = plan_decisions(json.load(f)["plan"])
+            if result["missing"] or plan_decisions(plan) != expected:
+                mismatches += 1
+                print(f"  {name}: {len(result['missing'])} hành động không áp dụng được, "
+                      f"quyết định {'khớp' if plan_decisions(plan) == expected else 'khác'} bản ghi")
+        print(f"Trình duyệt ({backend.display_name}): trích xuất + lập kế hoạch "
+              f"{extract_seconds * 1000 / len(names):.1f} ms/trang, "
+              f"áp dụng {apply_seconds * 1000 / len(names):.1f} ms/trang")
+    finally:
+        if driver is not None:
+            driver.quit()
+        server.shutdown()
+    return mismatches
+
+
+def render_mock_survey_page(corpus: List[Dict]) -> str:
+    """
+    Trang khảo sát giả (cấu trúc kiểu LimeSurvey: .question-container, radio + label,
+    nút #movenextbtn) dựng từ corpus tổng hợp, dùng làm portal cục bộ cho benchmark.
+
+    Args:
+        corpus: Questions from generate_question_corpus
+
+    Returns:
+        HTML document
+    """
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>Khảo sát</title></head>'
+             '<body><form id="limesurvey">']
+    for number, item in enumerate(corpus, 1):
+        parts.append(f'<div class="question-container" id="question{number}">'
+                     f'<div class="question-text">{escape(item["question"])}</div><ul>')
+        for value, label in zip(item["values"], item["labels"]):
+            answer_id = f"answer{number}{value}"
+            parts.append(f'<li class="answer-item"><input type="radio" name="q{number}" id="{answer_id}" '
+                         f'value="{escape(value)}"><label for="{answer_id}">{escape(label)}</label></li>')
+        parts.append('</ul></div>')
+    parts.append('<button type="button" id="movenextbtn">Tiếp</button></form></body></html>')
+    return "".join(parts)
+
+
+def bench_webdriver_transport(commands: int = 300, questions: int = 40,
+                              backend: Optional[BrowserBackend] = None) -> Dict[str, Dict[str, float]]:
+    """
+    So sánh độ trễ mỗi lệnh WebDriver giữa ba cấu hình transport trên một portal giả
+    cục bộ: mở kết nối mới cho mỗi lệnh, mặc định của selenium, và pool đã tinh chỉnh.
+
+    Mỗi cấu hình chạy cùng một chuỗi lệnh như khi trả lời một trang (trích xuất mô hình
+    câu hỏi, tìm nút, đọc trạng thái trang); tải trang không được tính.
+
+    Args:
+        commands: Command rounds per transport (three commands per round)
+        questions: Questions on the mock page
+        backend: Browser backend (None: the configured one)
+
+    Returns:
+        {transport: {"mean_ms", "p50_ms", "p95_ms", "commands"}}
+    """
+    load_automation_modules()
+    backend = backend or select_browser_backend(read_config(os.path.join(CONFIG_DIR, "config.txt")) or {})
+    directory = tempfile.mkdtemp(prefix="mock_portal_")
+    with open(os.path.join(directory, "index.html"), 'w', encoding='utf-8') as f:
+        f.write(render_mock_survey_page(generate_question_corpus(questions)))
+    server, base_url = serve_directory(directory)
+    transports = [("không keep-alive", {"keep_alive": False}), ("mặc định selenium", None),
+                  ("pool tinh chỉnh", {})]
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        for label, settings in transports:
+            driver = None
             try:
-                input_class = input_elem.get_attribute("class") or ""
-                if (input_elem.get_attribute("required") or "mandatory" in input_class):
-                    current_value = input_elem.get_attribute("value")
-                    if not current_value or current_value.strip() == "":
-                        # Điền text tích cực
-                        input_elem.clear()
-                        input_elem.send_keys("Rất hài lòng với chất lượng giảng dạy")
-                        log_callback(f"Đã điền feedback tích cực cho input bắt buộc {i+1}")
-                        total_questions_handled += 1
-                        
+                driver = backend.start(headless=True)
+                if settings is not None:
+                    tune_driver_transport(driver, **settings)
+                counter = CommandCounter()
+                instrument_driver(driver, counter)
+                driver.get(base_url + "index.html")
+                for round_index in range(commands + 10):
+                    if round_index == 10:
+                        # 10 vòng đầu để làm nóng, không tính
+                        counter.reset()
+                    extract_question_model(driver)
+                    driver.find_element(By.ID, "movenextbtn")
+                    driver.execute_script("return document.readyState;")
+                overall = LatencyHistogram()
+                for histogram in counter.latency.values():
+                    overall.merge(histogram)
+                results[label] = {"mean_ms": overall.mean() * 1000, "p50_ms": overall.percentile(0.5) * 1000,
+                                  "p95_ms": overall.percentile(0.95) * 1000, "commands": overall.count}
+                print(f"{label:<20} {results[label]['mean_ms']:6.2f} ms/lệnh  p50 ≤{results[label]['p50_ms']:.0f} ms"
+                      f"  p95 ≤{results[label]['p95_ms']:.0f} ms  ({overall.count} lệnh)")
+                for command, histogram in sorted(counter.latency.items()):
+                    print(f"    {command:<20} {histogram.mean() * 1000:6.2f} ms")
             except Exception as e:
-                log_callback(f"Lỗi khi xử lý text input {i+1}: {e}")
-                continue
-        
-        log_callback(f"✅ Đã xử lý tổng cộng {total_questions_handled} câu hỏi/thành phần với logic đánh giá tích cực.")
-        return True
-        
-    except Exception as e:
-        log_callback(f"Lỗi trong find_and_select_comprehensive_questions: {e}")
-        return False
+                print(f"{label}: lỗi ({e})")
+            finally:
+                if driver is not None:
+                    try:
+                        driver.quit()
+                    except Exception:
+                        pass
+    finally:
+        server.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+    tuned = results.get("pool tinh chỉnh")
+    for label in ("không keep-alive", "mặc định selenium"):
+        baseline = results.get(label)
+        if baseline and tuned and baseline["mean_ms"]:
+            saving = baseline["mean_ms"] - tuned["mean_ms"]
+            print(f"Tiết kiệm so với {label}: {saving:.2f} ms/lệnh ({saving / baseline['mean_ms'] * 100:.0f}%)")
+    return results
+
+
+class PrometheusSink(EventSink):
+    """
+    Tổng hợp sự kiện của worker thành counter/histogram dạng Prometheus.
+
+    Instance sống trong tiến trình GUI (hoặc tiến trình --watch), không phải trong
+    tiến trình worker: sự kiện và số lệnh WebDriver đến qua pipe, nên counter chỉ tăng
+    qua mọi lượt chạy và mọi lần worker được khởi động lại. Các gauge (RSS trình duyệt,
+    ETA) được đọc từ run_metrics tại thời điểm scrape; RSS bị bỏ khi không đo được.
+    """
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+    EVENT_TYPES = (DriverStarted, SurveyFinished, PageScanned, Timing, RunFinished)
+
+    def __init__(self):
+        super().__init__(DEBUG, self.EVENT_TYPES)
+        self.surveys = {"done": 0, "failed": 0}
+        self.pages = 0
+        self.cached_pages = 0
+        self.driver_starts = 0
+        self.worker_restarts = 0
+        self.runs: Dict[str, int] = {}
+        # phase -> (bucket counts, sum, count)
+        self.histograms: Dict[str, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def _observe(self, name: str, seconds: float) -> None:
+        buckets, total, count = self.histograms.get(name, ([0] * len(self.BUCKETS), 0.0, 0))
+        for i, bound in enumerate(self.BUCKETS):
+            if seconds <= bound:
+                buckets[i] += 1
+        self.histograms[name] = (buckets, total + seconds, count + 1)
+
+    def handle(self, event: Event) -> None:
+        with self._lock:
+            if isinstance(event, SurveyFinished):
+                self.surveys["done" if event.submitted else "failed"] += 1
+                self._observe("survey", event.seconds)
+            elif isinstance(event, PageScanned):
+                self.pages += 1
+                self.cached_pages += int(event.from_cache)
+            elif isinstance(event, Timing):
+                self._observe(event.phase, event.seconds)
+            elif isinstance(event, DriverStarted):
+                self.driver_starts += 1
+                self._observe("driver_start", event.seconds)
+            elif isinstance(event, RunFinished):
+                self.runs[event.outcome] = self.runs.get(event.outcome, 0) + 1
+
+    def worker_restarted(self) -> None:
+        """Count a worker process restarted by the supervisor."""
+        with self._lock:
+            self.worker_restarts += 1
+
+    def render(self) -> str:
+        """Current metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[Tuple[str, float]]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        with self._lock:
+            metric("uit_surveys_total", "counter", "Surveys finished, by result.",
+                   [(f'{{result="{result}"}}', count) for result, count in self.surveys.items()])
+            metric("uit_pages_total", "counter", "Survey pages processed.", [("", self.pages)])
+            metric("uit_pages_replayed_total", "counter", "Pages answered from a cached plan.",
+                   [("", self.cached_pages)])
+            metric("uit_driver_starts_total", "counter", "Browser driver sessions started.",
+                   [("", self.driver_starts)])
+            metric("uit_worker_restarts_total", "counter", "Worker processes restarted after a crash.",
+                   [("", self.worker_restarts)])
+            metric("uit_runs_total", "counter", "Finished runs, by outcome.",
+                   [(f'{{outcome="{outcome}"}}', count) for outcome, count in self.runs.items()])
+            lines.append("# HELP uit_phase_seconds Latency of worker phases.")
+            lines.append("# TYPE uit_phase_seconds histogram")
+            for phase, (buckets, total, count) in sorted(self.histograms.items()):
+                for bound, bucket_count in zip(self.BUCKETS, buckets):
+                    lines.append(f'uit_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {bucket_count}')
+                lines.append(f'uit_phase_seconds_bucket{{phase="{phase}",le="+Inf"}} {count}')
+                lines.append(f'uit_phase_seconds_sum{{phase="{phase}"}} {total}')
+                lines.append(f'uit_phase_seconds_count{{phase="{phase}"}} {count}')
+
+        commands = dict(webdriver_commands.lifetime_by_command)
+        metric("uit_webdriver_commands_total", "counter", "WebDriver commands sent, by command.",
+               [(f'{{command="{command}"}}', count) for command, count in sorted(commands.items())])
+        lines.append("# HELP uit_webdriver_command_seconds Latency of WebDriver commands.")
+        lines.append("# TYPE uit_webdriver_command_seconds histogram")
+        for command, histogram in sorted(dict(webdriver_commands.lifetime_latency).items()):
+            for bound, bucket_count in zip(histogram.BOUNDS, histogram.cumulative()):
+                lines.append(f'uit_webdriver_command_seconds_bucket{{command="{command}",le="{bound}"}} {bucket_count}')
+            lines.append(f'uit_webdriver_command_seconds_bucket{{command="{command}",le="+Inf"}} {histogram.count}')
+            lines.append(f'uit_webdriver_command_seconds_sum{{command="{command}"}} {histogram.total}')
+            lines.append(f'uit_webdriver_command_seconds_count{{command="{command}"}} {histogram.count}')
+        memory = browser_memory_mb(run_metrics.browser_pid) if run_metrics.active else None
+        if memory is not None:
+            # Không đo được (không có trình duyệt hoặc không đọc được bộ nhớ): bỏ gauge
+            metric("uit_browser_rss_bytes", "gauge", "RSS of the driver and browser processes.",
+                   [("", int(memory * 1024 * 1024))])
+        metric("uit_throttled_seconds", "gauge", "Time the current run waited on the portal rate limiter.",
+               [("", round(run_metrics.throttled_seconds, 3))])
+        metric("uit_rate_limit_backoffs", "gauge", "Backoffs after 429/5xx/timeouts in the current run.",
+               [("", run_metrics.rate_limit_backoffs)])
+        metric("uit_run_active", "gauge", "1 while a run is in progress.", [("", int(run_metrics.active))])
+        metric("uit_eta_seconds", "gauge", "Estimated time left in the current run.",
+               [("", round(run_metrics.eta_now(), 1) if run_metrics.active else 0)])
+        return "\n".join(lines) + "\n"
+
+
+prometheus_sink = PrometheusSink()
+metrics_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: int) -> Optional[ThreadingHTTPServer]:
+    """
+    Mở endpoint /metrics (định dạng Prometheus) trên 127.0.0.1; chỉ mở một lần.
+
+    Args:
+        port: TCP port on localhost
+
+    Returns:
+        The running server, or None if the port could not be bound
+    """
+    global metrics_server
+    if metrics_server is not None:
+        return metrics_server
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_sink.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        metrics_server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    except OSError as e:
+        print(f"Error starting metrics server on port {port}: {e}")
+        return None
+    threading.Thread(target=metrics_server.serve_forever, daemon=True).start()
+    return metrics_server
+
+
+def config_log_level(config: Dict[str, str]) -> int:
+    """Event level selected by the log_level config key (INFO by default)."""
+    return {name: value for value, name in LEVEL_NAMES.items()}.get(config.get('log_level', 'INFO').upper(), INFO)
+
+
+def start_configured_metrics(config: Dict[str, str]) -> Optional[PrometheusSink]:
+    """
+    Serve Prometheus metrics on http://127.0.0.1:<metrics_port>/metrics if configured.
+
+    Called by the long-lived process (GUI or --watch), never by a worker process, so
+    the endpoint and its counters outlive individual runs.
+
+    Returns:
+        The shared PrometheusSink to feed worker events into, or None
+    """
+    metrics_port = config.get('metrics_port', '')
+    if metrics_port.isdigit() and start_metrics_server(int(metrics_port)):
+        return prometheus_sink
+    return None
+
+
+def build_event_bus(config: Dict[str, str], view_sink: Optional[EventSink] = None) -> EventBus:
+    """
+    Create the worker's event bus with the sinks requested in the configuration.
+
+    Config keys: log_level (DEBUG/INFO/WARNING/ERROR), log_file and jsonl_log
+    ("1" for a timestamped file in ~/.tool_khaosat/logs/, or an explicit path),
+    history ("0" disables the SQLite run history). Prometheus metrics (metrics_port)
+    are hosted by the calling process, see start_configured_metrics.
+
+    Args:
+        config: Configuration dictionary
+        view_sink: Optional sink of the UI (e.g. the Qt log view)
+
+    Returns:
+        EventBus with the sinks attached
+    """
+    events = EventBus()
+    level = config_log_level(config)
+    if view_sink is not None:
+        view_sink.level = level
+        events.add_sink(view_sink)
+
+    run_name = time.strftime("run-%Y%m%d-%H%M%S")
+    logs_dir = os.path.join(CONFIG_DIR, "logs")
+    log_file = config.get('log_file', '')
+    if log_file:
+        path = os.path.join(logs_dir, run_name + ".log") if log_file == "1" else log_file
+        events.add_sink(TextFileSink(path, level))
+    jsonl_log = config.get('jsonl_log', '')
+    if jsonl_log:
+        path = os.path.join(logs_dir, run_name + ".jsonl") if jsonl_log == "1" else jsonl_log
+        events.add_sink(JsonLinesSink(path))
+    events.add_sink(MetricsSink())
+    if config.get('history', '1') != '0':
+        events.add_sink(HistorySink(RunHistoryStore(HISTORY_DB_PATH), webdriver_commands))
+    return events
+
+
+class QtViewSink(CallbackSink):
+    """Sink of the Qt view: status and login events always pass, other events by level."""
+
+    CONTROL_EVENTS = (StatusChanged, LoginPrompt)
+
+    def accepts(self, event_type: type, level: int) -> bool:
+        return issubclass(event_type, self.CONTROL_EVENTS) or super().accepts(event_type, level)
+
 
+# Các kiểu sự kiện được gửi qua pipe từ tiến trình worker, tra theo tên
+EVENT_TYPES = {cls.__name__: cls for cls in (
+    LogMessage, StatusChanged, LoginPrompt, RunStarted, RunFinished, DriverStarted, SurveyStarted,
+    SurveyFinished, PageScanned, GroupAnalyzed, GroupAnswered, Timing)}
 
-def wait_for_element_and_click(driver: webdriver.Edge, locator: tuple, timeout: int = 10) -> bool:
+
+class PipeSink(EventSink):
     """
-    Wait for an element to be clickable and click it.
-    
-    Args:
-        driver: WebDriver instance
-        locator: Tuple of (By.TYPE, value)
-        timeout: Maximum time to wait in seconds
-        
-    Returns:
-        True if element was clicked successfully, False otherwise
+    Sink của tiến trình worker: gửi sự kiện sang GUI dạng tuple gọn
+    ("event", tên kiểu, các trường) thay vì pickle cả object.
+
+    Các kiểu trong forward_types (sự kiện cho metrics của GUI) được gửi ở mọi mức log;
+    GUI tự lọc chúng khỏi khung log theo mức.
     """
-    try:
-        element = WebDriverWait(driver, timeout).until(
-            EC.element_to_be_clickable(locator)
-        )
-        element.click()
-        return True
-    except TimeoutException:
-        return False
-    except Exception:
-        return False
 
-def survey_main(config: Dict[str, str], log_callback, status_callback) -> None:
+    CONTROL_EVENTS = (StatusChanged, LoginPrompt)
+
+    def __init__(self, conn, level: int = INFO, forward_types: Tuple[type, ...] = ()):
+        super().__init__(level)
+        self.conn = conn
+        self.forward_types = forward_types
+        self._lock = threading.Lock()
+
+    def accepts(self, event_type: type, level: int) -> bool:
+        return (issubclass(event_type, self.CONTROL_EVENTS + self.forward_types)
+                or super().accepts(event_type, level))
+
+    def send(self, message: tuple) -> None:
+        with self._lock:
+            try:
+                self.conn.send(message)
+            except (OSError, EOFError):
+                pass
+
+    def handle(self, event: Event) -> None:
+        self.send(("event", event.__class__.__name__, asdict(event)))
+
+
+def worker_process_main(config: Dict[str, str], conn) -> None:
     """
-    Main survey automation function with improved reliability and UX.
-    
+    Entry point of the worker process.
+
+    Runs survey_main, forwards its events and a metrics snapshot every second to
+    the GUI, and applies pause/resume/profile/stop commands received on conn.
+
     Args:
-        config: Configuration dictionary containing email and password
-        log_callback: Function to log messages
-        status_callback: Function to update status
+        config: Configuration dictionary
+        conn: Child end of the pipe to the GUI process
     """
-    global paused, stop_thread, driver
-    
-    survey_url = 'https://student.uit.edu.vn/sinhvien/phieukhaosat'
-    email = config.get('email', '')
-    password = config.get('password', '')
-    
-    if not email or not password:
-        log_callback("[ERROR] Email hoặc mật khẩu không được để trống!")
-        status_callback("Lỗi: Thiếu thông tin đăng nhập")
-        return
-    
-    # Initialize browser
-    status_callback("Đang khởi tạo trình duyệt...")
-    log_callback("Khởi tạo trình duyệt Edge...")
-    
-    driver = setup_edge_driver()
-    if not driver:
-        log_callback("[ERROR] Không thể khởi tạo trình duyệt Edge!")
-        log_callback("Vui lòng kiểm tra lại Microsoft Edge và Edge WebDriver")
-        status_callback("Lỗi: Không thể khởi tạo trình duyệt")
-        return
-    
-    try:
-        # Navigate to survey page
-        status_callback("Đang mở trang khảo sát...")
-        log_callback("Đang mở trang khảo sát...")
-        driver.get(survey_url)
-        
-        # Fill login information
-        status_callback("Đang điền thông tin đăng nhập...")
-        log_callback("Đang điền thông tin đăng nhập...")
-        
-        try:
-            email_field = WebDriverWait(driver, 30).until(
-                EC.presence_of_element_located((By.NAME, "name"))
-            )
-            password_field = driver.find_element(By.NAME, "pass")
-            
-            email_field.clear()
-            email_field.send_keys(email)
-            password_field.clear()
-            password_field.send_keys(password)
-            
-            log_callback("Đã điền thông tin đăng nhập.")
-            
-        except TimeoutException:
-            log_callback("[ERROR] Không tìm thấy form đăng nhập!")
-            status_callback("Lỗi: Không tìm thấy form đăng nhập")
-            return
-        
-        # Show login completion dialog
-        status_callback("Chờ hoàn tất đăng nhập...")
-        log_callback("@SHOW_LOGIN_MESSAGE@")
-        
-        # After user completes login, continue with survey processing
-        status_callback("Đang tìm kiếm khảo sát...")
-        log_callback("Đang lấy danh sách khảo sát chưa thực hiện...")
-        
-        # Get survey list with retry mechanism
-        survey_links = []
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                # Wait for the survey table to load
-                WebDriverWait(driver, 20).until(
-                    EC.presence_of_element_located((By.XPATH, "//*[@id='block-system-main']/div/table/tbody"))
-                )
-                
-                rows = driver.find_elements(By.XPATH, "//*[@id='block-system-main']/div/table/tbody/tr")
-                survey_links = []
-                
-                for row in rows:
-                    try:
-                        survey_link = row.find_element(By.XPATH, "./td[2]/strong/a").get_attribute("href")
-                        status_element = row.find_element(By.XPATH, "./td[3]")
-                        status = status_element.text.strip()
-                        
-                        if status == "(Chưa khảo sát)":
-                            survey_links.append(survey_link)
-                            
-                    except (NoSuchElementException, Exception):
-                        continue
-                        
-                break  # Success, exit retry loop
-                
-            except TimeoutException:
-                if attempt < max_retries - 1:
-                    log_callback(f"Thử lại lần {attempt + 2}/{max_retries}...")
-                    time.sleep(2)
-                else:
-                    log_callback("[ERROR] Không thể tải danh sách khảo sát!")
-                    status_callback("Lỗi: Không thể tải danh sách khảo sát")
-                    return
-        
-        if not survey_links:
-            log_callback("Không có khảo sát nào cần thực hiện.")
-            status_callback("Hoàn thành: Không có khảo sát nào cần làm")
-            return
-            
-        log_callback(f"Tìm thấy {len(survey_links)} khảo sát chưa thực hiện.")
-        
-        # Process each survey
-        for index, survey_link in enumerate(survey_links):
-            if stop_thread:
-                status_callback("Đã dừng")
-                break
-                
-            current_survey = index + 1
-            total_surveys = len(survey_links)
-            
-            status_callback(f"Đang làm khảo sát {current_survey}/{total_surveys}")
-            log_callback(f"Đang thực hiện khảo sát {current_survey}/{total_surveys}: {survey_link}")
-            
+    global profile_next_survey
+    # Supervisor cần biết khảo sát nào đã gửi, GUI host metrics cần các sự kiện của nó:
+    # gửi chúng kể cả khi dưới mức log
+    forward_types = (SurveyStarted, SurveyFinished)
+    if config.get('metrics_port', '').isdigit():
+        forward_types += PrometheusSink.EVENT_TYPES
+    sink = PipeSink(conn, forward_types=forward_types)
+    events = build_event_bus(config, sink)
+    finished = threading.Event()
+    if config.get('profile_survey') == '1':
+        profile_next_survey = True
+        sink.send(("ack", "profile"))
+
+    def listen() -> None:
+        global paused, profile_next_survey
+        while True:
             try:
-                # Navigate to survey
-                driver.get(survey_link)
-                
-                # Process survey pages
-                page_count = 0
-                max_pages = 10  # Safety limit to prevent infinite loops
-                
-                while page_count < max_pages:
-                    if stop_thread:
-                        break
-                        
-                    # Handle pause state - KIỂM TRA PAUSE NHIỀU LẦN HỖN
-                    while paused and not stop_thread:
-                        time.sleep(0.05)  # Giảm từ 0.1 xuống 0.05 để responsive hơn
-                        # Update status khi đang pause
-                        status_callback("Đã tạm dừng - Nhấn 'Tiếp tục' để tiếp tục")
-                    
-                    if stop_thread:
-                        break
-                    
-                    page_count += 1
-                    log_callback(f"Đang xử lý trang {page_count} của khảo sát {current_survey}")
-                    
-                    # KIỂM TRA PAUSE TRƯỚC KHI XỬ LÝ CÂU HỎI
-                    while paused and not stop_thread:
-                        time.sleep(0.05)  # Giảm delay pause check
-                        status_callback("Đã tạm dừng - Nhấn 'Tiếp tục' để tiếp tục")
-                    
-                    if stop_thread:
-                        break
-                    
-                    # Handle mandatory questions on current page
-                    if not find_and_select_comprehensive_questions(driver, log_callback):
-                        log_callback(f"[WARNING] Không thể trả lời tất cả câu hỏi bắt buộc ở trang {page_count}")
-                    
-                    # KIỂM TRA PAUSE TRƯỚC KHI CHUYỂN TRANG
-                    while paused and not stop_thread:
-                        time.sleep(0.05)  # Giảm delay pause check
-                        status_callback("Đã tạm dừng - Nhấn 'Tiếp tục' để tiếp tục")
-                    
-                    if stop_thread:
-                        break
-                    
-                    # Try to click next button
-                    if wait_for_element_and_click(driver, (By.ID, "movenextbtn"), timeout=5):
-                        log_callback(f"Đã chuyển sang trang tiếp theo (trang {page_count + 1})")
-                        # Wait for page transition - GIẢM DELAY
-                        time.sleep(0.5)  # Giảm từ 1s xuống 0.5s để tăng tốc
-                    else:
-                        # No more next button, try to submit
-                        log_callback("Không tìm thấy nút 'Tiếp theo', thử gửi khảo sát...")
-                        break
-                
-                # Submit the survey
-                if wait_for_element_and_click(driver, (By.ID, "movesubmitbtn"), timeout=10):
-                    log_callback(f"Đã gửi khảo sát {current_survey} thành công!")
-                    
-                    # Wait for submission to complete - GIẢM DELAY
-                    time.sleep(1)  # Giảm từ 2s xuống 1s để tăng tốc
-                    
-                    # Return to main survey page
-                    driver.get(survey_url)
-                    log_callback(f"Khảo sát {current_survey} hoàn thành, đã quay lại trang chính.")
-                    
-                else:
-                    log_callback(f"[ERROR] Không thể gửi khảo sát {current_survey}")
-                    
-            except Exception as e:
-                log_callback(f"[ERROR] Lỗi khi xử lý khảo sát {current_survey}: {e}")
-                continue
-        
-        if not stop_thread:
-            log_callback("Hoàn thành tất cả khảo sát!")
-            status_callback("Hoàn thành tất cả khảo sát!")
-        
-    except Exception as e:
-        log_callback(f"[ERROR] Lỗi không mong muốn: {e}")
-        status_callback("Lỗi: Đã xảy ra lỗi không mong muốn")
-        
+                command = conn.recv()
+            except (EOFError, OSError):
+                # GUI đã đóng: dừng luôn worker
+                cancel_token.cancel()
+                return
+            if command == "stop":
+                cancel_token.cancel()
+            elif command in ("pause", "resume"):
+                paused = command == "pause"
+            elif command in ("profile", "profile_off"):
+                profile_next_survey = command == "profile"
+                sink.send(("ack", command))
+
+    def send_metrics() -> None:
+        sink.send(("metrics", run_metrics.to_dict(), webdriver_commands.total, profile_next_survey,
+                   webdriver_commands.lifetime_snapshot()))
+
+    def publish_metrics() -> None:
+        while not finished.wait(1.0):
+            send_metrics()
+
+    threading.Thread(target=listen, daemon=True).start()
+    threading.Thread(target=publish_metrics, daemon=True).start()
+    try:
+        survey_main(config, events)
     finally:
-        if driver:
+        finished.set()
+        send_metrics()
+        sink.send(("done",))
+
+
+class WorkerSupervisor:
+    """
+    Chạy survey_main trong một tiến trình con và giám sát nó từ GUI.
+
+    Worker không tranh GIL với Qt main thread, và nếu tầng driver làm tiến trình
+    con chết bất thường thì nó được khởi động lại (tối đa max_restarts lần, cách nhau
+    restart_delay giây tăng dần) mà không mất cửa sổ. Trình duyệt còn sót của worker
+    chết được dừng; worker mới dùng lại phiên đăng nhập đã lưu và bỏ qua các khảo sát
+    đã gửi. Mỗi supervisor quản lý một lượt chạy độc lập.
+    """
+
+    def __init__(self, config: Dict[str, str], on_event: Callable[[Event], None], max_restarts: int = 2,
+                 profile_next: bool = False, metrics_sink: Optional[EventSink] = None,
+                 restart_delay: float = 2.0):
+        self.config = config
+        self.on_event = on_event
+        self.max_restarts = max_restarts
+        self.restart_delay = restart_delay
+        # Sink metrics của tiến trình GUI; sự kiện dưới mức log chỉ đến sink này
+        self.metrics_sink = metrics_sink
+        self.view_level = config_log_level(config)
+        # Snapshot lệnh WebDriver gần nhất của worker hiện tại, để cộng phần chênh lệch
+        self._commands_snapshot: Dict[str, List] = {}
+        # Yêu cầu profile mà worker chưa xác nhận; snapshot metrics cũ không được ghi đè nó
+        self.profile_pending = profile_next
+        self.restarts = 0
+        self.stopping = False
+        self._stop_requested = threading.Event()
+        # Khảo sát đã gửi qua mọi worker của lượt chạy; worker khởi động lại bỏ qua chúng
+        self.submitted_links: List[str] = []
+        self._started_links: Dict[int, str] = {}
+        # pid driver của worker hiện tại (từ snapshot metrics), để dừng trình duyệt còn sót
+        self.driver_pid: Optional[int] = None
+        self.process = None
+        self._conn = None
+        self._reader: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Spawn the worker process and the thread reading its messages."""
+        context = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = context.Pipe()
+        self._commands_snapshot = {}
+        self._started_links = {}
+        self.driver_pid = None
+        config = dict(self.config, profile_survey="1" if self.profile_pending else "0")
+        if self.restarts:
+            config.update(resume_session="1", skip_links="\n".join(self.submitted_links))
+        self.process = context.Process(target=worker_process_main, args=(config, child_conn), daemon=True)
+        self.process.start()
+        child_conn.close()
+        with self._lock:
+            self._conn = parent_conn
+        self._reader = threading.Thread(target=self._read_loop, args=(parent_conn,), daemon=True)
+        self._reader.start()
+
+    def send(self, command: str) -> None:
+        """Send a command (pause/resume/profile/profile_off/stop) to the worker."""
+        if command in ("profile", "profile_off"):
+            self.profile_pending = command == "profile"
+        with self._lock:
+            if self._conn is None:
+                return
             try:
-                driver.quit()
-                log_callback("[INFO] Đã đóng trình duyệt.")
-            except Exception:
+                self._conn.send(command)
+            except (OSError, EOFError):
                 pass
 
+    def is_alive(self) -> bool:
+        return bool(self._reader and self._reader.is_alive())
+
+    def stop(self, timeout: float = 3.0) -> None:
+        """Ask the worker to stop; terminate it if it does not exit in time."""
+        self.stopping = True
+        self._stop_requested.set()
+        self.send("stop")
+        process = self.process
+        if process is not None:
+            process.join(timeout)
+            if process.is_alive():
+                print("Worker process did not stop within the timeout, terminating")
+                process.terminate()
+                process.join(1.0)
+                # Worker bị terminate không kịp đóng trình duyệt của nó
+                kill_pid_tree(self.driver_pid)
+
+    def _read_loop(self, conn) -> None:
+        global profile_next_survey
+        finished = False
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == "event":
+                event_type = EVENT_TYPES.get(message[1])
+                if event_type is None:
+                    continue
+                event = event_type(**message[2])
+                if isinstance(event, SurveyStarted):
+                    self._started_links[event.index] = event.link
+                elif isinstance(event, SurveyFinished) and event.submitted and event.index in self._started_links:
+                    self.submitted_links.append(self._started_links[event.index])
+                if self.metrics_sink is not None and self.metrics_sink.accepts(event_type, event.event_level):
+                    self.metrics_sink.handle(event)
+                if (issubclass(event_type, QtViewSink.CONTROL_EVENTS)
+                        or event.event_level >= self.view_level):
+                    self.on_event(event)
+            elif message[0] == "metrics":
+                run_metrics.update_from(message[1])
+                self.driver_pid = message[1].get("browser_pid") or self.driver_pid
+                webdriver_commands.total = message[2]
+                profile_next_survey = message[3] or self.profile_pending
+                webdriver_commands.merge_lifetime(message[4], self._commands_snapshot)
+                self._commands_snapshot = message[4]
+            elif message[0] == "ack":
+                if message[1] in ("profile", "profile_off"):
+                    self.profile_pending = False
+            elif message[0] == "done":
+                finished = True
+        conn.close()
+        self.process.join(5.0)
+        run_metrics.active = False
+        if finished or self.stopping:
+            return
+        # Worker chết bất thường không kịp đóng trình duyệt của nó
+        kill_pid_tree(self.driver_pid)
+        if self.restarts >= self.max_restarts:
+            self.on_event(LogMessage(f"[ERROR] Tiến trình worker dừng bất thường (mã {self.process.exitcode}), "
+                                     "đã hết số lần khởi động lại.", ERROR))
+            self.on_event(StatusChanged("Lỗi: Tiến trình worker dừng bất thường"))
+            return
+        self.restarts += 1
+        if isinstance(self.metrics_sink, PrometheusSink):
+            self.metrics_sink.worker_restarted()
+        self.on_event(LogMessage(f"[WARNING] Tiến trình worker dừng bất thường (mã {self.process.exitcode}), "
+                                 f"khởi động lại lần {self.restarts}/{self.max_restarts}, bỏ qua "
+                                 f"{len(self.submitted_links)} khảo sát đã gửi...", WARNING))
+        if self._stop_requested.wait(self.restart_delay * self.restarts):
+            return
+        self.start()
+
+
+class EventLoopMonitor:
+    """
+    Đo độ trễ event loop của Qt: mỗi tick của một QTimer chính xác đến muộn bao nhiêu.
+
+    Một watchdog thread theo dõi nhịp tick; khi GUI thread đứng quá stall_threshold,
+    nó chụp Python stack của GUI thread và ghi cả đoạn đứng vào file log khi GUI
+    chạy lại, để báo cáo hiệu năng từ người dùng có sẵn dữ liệu.
+    """
+
+    def __init__(self, log_path: str, interval: float = 0.1, stall_threshold: float = 0.5):
+        self.log_path = log_path
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.lag = LatencyEstimator(window=600)
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._gui_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._expected: Optional[float] = None
+        self._stop = threading.Event()
+        self._timer = QTimer()
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+
+    def start(self) -> None:
+        """Start the tick timer (on the GUI thread) and the watchdog thread."""
+        self._expected = time.monotonic() + self.interval
+        self._timer.start(int(self.interval * 1000))
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._timer.stop()
+        self._stop.set()
+
+    def _tick(self) -> None:
+        now = time.monotonic()
+        if self._expected is not None:
+            lag = max(0.0, now - self._expected)
+            self.lag.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+        self._expected = now + self.interval
+        self._last_tick = now
+
+    def _watch(self) -> None:
+        stall_started = None
+        stack: List[str] = []
+        while not self._stop.wait(self.interval):
+            last_tick = self._last_tick
+            stalled = time.monotonic() - last_tick
+            if stall_started is None and stalled > self.stall_threshold:
+                stall_started = last_tick
+                frame = sys._current_frames().get(self._gui_thread_id)
+                stack = traceback.format_stack(frame) if frame is not None else []
+            elif stall_started is not None and last_tick != stall_started:
+                self.stalls += 1
+                self._write_stall(last_tick - stall_started, stack)
+                stall_started = None
+
+    def _write_stall(self, seconds: float, stack: List[str]) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} UI đứng {seconds * 1000:.0f} ms, "
+                        f"stack GUI thread:\n{''.join(stack)}\n")
+        except OSError:
+            pass
+
+    def summary(self) -> str:
+        """Short lag summary for the dashboard."""
+        p95 = self.lag.percentile(0.95)
+        return (f"UI trễ p95 {p95 * 1000:.0f} ms, tối đa {self.max_lag * 1000:.0f} ms, "
+                f"{self.stalls} lần đứng" if p95 is not None else "UI trễ --")
+
+
+class EventSignal(QObject):
+    """Signal class for thread-safe delivery of worker events."""
+    signal = pyqtSignal(object)
+
 
 class LogSignal(QObject):
     """Signal class for thread-safe logging."""
@@ -678,6 +5774,77 @@ class StatusSignal(QObject):
     signal = pyqtSignal(str)
 
 
+# Style riêng của trang khảo sát, chỉ được parse khi trang này được tạo
+SURVEY_PAGE_STYLE = """
+    QLabel#status_label {
+        color: #89b4fa;
+        font-size: 16px;
+        font-weight: bold;
+        background-color: #313244;
+        border: 2px solid #45475a;
+        border-radius: 8px;
+        padding: 12px;
+        margin: 10px 0;
+    }
+    QLabel#dashboard_label {
+        color: #a6adc8;
+        font-family: 'Consolas', 'Monaco', monospace;
+        font-size: 13px;
+        background-color: #181825;
+        border: 1px solid #45475a;
+        border-radius: 8px;
+        padding: 8px;
+    }
+    QLabel#login_banner {
+        color: #1e1e2e;
+        font-size: 14px;
+        font-weight: bold;
+        background-color: #f9e2af;
+        border-radius: 8px;
+        padding: 10px;
+    }
+"""
+
+
+def load_scaled_logo(logo_path: str, size: int = 150) -> Optional[QPixmap]:
+    """
+    Logo đã thu nhỏ, cache trong ~/.tool_khaosat/cache/ để lần khởi động sau không
+    phải giải mã ảnh gốc và smooth-scale lại.
+
+    Args:
+        logo_path: Path to the original logo
+        size: Bounding box of the scaled logo in pixels
+
+    Returns:
+        The scaled pixmap, or None if the logo cannot be loaded
+    """
+    if not os.path.exists(logo_path):
+        return None
+    cache_path = os.path.join(CONFIG_DIR, "cache", f"uit_logo_{size}_{int(os.path.getmtime(logo_path))}.png")
+    if os.path.exists(cache_path):
+        pixmap = QPixmap(cache_path)
+        if not pixmap.isNull():
+            return pixmap
+    pixmap = QPixmap(logo_path)
+    if pixmap.isNull():
+        return None
+    pixmap = pixmap.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        pixmap.save(cache_path, "PNG")
+    except OSError:
+        pass
+    return pixmap
+
+
+def print_startup_profile() -> None:
+    """Print the time spent in each startup phase (--profile-startup)."""
+    print("== Thời gian khởi động ==")
+    for (_, previous), (label, mark) in zip(startup_marks, startup_marks[1:]):
+        print(f"  {label:<24} {(mark - previous) * 1000:8.1f} ms")
+    print(f"  {'tổng':<24} {(startup_marks[-1][1] - startup_marks[0][1]) * 1000:8.1f} ms")
+
+
 class App(QMainWindow):
     """
     Main application class with improved UX and reliability.
@@ -705,16 +5872,6 @@ class App(QMainWindow):
                 color: #cdd6f4;
                 font-size: 14px;
             }
-            QLabel#status_label {
-                color: #89b4fa;
-                font-size: 16px;
-                font-weight: bold;
-                background-color: #313244;
-                border: 2px solid #45475a;
-                border-radius: 8px;
-                padding: 12px;
-                margin: 10px 0;
-            }
             QLineEdit {
                 background-color: #313244;
                 color: #cdd6f4;
@@ -746,15 +5903,6 @@ class App(QMainWindow):
                 background-color: #45475a;
                 color: #6c6f85;
             }
-            QTextEdit {
-                background-color: #313244;
-                color: #cdd6f4;
-                border: 1px solid #45475a;
-                border-radius: 5px;
-                font-family: 'Consolas', 'Monaco', monospace;
-                font-size: 13px;
-                line-height: 1.4;
-            }
             QFrame#form_frame {
                 background-color: #181825;
                 border: 1px solid #45475a;
@@ -774,34 +5922,47 @@ class App(QMainWindow):
                 font-weight: bold;
             }
         """)
+        startup_marks.append(("stylesheet", time.perf_counter()))
         
         # Create stacked widget for multiple screens
         self.stacked_widget = QStackedWidget()
         self.setCentralWidget(self.stacked_widget)
         
         # Setup config directory
-        config_dir = os.path.join(os.path.expanduser("~"), ".tool_khaosat")
-        if not os.path.exists(config_dir):
-            os.makedirs(config_dir)
-        self.config_file_path = os.path.join(config_dir, "config.txt")
+        if not os.path.exists(CONFIG_DIR):
+            os.makedirs(CONFIG_DIR)
+        self.config_file_path = os.path.join(CONFIG_DIR, "config.txt")
         
-        # Create login page and survey page
+        # Create login page; the survey page is built on first use
         self.create_login_page()
-        self.create_survey_page()
+        self.survey_widget = None
+        startup_marks.append(("login page", time.perf_counter()))
         
         # Load existing configuration
         self.load_existing_config()
+        startup_marks.append(("config", time.perf_counter()))
         
         # Setup signal connections for thread-safe operations
         self.log_signal = LogSignal()
         self.log_signal.signal.connect(self.update_log)
         self.status_signal = StatusSignal()
         self.status_signal.signal.connect(self.update_status_label)
+        self.event_signal = EventSignal()
+        self.event_signal.signal.connect(self.handle_event)
+        
+        # Worker of the current run (child process, or thread when worker_process=0)
+        self.worker_thread = None
+        self.supervisor = None
+        
+        # Đo độ trễ event loop, ghi các lần UI đứng kèm stack vào logs/ui-stalls.log
+        self.loop_monitor = EventLoopMonitor(os.path.join(CONFIG_DIR, "logs", "ui-stalls.log"))
+        self.loop_monitor.start()
         
         # Timer for periodic UI updates
         self.update_timer = QTimer()
         self.update_timer.timeout.connect(self.periodic_update)
         self.update_timer.start(1000)  # Update every second
+        startup_marks.append(("signals + timers", time.perf_counter()))
         
     def create_login_page(self) -> None:
         """Create the improved login page with streamlined UX."""
@@ -815,16 +5976,15 @@ class App(QMainWindow):
         logo_layout = QVBoxLayout(logo_frame)
         logo_label = QLabel()
         
-        # Try to load the logo
+        # Try to load the logo (scaled copy cached between launches)
         try:
             base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
-            logo_path = os.path.join(base_path, "uit_logo.png")
-            if os.path.exists(logo_path):
-                pixmap = QPixmap(logo_path)
-                logo_label.setPixmap(pixmap.scaled(150, 150, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+            pixmap = load_scaled_logo(os.path.join(base_path, "uit_logo.png"))
+            if pixmap is not None:
+                logo_label.setPixmap(pixmap)
             else:
                 raise FileNotFoundError("Logo file not found")
-        except Exception as e:
+        except Exception:
             # Create a text-based logo if image fails to load
             logo_label.setText("🎓 UIT")
             logo_label.setAlignment(Qt.AlignCenter)
@@ -951,9 +6111,16 @@ class App(QMainWindow):
         login_widget.setLayout(login_layout)
         self.stacked_widget.addWidget(login_widget)
         
+    def ensure_survey_page(self) -> None:
+        """Build the survey page the first time it is needed."""
+        if self.survey_widget is None:
+            self.create_survey_page()
+        
     def create_survey_page(self) -> None:
         """Create the improved survey page with status updates and streamlined controls."""
         survey_widget = QWidget()
+        survey_widget.setStyleSheet(SURVEY_PAGE_STYLE)
+        self.survey_widget = survey_widget
         survey_layout = QVBoxLayout()
         survey_layout.setSpacing(15)
         survey_layout.setContentsMargins(20, 20, 20, 20)
@@ -976,6 +6143,26 @@ class App(QMainWindow):
         self.status_label.setWordWrap(True)
         survey_layout.addWidget(self.status_label)
         
+        # Bảng số liệu trực tiếp - đọc từ run_metrics trên timer 1 giây
+        self.dashboard_label = QLabel()
+        self.dashboard_label.setObjectName("dashboard_label")
+        self.dashboard_label.setAlignment(Qt.AlignCenter)
+        self.dashboard_label.setWordWrap(True)
+        self.dashboard_label.hide()
+        self.dashboard_commands = (0, time.monotonic())
+        self.dashboard_memory = None
+        self.dashboard_ticks = 0
+        survey_layout.addWidget(self.dashboard_label)
+        
+        # Non-blocking login banner - tự ẩn khi phát hiện đăng nhập xong
+        self.login_banner = QLabel()
+        self.login_banner.setObjectName("login_banner")
+        self.login_banner.setAlignment(Qt.AlignCenter)
+        self.login_banner.setWordWrap(True)
+        self.login_banner.hide()
+        self.login_banner_started = None
+        survey_layout.addWidget(self.login_banner)
+        
         # Log text area with enhanced styling
         log_label = QLabel("📝 Nhật ký hoạt động:")
         log_label.setStyleSheet("font-weight: bold; color: #cdd6f4; margin-bottom: 5px;")
@@ -1009,6 +6196,12 @@ class App(QMainWindow):
         self.pause_button.setFixedSize(140, 45)
         self.pause_button.setToolTip("Tạm dừng hoặc tiếp tục quá trình thực hiện khảo sát")
         
+        # Profile one survey button
+        self.profile_button = QPushButton("🔬 Profile")
+        self.profile_button.clicked.connect(self.toggle_profile)
+        self.profile_button.setFixedSize(140, 45)
+        self.profile_button.setToolTip("Chạy cProfile cho khảo sát kế tiếp và lưu vào ~/.tool_khaosat/profiles/")
+        
         # Back to config button
         config_button = QPushButton("⚙️ Cấu hình")
         config_button.clicked.connect(self.show_config_frame)
@@ -1035,6 +6228,7 @@ class App(QMainWindow):
         exit_button.setToolTip("Thoát ứng dụng")
         
         button_layout.addWidget(self.pause_button)
+        button_layout.addWidget(self.profile_button)
         button_layout.addWidget(config_button)
         button_layout.addWidget(exit_button)
         button_layout.setAlignment(Qt.AlignCenter)
@@ -1051,10 +6245,12 @@ class App(QMainWindow):
             
     def save_config(self) -> None:
         """Save current configuration to file."""
-        cfg = {
+        # Giữ lại các tùy chọn khác trong file cấu hình (vd. dry_run)
+        cfg = read_config(self.config_file_path)
+        cfg.update({
             "email": self.id_input.text().strip(),
             "password": self.password_input.text().strip()
-        }
+        })
         
         if not cfg["email"] or not cfg["password"]:
             QMessageBox.warning(self, "Thiếu thông tin", 
@@ -1075,12 +6271,20 @@ class App(QMainWindow):
         # Save config first
         self.save_config()
         
+        # Không chạy chồng lên tiến trình trước khi nó chưa dừng hẳn
+        if (self.worker_thread is not None and self.worker_thread.is_alive()) or \
+           (self.supervisor is not None and self.supervisor.is_alive()):
+            QMessageBox.warning(self, "Đang dừng",
+                                "Tiến trình trước đang dừng, vui lòng thử lại sau giây lát.")
+            return
+        
         # Switch to survey page
+        self.ensure_survey_page()
         self.stacked_widget.setCurrentIndex(1)
         
         # Reset global states
-        global stop_thread, paused
-        stop_thread = False
+        global paused
+        cancel_token.reset()
         paused = False
         
         # Update status
@@ -1088,14 +6292,67 @@ class App(QMainWindow):
         
         # Load config
         config = read_config(self.config_file_path)
+        if "--dry-run" in sys.argv:
+            config["dry_run"] = "1"
+        if "--capture" in sys.argv:
+            config["capture"] = "1"
         
-        # Start survey thread with both log and status callbacks
+        # Metrics do tiến trình GUI phục vụ, nên tồn tại qua mọi lượt chạy và mọi worker
+        metrics = start_configured_metrics(config)
+        
+        # Start the worker in a child process; its events come back through the pipe
         self.log("🚀 Khởi động công cụ tự động khảo sát UIT v2.1...")
-        threading.Thread(
+        if config.get('worker_process', '1') != '0':
+            self.worker_thread = None
+            self.supervisor = WorkerSupervisor(config, self.event_signal.signal.emit,
+                                               profile_next=profile_next_survey, metrics_sink=metrics)
+            self.supervisor.start()
+            return
+        
+        # Start survey thread with both log and status callbacks
+        self.supervisor = None
+        events = build_event_bus(config, QtViewSink(self.event_signal.signal.emit))
+        if metrics is not None:
+            events.add_sink(metrics)
+        self.worker_thread = threading.Thread(
             target=survey_main, 
-            args=(config, self.log, self.update_status), 
+            args=(config, events), 
             daemon=True
-        ).start()
+        )
+        self.worker_thread.start()
+        
+    def closeEvent(self, event) -> None:
+        """Stop the worker and its browser before the window (and the process) goes away."""
+        self.stop_worker().join(5.0)
+        super().closeEvent(event)
+        
+    def stop_worker(self, join_timeout: float = 3.0) -> threading.Thread:
+        """
+        Stop the worker without blocking the UI thread.
+        
+        The cancel token (sent as a "stop" command to a worker process) wakes every
+        in-flight wait immediately; aborting the driver and joining the worker
+        happen on a separate stopper thread.
+        
+        Returns:
+            The stopper thread
+        """
+        worker = self.worker_thread
+        supervisor = self.supervisor
+        
+        def stopper():
+            if supervisor is not None:
+                supervisor.stop(join_timeout)
+                return
+            cancel_token.cancel()
+            if worker is not None:
+                worker.join(join_timeout)
+                if worker.is_alive():
+                    print("Worker did not stop within the timeout")
+        
+        stopper_thread = threading.Thread(target=stopper)
+        stopper_thread.start()
+        return stopper_thread
         
     def log(self, msg: str) -> None:
         """Thread-safe logging method."""
@@ -1105,60 +6362,50 @@ class App(QMainWindow):
         """Thread-safe status update method."""
         self.status_signal.signal.emit(status)
         
-    def update_log(self, msg: str) -> None:
-        """Handle log message updates in the main thread."""
-        if msg == "@SHOW_LOGIN_MESSAGE@":
-            # Show streamlined login completion dialog
-            msgBox = QMessageBox(self)
-            msgBox.setIcon(QMessageBox.Information)
-            msgBox.setWindowTitle("Hoàn tất đăng nhập")
-            msgBox.setText("Vui lòng hoàn tất đăng nhập (nhập CAPTCHA nếu có),\nrồi nhấn OK để bắt đầu tự động thực hiện khảo sát.")
-            msgBox.setStandardButtons(QMessageBox.Ok)
-            
-            # Apply custom styling to message box
-            msgBox.setStyleSheet("""
-                QMessageBox {
-                    background-color: #1e1e2e;
-                    color: #cdd6f4;
-                }
-                QMessageBox QLabel {
-                    color: #cdd6f4;
-                    font-size: 14px;
-                }
-                QMessageBox QPushButton {
-                    background-color: #a6e3a1;
-                    color: #1e1e2e;
-                    border: none;
-                    border-radius: 4px;
-                    padding: 8px 16px;
-                    font-weight: bold;
-                    min-width: 80px;
-                }
-            """)
-            
-            msgBox.exec_()
+    def handle_event(self, event: Event) -> None:
+        """Handle a worker event in the main thread; text is formatted only here."""
+        self.ensure_survey_page()
+        if isinstance(event, StatusChanged):
+            self.update_status_label(event.text)
+        elif isinstance(event, LoginPrompt):
+            if event.active:
+                # Show non-blocking login banner; the worker detects completion itself
+                self.login_banner_started = time.monotonic()
+                self.refresh_login_banner()
+                self.login_banner.show()
+            else:
+                self.login_banner_started = None
+                self.login_banner.hide()
         else:
-            # Add timestamp to log messages
-            import datetime
-            timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-            formatted_msg = f"[{timestamp}] {msg}"
+            self.update_log(event.format())
             
-            self.log_text.append(formatted_msg)
-            
-            # Auto scroll to bottom
-            cursor = self.log_text.textCursor()
-            cursor.movePosition(cursor.End)
-            self.log_text.setTextCursor(cursor)
+    def update_log(self, msg: str) -> None:
+        """Handle log message updates in the main thread."""
+        # Add timestamp to log messages
+        import datetime
+        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+        formatted_msg = f"[{timestamp}] {msg}"
+        
+        self.ensure_survey_page()
+        self.log_text.append(formatted_msg)
+        
+        # Auto scroll to bottom
+        cursor = self.log_text.textCursor()
+        cursor.movePosition(cursor.End)
+        self.log_text.setTextCursor(cursor)
             
     def update_status_label(self, status: str) -> None:
         """Update the status label in the main thread."""
-        if hasattr(self, 'status_label'):
-            self.status_label.setText(status)
+        self.ensure_survey_page()
+        self.status_label.setText(status)
             
     def toggle_pause(self) -> None:
         """Toggle pause/resume functionality with improved UX."""
         global paused
         
+        if self.supervisor is not None:
+            self.supervisor.send("resume" if paused else "pause")
+        
         if paused:
             paused = False
             self.pause_button.setText("⏸️ Tạm dừng")
@@ -1181,10 +6428,23 @@ class App(QMainWindow):
             self.log("⏸️ Đã tạm dừng quá trình thực hiện.")
             self.update_status("Đã tạm dừng")
         
+    def toggle_profile(self) -> None:
+        """Request (or cancel) profiling of the next survey."""
+        global profile_next_survey
+        
+        profile_next_survey = not profile_next_survey
+        if self.supervisor is not None:
+            self.supervisor.send("profile" if profile_next_survey else "profile_off")
+        self.refresh_profile_button()
+        if profile_next_survey:
+            self.log("🔬 Sẽ profile khảo sát kế tiếp.")
+        
+    def refresh_profile_button(self) -> None:
+        """Reset the profile button once the worker has taken the request."""
+        self.profile_button.setText("🔬 Chờ profile..." if profile_next_survey else "🔬 Profile")
+        
     def show_config_frame(self) -> None:
         """Return to configuration page."""
-        global stop_thread
-        
         reply = QMessageBox.question(
             self, 
             "Quay lại cấu hình", 
@@ -1194,19 +6454,59 @@ class App(QMainWindow):
         )
         
         if reply == QMessageBox.Yes:
-            stop_thread = True
+            self.stop_worker()
             self.stacked_widget.setCurrentIndex(0)
             self.log("🔄 Đã quay lại trang cấu hình.")
             
+    def refresh_login_banner(self) -> None:
+        """Update the login banner text with the time spent waiting."""
+        if self.login_banner_started is None:
+            return
+        waited = int(time.monotonic() - self.login_banner_started)
+        self.login_banner.setText(
+            "🔐 Vui lòng hoàn tất đăng nhập trên trình duyệt (nhập CAPTCHA nếu có).\n"
+            f"Công cụ sẽ tự tiếp tục ngay khi đăng nhập xong... ({waited}s)"
+        )
+        
+    def refresh_dashboard(self) -> None:
+        """Redraw the live throughput/ETA figures from the shared run_metrics."""
+        now = time.monotonic()
+        commands = webdriver_commands.total
+        last_commands, last_time = self.dashboard_commands
+        self.dashboard_commands = (commands, now)
+        if not run_metrics.active:
+            self.dashboard_label.hide()
+            return
+        
+        commands_per_second = max(0, commands - last_commands) / max(now - last_time, 1e-3)
+        # Đo bộ nhớ phải duyệt cả cây tiến trình nên chỉ đo mỗi 5 giây
+        if self.dashboard_ticks % 5 == 0:
+            self.dashboard_memory = browser_memory_mb(run_metrics.browser_pid)
+        self.dashboard_ticks += 1
+        
+        seconds_per_page = run_metrics.seconds_per_page
+        memory = self.dashboard_memory
+        self.dashboard_label.setText(
+            f"⚡ {run_metrics.surveys_per_minute:.2f} khảo sát/phút · "
+            f"{f'{seconds_per_page:.1f}' if seconds_per_page is not None else '--'} s/trang · "
+            f"còn ~{run_metrics.pages_remaining:.0f} trang · ETA {format_duration(run_metrics.eta_now())}\n"
+            f"🤖 {commands_per_second:.1f} lệnh WebDriver/s · "
+            f"🧠 trình duyệt {f'{memory:.0f} MB' if memory is not None else '--'} · "
+            f"⏳ giới hạn tốc độ {run_metrics.throttled_seconds:.0f}s · "
+            f"{self.loop_monitor.summary()}"
+        )
+        self.dashboard_label.show()
+        
     def periodic_update(self) -> None:
         """Periodic UI updates."""
-        # This method can be used for any periodic UI updates if needed
-        pass
+        if self.survey_widget is None:
+            return
+        self.refresh_login_banner()
+        self.refresh_dashboard()
+        self.refresh_profile_button()
         
     def exit_tool(self) -> None:
         """Exit the application with proper cleanup."""
-        global stop_thread, driver
-        
         reply = QMessageBox.question(
             self, 
             "Xác nhận thoát", 
@@ -1216,22 +6516,62 @@ class App(QMainWindow):
         )
         
         if reply == QMessageBox.Yes:
-            stop_thread = True
-            
-            # Try to close browser gracefully
-            if driver:
-                try:
-                    driver.quit()
-                    self.log("🌐 Đã đóng trình duyệt.")
-                except Exception:
-                    pass
+            # Dừng worker và đóng trình duyệt trên stopper thread, không chặn UI
+            self.stop_worker()
                     
             self.log("👋 Cảm ơn bạn đã sử dụng Tool Khảo Sát UIT!")
             self.close()
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    
+    if "--report" in sys.argv:
+        print_history_report(HISTORY_DB_PATH)
+        sys.exit(0)
+    if "--replay" in sys.argv:
+        # --replay [thư mục]: mặc định là lần ghi gần nhất; --no-browser chỉ chạy bộ phân loại
+        position = sys.argv.index("--replay")
+        captures_dir = os.path.join(CONFIG_DIR, "captures")
+        if position + 1 < len(sys.argv) and not sys.argv[position + 1].startswith("--"):
+            capture_dir = sys.argv[position + 1]
+        else:
+            runs = sorted(os.listdir(captures_dir)) if os.path.isdir(captures_dir) else []
+            capture_dir = os.path.join(captures_dir, runs[-1]) if runs else captures_dir
+        backend = None if "--no-browser" in sys.argv else select_browser_backend(read_config(
+            os.path.join(CONFIG_DIR, "config.txt")) or {})
+        sys.exit(1 if replay_captures(capture_dir, backend) else 0)
+    if "--bench-classifier" in sys.argv:
+        # --bench-classifier [số câu hỏi]
+        position = sys.argv.index("--bench-classifier")
+        size = sys.argv[position + 1] if position + 1 < len(sys.argv) else ""
+        bench_classifier(int(size) if size.isdigit() else 20000)
+        sys.exit(0)
+    if "--bench-transport" in sys.argv:
+        # --bench-transport [số vòng lệnh]
+        position = sys.argv.index("--bench-transport")
+        rounds = sys.argv[position + 1] if position + 1 < len(sys.argv) else ""
+        sys.exit(0 if bench_webdriver_transport(int(rounds) if rounds.isdigit() else 300) else 1)
+    if "--bench-startup" in sys.argv:
+        sys.exit(0 if bench_browser_startup(headless="--headless" in sys.argv) else 1)
+    if "--watch" in sys.argv:
+        # --watch [phút giữa hai lần kiểm tra]
+        position = sys.argv.index("--watch")
+        minutes = sys.argv[position + 1] if position + 1 < len(sys.argv) else ""
+        watch_config = read_config(os.path.join(CONFIG_DIR, "config.txt")) or {}
+        sys.exit(0 if watch_surveys(watch_config, (int(minutes) if minutes.isdigit() else 10) * 60) else 1)
+    if "--profile-survey" in sys.argv:
+        profile_next_survey = True
+    
+    startup_marks.append(("module body", time.perf_counter()))
     app = QApplication(sys.argv)
+    startup_marks.append(("QApplication", time.perf_counter()))
     window = App()
     window.show()
+    startup_marks.append(("show", time.perf_counter()))
+    if "--profile-startup" in sys.argv:
+        def first_paint():
+            startup_marks.append(("first event loop pass", time.perf_counter()))
+            print_startup_profile()
+        QTimer.singleShot(0, first_paint)
     sys.exit(app.exec_()) 
\ No newline at end of file
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Survey.py là script một file ở thư mục gốc; PyQt5 cần platform offscreen khi không có màn hình
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,148 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+import Survey
+from Survey import AsyncHttpPool, PortalRateLimiter, async_click_and_wait
+
+
+# --- AsyncHttpPool._read_response -------------------------------------------
+
+def read_response(raw: bytes):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await Survey.AsyncHttpPool._read_response(reader), await reader.read()
+
+    return asyncio.run(run())
+
+
+def test_read_response_content_length_leaves_next_response():
+    (status, headers, body), rest = read_response(
+        b"HTTP/1.1 200 OK\r\nContent-Length: 11\r\nContent-Type: application/json\r\n\r\n"
+        b'{"value":1}HTTP/1.1 204')
+    assert status == 200
+    assert headers["content-type"] == "application/json"
+    assert body == b'{"value":1}'
+    assert rest == b"HTTP/1.1 204"
+
+
+def test_read_response_chunked():
+    (status, headers, body), rest = read_response(
+        b"HTTP/1.1 404 Not Found\r\nTransfer-Encoding: chunked\r\n\r\n"
+        b"4\r\n{\"va\r\n7;ext=1\r\nlue\":2}\r\n0\r\n\r\n")
+    assert status == 404
+    assert body == b'{"value":2}'
+    assert rest == b""
+
+
+def test_read_response_until_close():
+    (status, headers, body), _ = read_response(b"HTTP/1.0 200 OK\r\n\r\n{}")
+    assert body == b"{}"
+    assert headers["connection"] == "close"
+
+
+def test_read_response_closed_connection():
+    with pytest.raises(ConnectionError):
+        read_response(b"")
+
+
+# --- AsyncHttpPool timeouts -------------------------------------------------
+
+@pytest.fixture
+def silent_server():
+    """A server that accepts connections and never answers."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    accepted = []
+    stop = threading.Event()
+
+    def accept():
+        server.settimeout(0.05)
+        while not stop.is_set():
+            try:
+                accepted.append(server.accept()[0])
+            except OSError:
+                continue
+
+    thread = threading.Thread(target=accept, daemon=True)
+    thread.start()
+    yield server.getsockname()[1]
+    stop.set()
+    thread.join()
+    for connection in accepted:
+        connection.close()
+    server.close()
+
+
+def test_request_times_out_on_hung_socket(silent_server):
+    async def run():
+        pool = AsyncHttpPool("127.0.0.1", silent_server, read_timeout=0.2)
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            await pool.request("GET", "/status")
+        # Kết nối dở dang không được đưa lại vào pool
+        assert pool._idle == []
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) < 2.0
+
+
+# --- async_click_and_wait ---------------------------------------------------
+
+class ClickSession:
+    """Session whose page goes through the given CLICK_STATE_JS states after the click."""
+
+    def __init__(self, states, status=200):
+        self.states = list(states)
+        self.status = status
+
+    async def click(self, element):
+        pass
+
+    async def execute_script(self, script, *args):
+        if script is Survey.CLICK_STATE_JS:
+            return self.states.pop(0) if len(self.states) > 1 else self.states[0]
+        return None
+
+    async def report_navigation_status(self):
+        if self.status in PortalRateLimiter.RETRY_STATUS:
+            Survey.portal_limiter.report_failure()
+            return True
+        return False
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = PortalRateLimiter(rate=0, base_delay=0.0)
+    monkeypatch.setattr(Survey, "portal_limiter", limiter)
+    return limiter
+
+
+def click(session, **kwargs):
+    return asyncio.run(async_click_and_wait(session, {}, **kwargs))
+
+
+def test_click_that_loads_next_page(limiter):
+    assert click(ClickSession(["leaving", "loading", "loaded"])) is True
+    assert limiter.backoffs == 0
+
+
+def test_click_rejected_by_page_validation_is_not_a_portal_failure(limiter):
+    assert click(ClickSession(["same"]), timeout=5.0, stay_grace=0.1) is False
+    assert limiter.backoffs == 0
+
+
+def test_click_navigation_timeout_backs_off(limiter):
+    assert click(ClickSession(["leaving"]), timeout=0.3) is False
+    assert limiter.backoffs == 1
+
+
+def test_click_overloaded_portal_backs_off(limiter):
+    assert click(ClickSession(["loaded"], status=503)) is False
+    assert limiter.backoffs == 1
@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import Survey
+
+
+# --- kill_process_tree ------------------------------------------------------
+
+@pytest.mark.skipif(os.name == "nt", reason="process groups are POSIX only")
+def test_kill_process_tree_stops_grandchildren_without_psutil(monkeypatch):
+    monkeypatch.setitem(sys.modules, "psutil", None)  # import psutil -> ImportError
+    process = subprocess.Popen(["sh", "-c", "sleep 60 & echo $!; wait"], stdout=subprocess.PIPE,
+                               **Survey.DRIVER_POPEN_KW)
+    grandchild = int(process.stdout.readline())
+    Survey.kill_process_tree(process)
+    process.wait(timeout=5)
+    process.stdout.close()
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            os.kill(grandchild, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.05)
+    else:
+        pytest.fail("grandchild still running")
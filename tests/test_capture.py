@@ -0,0 +1,41 @@
+import zipfile
+
+import Survey
+
+
+# --- Ẩn dữ liệu cá nhân -----------------------------------------------------
+
+PERSONAL_PAGE = ("<h1>Xin chào bạn Trần Thị B!</h1><p>Chào mừng bạn đến với khảo sát</p>"
+                 "<p>Họ và tên: Nguyễn Văn A</p><span>MSSV: 21520001</span>"
+                 "<input name=\"123456X12X345\" value=\"A1\">")
+
+
+def test_redact_personal_data_keeps_labels_and_structure():
+    terms = Survey.personal_terms({"email": "21520001@gm.uit.edu.vn"})
+    assert terms == ["21520001@gm.uit.edu.vn", "21520001"]
+    redacted = Survey.redact_personal_data(PERSONAL_PAGE, terms)
+    for secret in ("Trần Thị B", "Nguyễn Văn A", "21520001"):
+        assert secret not in redacted
+    assert "Họ và tên: [đã ẩn]" in redacted
+    assert "Chào mừng bạn đến với khảo sát" in redacted
+    assert 'name="123456X12X345" value="A1"' in redacted
+    model = {"radios": [{"name": "q1", "question": "Sinh viên: Lê C, lớp KHMT", "selected": False}]}
+    assert Survey.redact_personal_data(model)["radios"][0] == {
+        "name": "q1", "question": "Sinh viên: [đã ẩn], lớp KHMT", "selected": False}
+
+
+def test_page_recorder_and_diagnostics_write_redacted(tmp_path):
+    recorder = Survey.PageRecorder(str(tmp_path / "captures"), ["21520001"])
+    recorder.record(1, 1, "fp", PERSONAL_PAGE, {"title": "Khảo sát của 21520001"},
+                    [{"kind": "radio", "name": "q1", "label": "Rất tốt"}])
+    writer = Survey.DiagnosticsWriter(str(tmp_path / "diagnostics"))
+    writer.submit("s01", {"html": PERSONAL_PAGE, "title": "MSSV: 21520001", "error": "x"}, None)
+    writer.close()
+
+    written = [(tmp_path / "captures" / name).read_text(encoding="utf-8") for name in ("s01-p01.html", "s01-p01.json")]
+    with zipfile.ZipFile(str(tmp_path / "diagnostics" / "s01.zip")) as archive:
+        written += [archive.read(name).decode("utf-8") for name in ("page.html", "info.json")]
+    for content in written:
+        assert "21520001" not in content
+        assert "Nguyễn Văn A" not in content
+    assert "Rất tốt" in written[1]
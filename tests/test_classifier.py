@@ -0,0 +1,64 @@
+import pytest
+
+from Survey import (SYNTHETIC_FORMS, fold_text, generate_question_corpus,
+                    select_best_answer_for_group, synthetic_text_form)
+
+
+SATISFACTION = ["Không hài lòng", "Bình thường", "Hài lòng", "Rất hài lòng"]
+
+
+@pytest.mark.parametrize("form", SYNTHETIC_FORMS)
+def test_negated_keyword_is_never_chosen(form):
+    labels = [synthetic_text_form(label, form) for label in SATISFACTION]
+    question = synthetic_text_form("Anh/chị có hài lòng về cơ sở vật chất?", form)
+    index, _ = select_best_answer_for_group(question, labels, ["A1", "A2", "A3", "A4"])
+    assert index == 3
+
+
+def test_disagree_scale_without_numeric_values_picks_full_agreement():
+    labels = ["hoàn toàn không đồng ý", "không đồng ý", "đồng ý", "hoàn toàn đồng ý"]
+    index, _ = select_best_answer_for_group("tài liệu được cung cấp đầy đủ", labels, ["", "", "", ""])
+    assert index == 3
+
+
+@pytest.mark.parametrize("top", [">80%", "> 80%", "Trên 80%", "trên 80 %", "Từ 80% trở lên", "81% - 100%"])
+@pytest.mark.parametrize("form", SYNTHETIC_FORMS)
+def test_attendance_picks_highest_range(top, form):
+    labels = [synthetic_text_form(label, form) for label in ("Dưới 50%", "Từ 50% đến 80%", top)]
+    question = synthetic_text_form("Tỷ lệ thời gian anh/chị lên lớp đối với môn học?", form)
+    assert select_best_answer_for_group(question, labels, ["A1", "A2", "A3"])[0] == 2
+
+
+def test_outcome_picks_70_to_90():
+    labels = ["dưới 50%", "từ 50 đến dưới 70%", "từ 70 đến dưới 90%", "từ 90% trở lên"]
+    index, _ = select_best_answer_for_group("mức độ đạt được chuẩn đầu ra (%)", labels, ["A1", "A2", "A3", "A4"])
+    assert index == 2
+
+
+def test_rating_picks_highest_value():
+    labels = ["1 - kém", "2", "3", "4 - tốt"]
+    assert select_best_answer_for_group("giảng viên dạy dễ hiểu", labels, ["4", "3", "2", "1"])[0] == 0
+
+
+def test_fold_text_variants_match():
+    folded = {fold_text(synthetic_text_form("Trên 80 %", form)) for form in SYNTHETIC_FORMS}
+    assert folded == {"tren 80%"}
+
+
+def test_corpus_is_deterministic_and_varied():
+    corpus = generate_question_corpus(400, seed=3)
+    assert corpus == generate_question_corpus(400, seed=3)
+    assert corpus != generate_question_corpus(400, seed=4)
+    assert {item["category"] for item in corpus} == {"attendance", "outcome", "rating", "other"}
+    assert {item["form"] for item in corpus} == set(SYNTHETIC_FORMS)
+    for item in corpus:
+        assert len(item["labels"]) == len(item["values"])
+        assert 0 <= item["expected"] < len(item["labels"])
+
+
+def test_classifier_answers_whole_corpus():
+    corpus = generate_question_corpus(2000, seed=0)
+    wrong = [item for item in corpus
+             if select_best_answer_for_group(item["question"], item["labels"], item["values"])[0]
+             != item["expected"]]
+    assert wrong == []
@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from Survey import browser_memory_mb, proc_tree_memory_mb
+
+pytestmark = pytest.mark.skipif(not os.path.isdir("/proc"), reason="đọc bộ nhớ qua /proc")
+
+
+def test_browser_memory_without_psutil_sums_process_tree(monkeypatch):
+    monkeypatch.setitem(sys.modules, "psutil", None)
+    alone = browser_memory_mb(os.getpid())
+    assert alone is not None and alone > 0
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        assert browser_memory_mb(os.getpid()) > alone
+    finally:
+        child.kill()
+        child.wait()
+
+
+def test_browser_memory_unknown(monkeypatch):
+    monkeypatch.setitem(sys.modules, "psutil", None)
+    assert browser_memory_mb(None) is None
+    child = subprocess.Popen([sys.executable, "-c", "pass"])
+    child.wait()
+    assert proc_tree_memory_mb(child.pid) is None
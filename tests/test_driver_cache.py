@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+from Survey import BrowserBackend, DriverCache
+
+
+def make_driver(tmp_path, name="msedgedriver"):
+    path = tmp_path / name
+    path.write_bytes(b"")
+    return str(path)
+
+
+# --- DriverCache ------------------------------------------------------------
+
+def test_driver_cache_round_trip_and_discard(tmp_path):
+    driver_path = make_driver(tmp_path)
+    cache = DriverCache(str(tmp_path / "cache" / "driver.json"), lambda: "120.0.2210.91")
+    assert cache.cached_path() is None
+    cache.remember(driver_path, "120.0.2210.91", "120.0.2210.61")
+    assert cache.cached_path() == driver_path
+    cache.discard()
+    assert cache.cached_path() is None
+
+
+def test_driver_cache_invalidated_by_major_browser_upgrade(tmp_path):
+    installed = {"version": "120.0.2210.91"}
+    cache = DriverCache(str(tmp_path / "driver.json"), lambda: installed["version"])
+    driver_path = make_driver(tmp_path)
+    cache.remember(driver_path, "120.0.2210.91", "120.0.2210.61")
+    installed["version"] = "121.0.2277.83"
+    assert cache.cached_path() is None
+    # Không đọc được phiên bản trình duyệt: vẫn thử driver đã lưu
+    installed["version"] = None
+    assert cache.cached_path() == driver_path
+
+
+def test_driver_cache_ignores_missing_binary(tmp_path):
+    cache = DriverCache(str(tmp_path / "driver.json"), lambda: None)
+    cache.remember(str(tmp_path / "missing"), "1", "1")
+    assert cache.load() is None
+    driver_path = make_driver(tmp_path)
+    cache.remember(driver_path, "1", "1")
+    (tmp_path / "msedgedriver").unlink()
+    assert cache.cached_path() is None
+
+
+# --- BrowserBackend.start ---------------------------------------------------
+
+class FakeBackend(BrowserBackend):
+    name = "fake"
+
+    def __init__(self, cache, resolved_path, broken=()):
+        super().__init__()
+        self.driver_cache = cache
+        self.resolved_path = resolved_path
+        self.broken = set(broken)
+        self.services = []
+
+    def build_options(self, headless):
+        return {"headless": headless}
+
+    def make_service(self, driver_path):
+        return driver_path
+
+    def create(self, options, service=None):
+        self.services.append(service)
+        if service in self.broken:
+            raise RuntimeError("session not created")
+        return SimpleNamespace(service=SimpleNamespace(path=service or self.resolved_path),
+                               capabilities={"browserVersion": "120.0.2210.61"})
+
+
+def test_backend_resolves_once_then_uses_cached_driver(tmp_path):
+    resolved = make_driver(tmp_path)
+    cache = DriverCache(str(tmp_path / "driver.json"), lambda: "120.0.2210.91")
+    backend = FakeBackend(cache, resolved)
+    backend.start()
+    backend.start()
+    assert backend.services == [None, resolved]
+
+
+def test_backend_discards_broken_cached_driver(tmp_path):
+    stale = make_driver(tmp_path, "stale")
+    resolved = make_driver(tmp_path)
+    cache = DriverCache(str(tmp_path / "driver.json"), lambda: "120.0.2210.91")
+    cache.remember(stale, "119", "120.0.2210.61")
+    backend = FakeBackend(cache, resolved, broken=[stale])
+    backend.start()
+    assert backend.services == [stale, None]
+    assert cache.cached_path() == resolved
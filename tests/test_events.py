@@ -0,0 +1,57 @@
+import pytest
+
+import Survey
+from Survey import EventBus, EventSink, LogMessage, RunFinished, Timing
+
+
+class ListSink(EventSink):
+    def __init__(self, level=Survey.INFO, types=None):
+        super().__init__(level, types)
+        self.events = []
+
+    def handle(self, event):
+        self.events.append(event)
+
+
+# --- EventBus ---------------------------------------------------------------
+
+def test_event_bus_wants_follows_sink_levels_and_types():
+    bus = EventBus()
+    assert not bus.wants(LogMessage)
+    sink = bus.add_sink(ListSink(Survey.WARNING, (LogMessage,)))
+    assert bus.wants(LogMessage, Survey.ERROR)
+    assert not bus.wants(LogMessage, Survey.INFO)
+    assert not bus.wants(Timing)
+    bus.log("thông tin")
+    bus.log("[ERROR] lỗi")
+    assert [event.text for event in sink.events] == ["[ERROR] lỗi"]
+    bus.remove_sink(sink)
+    assert not bus.wants(LogMessage, Survey.ERROR)
+
+
+def test_event_bus_isolates_failing_sinks_and_closes_all():
+    class Broken(ListSink):
+        def handle(self, event):
+            raise RuntimeError("boom")
+
+        def close(self):
+            raise RuntimeError("boom")
+
+    closed = []
+
+    class Closing(ListSink):
+        def close(self):
+            closed.append(self)
+
+    bus = EventBus()
+    bus.add_sink(Broken())
+    good = bus.add_sink(Closing())
+    bus.emit(RunFinished("completed", 1, 0))
+    assert len(good.events) == 1
+    bus.close()
+    assert closed == [good]
+
+
+def test_event_sink_requires_handle():
+    with pytest.raises(TypeError):
+        EventSink()
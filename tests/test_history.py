@@ -0,0 +1,112 @@
+import sqlite3
+import time
+
+import pytest
+
+from Survey import (CommandCounter, HistorySink, PageScanned, RunFinished, RunHistoryStore,
+                    RunStarted, SurveyFinished, SurveyStarted, Timing, print_history_report,
+                    semester_label)
+
+
+def local_time(year, month, day=15):
+    return time.mktime((year, month, day, 12, 0, 0, 0, 0, -1))
+
+
+@pytest.mark.parametrize("month, label", [
+    (9, "2025-2026 HK1"), (12, "2025-2026 HK1"),
+    (2, "2024-2025 HK2"), (6, "2024-2025 HK2"),
+    (7, "2024-2025 HK3"), (8, "2024-2025 HK3"),
+])
+def test_semester_label(month, label):
+    assert semester_label(local_time(2025, month)) == label
+
+
+def test_semester_label_january_belongs_to_previous_autumn():
+    assert semester_label(local_time(2026, 1)) == "2025-2026 HK1"
+
+
+def rows(db_path, sql):
+    connection = sqlite3.connect(db_path)
+    try:
+        return connection.execute(sql).fetchall()
+    finally:
+        connection.close()
+
+
+def test_run_history_store_flushes_queued_writes_on_close(tmp_path):
+    db_path = str(tmp_path / "nested" / "history.db")
+    store = RunHistoryStore(db_path, batch_size=2, flush_interval=0.05)
+    for phase in ("navigate", "plan", "apply"):
+        store.execute("INSERT INTO phases VALUES (?, ?, ?, ?)", (1, 1, phase, 0.5))
+    store.close()
+    assert rows(db_path, "SELECT phase FROM phases") == [("navigate",), ("plan",), ("apply",)]
+
+
+def test_history_sink_records_run_surveys_pages_and_phases(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    commands = CommandCounter()
+    sink = HistorySink(RunHistoryStore(db_path), commands)
+    link = "https://survey.uit.edu.vn/index.php/123456?token=a"
+    sink.handle(RunStarted(False))
+    sink.handle(SurveyStarted(1, 1, link))
+    sink.handle(PageScanned(1, 1, "fp1", False, 3, 2.0))
+    commands.add("executeScript")
+    sink.handle(Timing("apply", 0.25))
+    sink.handle(PageScanned(1, 2, "fp2", True, 1, 0.1))
+    commands.add("clickElement")
+    sink.handle(SurveyFinished(1, True, 2, 9.5))
+    sink.handle(RunFinished("completed", 1, 0))
+    sink.close()
+
+    assert rows(db_path, "SELECT outcome, surveys_done, surveys_failed, webdriver_commands FROM runs") == [
+        ("completed", 1, 0, 2)]
+    assert rows(db_path, "SELECT idx, link, form_key, pages, submitted, webdriver_commands FROM surveys") == [
+        (1, link, "123456", 2, 1, 2)]
+    assert rows(db_path, "SELECT survey_idx, page, fingerprint, from_cache FROM pages") == [
+        (1, 1, "fp1", 0), (1, 2, "fp2", 1)]
+    assert rows(db_path, "SELECT survey_idx, phase FROM phases") == [(1, "apply")]
+
+
+def test_print_history_report(tmp_path, capsys):
+    db_path = str(tmp_path / "history.db")
+    print_history_report(db_path)
+    assert "Chưa có lịch sử chạy" in capsys.readouterr().out
+
+    sink = HistorySink(RunHistoryStore(db_path), CommandCounter())
+    sink.handle(RunStarted(False))
+    sink.handle(SurveyStarted(1, 1, "https://survey.uit.edu.vn/index.php/1?token=a"))
+    sink.handle(PageScanned(1, 1, "abcdef0123456789", False, 3, 2.0))
+    sink.handle(SurveyFinished(1, True, 1, 12.0))
+    sink.handle(RunFinished("completed", 1, 0))
+    sink.close()
+
+    print_history_report(db_path)
+    out = capsys.readouterr().out
+    assert f"{semester_label(time.time())}: 12.0s (1 khảo sát)" in out
+    assert "trang 1 mẫu abcdef01 https://survey.uit.edu.vn/index.php/1?token=a" in out
+    assert "completed, 1 xong, 0 lỗi" in out
+
+
+def test_history_sink_keeps_interleaved_async_surveys_apart(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    commands = CommandCounter()
+    sink = HistorySink(RunHistoryStore(db_path), commands)
+    first = "https://survey.uit.edu.vn/index.php/111?token=a"
+    second = "https://survey.uit.edu.vn/index.php/222?token=b"
+    sink.handle(RunStarted(False))
+    sink.handle(SurveyStarted(1, 2, first))
+    sink.handle(SurveyStarted(2, 2, second))
+    sink.handle(PageScanned(1, 1, "fp-a1", False, 3, 1.0))
+    sink.handle(PageScanned(2, 1, "fp-b1", False, 2, 1.0))
+    sink.handle(PageScanned(1, 2, "fp-a2", True, 1, 0.1))
+    commands.add("clickElement")
+    sink.handle(SurveyFinished(2, True, 1, 5.0))
+    sink.handle(SurveyFinished(1, False, 2, 8.0))
+    sink.handle(RunFinished("completed", 1, 1))
+    sink.close()
+
+    # Số lệnh của từng khảo sát không tách được khi chúng chạy chồng nhau
+    assert sorted(rows(db_path, "SELECT idx, link, form_key, pages, submitted, webdriver_commands FROM surveys")) == [
+        (1, first, "111", 2, 0, None), (2, second, "222", 1, 1, None)]
+    assert sorted(rows(db_path, "SELECT survey_idx, page, fingerprint FROM pages")) == [
+        (1, 1, "fp-a1"), (1, 2, "fp-a2"), (2, 1, "fp-b1")]
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+import Survey
+from Survey import DeadlineBudget, LatencyEstimator, PortalRateLimiter, timed_get
+
+
+# --- LatencyEstimator -------------------------------------------------------
+
+def test_latency_estimator_uses_fallback_until_enough_samples():
+    estimator = LatencyEstimator()
+    for _ in range(4):
+        estimator.observe(0.01)
+    assert estimator.timeout(10.0) == 10.0
+    assert estimator.poll_interval() == 0.5
+
+
+def test_latency_estimator_never_shortens_fallback():
+    estimator = LatencyEstimator()
+    for _ in range(20):
+        estimator.observe(0.01)
+    assert estimator.timeout(10.0) == 10.0
+    assert estimator.poll_interval() == 0.05
+
+
+def test_latency_estimator_extends_for_slow_portal_up_to_maximum():
+    estimator = LatencyEstimator()
+    for _ in range(20):
+        estimator.observe(8.0)
+    assert estimator.timeout(10.0) == pytest.approx(32.5)
+    assert estimator.timeout(10.0, maximum=20.0) == 20.0
+
+
+def test_latency_estimator_counts_censored_samples():
+    estimator = LatencyEstimator()
+    estimator.observe(1.0)
+    estimator.observe(15.0, censored=True)
+    assert estimator.censored == 1
+    assert estimator.count == 2
+    assert estimator.percentile(0.99) == 15.0
+
+
+# --- DeadlineBudget ---------------------------------------------------------
+
+def test_deadline_budget_caps_waits():
+    budget = DeadlineBudget(5.0)
+    assert budget.cap(1.0) == 1.0
+    assert 4.0 < budget.cap(60.0) <= 5.0
+    budget.deadline = time.monotonic() - 1
+    assert budget.remaining() == 0.0
+    assert budget.cap(1.0) == 0.0
+
+
+def test_deadline_budget_splits_across_remaining_waits():
+    budget = DeadlineBudget(100.0, waits=10, slack=2.0)
+    # Một lần chờ chậm chỉ được dùng khoảng hai phần chia đều, không phải cả ngân sách
+    assert 19.0 < budget.cap(180.0) <= 20.0
+    assert budget.waits_left == 9
+    # Lần chờ xong sớm để lại phần dư cho các lần sau
+    assert budget.cap(1.0) == 1.0
+    for _ in range(10):
+        budget.cap(1.0)
+    assert budget.waits_left == 1
+    assert 99.0 < budget.cap(180.0) <= 100.0
+
+
+# --- timed_get --------------------------------------------------------------
+
+class SlowDriver:
+    """Driver whose page loads always time out and use up the budget."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.gets = 0
+        self.page_load_timeouts = []
+
+    def set_page_load_timeout(self, seconds):
+        self.page_load_timeouts.append(seconds)
+
+    def get(self, url):
+        self.gets += 1
+        self.budget.deadline = time.monotonic()
+        raise Survey.TimeoutException("page load")
+
+    def execute_script(self, script, *args):
+        return None
+
+
+def test_timed_get_charges_retries_to_budget(monkeypatch):
+    Survey.load_automation_modules()
+    monkeypatch.setattr(Survey, "portal_limiter", PortalRateLimiter(rate=0, max_retries=2, base_delay=0.0))
+    budget = DeadlineBudget(30.0, waits=3)
+    driver = SlowDriver(budget)
+    with pytest.raises(Survey.TimeoutException, match="ngân sách"):
+        timed_get(driver, "https://survey.uit.edu.vn/index.php/1", budget)
+    # Không thử lại khi ngân sách đã hết; timeout tải trang được khôi phục sau lần thử
+    assert driver.gets == 1
+    assert driver.page_load_timeouts == [pytest.approx(20.0, abs=0.1), Survey.PAGE_LOAD_TIMEOUT]
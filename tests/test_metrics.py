@@ -0,0 +1,47 @@
+import os
+
+import Survey
+from Survey import DriverStarted, PageScanned, PrometheusSink, RunFinished, SurveyFinished
+
+
+# --- PrometheusSink ---------------------------------------------------------
+
+def test_prometheus_render_counts_and_histograms():
+    sink = PrometheusSink()
+    sink.handle(SurveyFinished(1, True, 3, 0.3))
+    sink.handle(SurveyFinished(2, False, 1, 40.0))
+    sink.handle(PageScanned(1, 1, "fp", True, 4, 1.0))
+    sink.handle(RunFinished("completed", 1, 1))
+    sink.worker_restarted()
+    lines = sink.render().splitlines()
+    assert 'uit_surveys_total{result="done"} 1' in lines
+    assert 'uit_surveys_total{result="failed"} 1' in lines
+    assert "uit_pages_replayed_total 1" in lines
+    assert 'uit_runs_total{outcome="completed"} 1' in lines
+    assert "uit_worker_restarts_total 1" in lines
+    assert "# TYPE uit_phase_seconds histogram" in lines
+    # Bucket tích lũy: 0.3s tính từ le=0.5, 40s từ le=60
+    assert 'uit_phase_seconds_bucket{phase="survey",le="0.25"} 0' in lines
+    assert 'uit_phase_seconds_bucket{phase="survey",le="0.5"} 1' in lines
+    assert 'uit_phase_seconds_bucket{phase="survey",le="30.0"} 1' in lines
+    assert 'uit_phase_seconds_bucket{phase="survey",le="60.0"} 2' in lines
+    assert 'uit_phase_seconds_bucket{phase="survey",le="+Inf"} 2' in lines
+    assert 'uit_phase_seconds_count{phase="survey"} 2' in lines
+
+
+def test_prometheus_counts_driver_starts_without_restart_metric():
+    sink = PrometheusSink()
+    sink.handle(DriverStarted("edge", 1.5))
+    sink.handle(DriverStarted("edge", 1.2))
+    lines = sink.render().splitlines()
+    assert "uit_driver_starts_total 2" in lines
+    assert not any(line.startswith("uit_driver_restarts_total") for line in lines)
+
+
+def test_prometheus_omits_unknown_browser_memory(monkeypatch):
+    monkeypatch.setattr(Survey.run_metrics, "active", True)
+    monkeypatch.setattr(Survey.run_metrics, "browser_pid", None)
+    assert "uit_browser_rss_bytes" not in PrometheusSink().render()
+    monkeypatch.setattr(Survey.run_metrics, "browser_pid", os.getpid())
+    monkeypatch.setattr(Survey, "browser_memory_mb", lambda pid: 2.0)
+    assert "uit_browser_rss_bytes 2097152" in PrometheusSink().render().splitlines()
@@ -0,0 +1,95 @@
+import asyncio
+
+from Survey import (APPLY_PLAN_JS, EXTRACT_QUESTION_MODEL_JS, POSITIVE_FEEDBACK, EventBus,
+                    PlanCache, async_answer_page, build_page_plan)
+
+
+MODEL = {
+    "radios": [
+        {"name": "q1", "question": "Anh/chị có hài lòng về môn học?", "selected": False,
+         "options": [{"label": "Không hài lòng", "value": "1", "index": 0},
+                     {"label": "Hài lòng", "value": "2", "index": 1}]},
+        {"name": "q2", "question": "Đã trả lời", "selected": True,
+         "options": [{"label": "Hài lòng", "value": "2", "index": 0}]},
+    ],
+    "selects": [
+        {"key": "#0", "optionCount": 3, "atDefault": True, "displayed": True},
+        {"key": "#1", "optionCount": 3, "atDefault": True, "displayed": False},
+        {"key": "#2", "optionCount": 3, "atDefault": True, "displayed": True, "disabled": True},
+        {"key": "#3", "optionCount": 3, "atDefault": False, "displayed": True},
+    ],
+    "texts": [
+        {"key": "#0", "mandatory": True, "empty": True},
+        {"key": "#1", "mandatory": False, "empty": True},
+        {"key": "#2", "mandatory": True, "empty": False},
+    ],
+}
+
+
+# --- build_page_plan --------------------------------------------------------
+
+def test_build_page_plan_answers_only_open_visible_targets():
+    plan = build_page_plan(MODEL, EventBus())
+    assert [(action["kind"], action.get("name") or action["key"]) for action in plan] == [
+        ("radio", "q1"), ("select", "#0"), ("text", "#0")]
+    radio, select, text = plan
+    assert (radio["value"], radio["index"], radio["label"]) == ("2", 1, "Hài lòng")
+    assert select["index"] == 2
+    assert text["text"] == POSITIVE_FEEDBACK
+
+
+def test_build_page_plan_empty_model():
+    assert build_page_plan({}, EventBus()) == []
+
+
+def test_apply_plan_js_skips_hidden_selects_and_texts():
+    # Kế hoạch lấy từ cache có thể chứa các câu hỏi chỉ hiện ra theo điều kiện
+    assert "s.options.length <= 1 || !visible(s)" in APPLY_PLAN_JS
+    assert "t.disabled || !visible(t)" in APPLY_PLAN_JS
+
+
+class FakeSession:
+    def __init__(self, model):
+        self.model = model
+        self.scripts = []
+
+    async def execute_script(self, script, *args):
+        self.scripts.append(script)
+        if script is EXTRACT_QUESTION_MODEL_JS:
+            return self.model
+        return None
+
+
+def test_async_dry_run_plans_without_answering():
+    session = FakeSession(MODEL)
+    applied = asyncio.run(async_answer_page(session, EventBus(), 1, 1, dry_run=True))
+    assert applied == 0
+    assert APPLY_PLAN_JS not in session.scripts
+
+
+# --- PlanCache --------------------------------------------------------------
+
+def test_plan_cache_dedupes_targets_and_round_trips(tmp_path):
+    path = str(tmp_path / "plans.json")
+    cache = PlanCache(path)
+    plan = [{"kind": "radio", "name": "q1", "value": "5"},
+            {"kind": "select", "key": "#0", "index": 1},
+            {"kind": "radio", "name": "q1", "value": "4"},
+            {"kind": "text", "key": "#0", "value": "Không"}]
+    cache.put("fp", plan)
+    assert [action.get("value") for action in cache.get("fp")] == ["5", None, "Không"]
+    cache.save()
+
+    loaded = PlanCache(path)
+    loaded.load()
+    assert loaded.get("fp") == cache.get("fp")
+    loaded.discard("fp")
+    assert loaded.get("fp") is None
+
+
+def test_plan_cache_ignores_other_versions(tmp_path):
+    path = tmp_path / "plans.json"
+    path.write_text('{"version": 0, "plans": {"fp": []}}', encoding="utf-8")
+    cache = PlanCache(str(path))
+    cache.load()
+    assert cache.get("fp") is None
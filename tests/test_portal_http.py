@@ -0,0 +1,81 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import Survey
+from Survey import PortalHttpClient, SurveyListParser
+
+
+LIST_PAGE = """<html><body>
+<div id="block-system-main"><div><table>
+<thead><tr><th>STT</th><th>Môn học</th><th>Trạng thái</th></tr></thead>
+<tbody>
+<tr><td>1</td><td><strong><a href="/survey/index.php/111?token=a">IT001</a></strong></td><td>(Chưa khảo sát)</td></tr>
+<tr><td>2</td><td><strong><a href="https://survey.uit.edu.vn/index.php/222?token=b">IT002</a></strong></td><td> (Đã khảo sát) </td></tr>
+<tr><td>3</td><td>Không có link</td><td>(Chưa khảo sát)</td></tr>
+</tbody></table></div></div>
+<table><tbody><tr><td>1</td><td><strong><a href="/other">x</a></strong></td><td>y</td></tr></tbody></table>
+</body></html>"""
+
+LOGIN_PAGE = """<html><body><form><input name="name"><input name="pass" type="password"></form></body></html>"""
+
+
+# --- SurveyListParser -------------------------------------------------------
+
+def test_list_parser_reads_rows_in_small_chunks():
+    parser = SurveyListParser("https://student.uit.edu.vn/sinhvien/phieukhaosat")
+    for start in range(0, len(LIST_PAGE), 7):
+        parser.feed(LIST_PAGE[start:start + 7])
+        if parser.done:
+            break
+    assert parser.done
+    assert parser.rows == [
+        ("https://student.uit.edu.vn/survey/index.php/111?token=a", Survey.PENDING_STATUS),
+        ("https://survey.uit.edu.vn/index.php/222?token=b", "(Đã khảo sát)"),
+    ]
+    assert not parser.login_form
+
+
+def test_list_parser_flags_login_page():
+    parser = SurveyListParser("https://student.uit.edu.vn/")
+    parser.feed(LOGIN_PAGE)
+    assert not parser.done
+    assert parser.login_form
+    assert parser.rows == []
+
+
+@pytest.fixture
+def list_server():
+    """Serve LIST_PAGE as UTF-8 text/html without a declared charset."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = LIST_PAGE.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/sinhvien/phieukhaosat"
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_client_decodes_undeclared_charset_as_utf8(list_server):
+    Survey.load_automation_modules()
+    client = PortalHttpClient(list_server, timeout=5)
+    try:
+        pending = client.pending_links()
+        assert pending == [list_server.rsplit("/sinhvien", 1)[0] + "/survey/index.php/111?token=a"]
+        assert client.is_completed("https://survey.uit.edu.vn/index.php/222?token=b") is True
+        assert client.is_completed(pending[0]) is False
+        # Không có trong danh sách: không kết luận, để trình duyệt kiểm tra
+        assert client.is_completed("https://survey.uit.edu.vn/index.php/999") is None
+    finally:
+        client.close()
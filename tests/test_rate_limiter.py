@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+import Survey
+from Survey import PortalRateLimiter, await_portal_response
+
+
+# --- PortalRateLimiter ------------------------------------------------------
+
+def test_rate_limiter_token_bucket():
+    limiter = PortalRateLimiter(rate=10.0, burst=2)
+    assert limiter._reserve() == 0.0
+    assert limiter._reserve() == 0.0
+    assert limiter._reserve() == pytest.approx(0.1, abs=0.01)
+    assert limiter.requests == 3
+    assert limiter.throttled_seconds == pytest.approx(0.1, abs=0.01)
+
+
+def test_rate_limiter_backoff_grows_and_resets():
+    limiter = PortalRateLimiter(rate=0, base_delay=1.0, max_delay=4.0)
+    delays = [limiter.report_failure() for _ in range(4)]
+    assert 0.5 <= delays[0] <= 1.0
+    assert 1.0 <= delays[1] <= 2.0
+    assert 2.0 <= delays[3] <= 4.0
+    assert limiter._reserve() > 0
+    assert limiter.backoffs == 4
+    limiter.report_success()
+    assert 0.5 <= limiter.report_failure() <= 1.0
+
+
+def test_rate_limiter_configure():
+    limiter = PortalRateLimiter()
+    limiter.configure({"rate_limit": "0.5", "rate_burst": "1", "rate_retries": "5"})
+    assert (limiter.rate, limiter.burst, limiter.max_retries) == (0.5, 1, 5)
+    limiter.configure({"rate_limit": "nhanh"})
+    assert limiter.rate == 0.5
+
+
+def test_rate_limiter_wait_backoff():
+    limiter = PortalRateLimiter(rate=0, base_delay=0.2, max_delay=0.2)
+    assert limiter.wait_backoff() == 0.0
+    limiter.report_failure()
+    started = time.monotonic()
+    assert limiter.wait_backoff() > 0.0
+    assert time.monotonic() - started >= 0.09
+    assert limiter.wait_backoff() == 0.0
+
+
+# --- await_portal_response --------------------------------------------------
+
+class LoadedPage:
+    def __init__(self, status):
+        self.status = status
+
+    def execute_script(self, script, *args):
+        if script is Survey.NAVIGATION_STATUS_JS:
+            return self.status
+        return "complete"
+
+
+@pytest.mark.parametrize("status, overloaded", [(200, False), (None, False), (429, True), (503, True)])
+def test_submit_status_backs_off_before_moving_on(monkeypatch, status, overloaded):
+    Survey.load_automation_modules()
+    limiter = PortalRateLimiter(rate=0, base_delay=0.2, max_delay=0.2)
+    monkeypatch.setattr(Survey, "portal_limiter", limiter)
+    started = time.monotonic()
+    assert await_portal_response(LoadedPage(status)) is overloaded
+    assert limiter.backoffs == int(overloaded)
+    # Backoff đã được chờ hết trước khi trả về, không để lại cho lần click sau
+    assert (time.monotonic() - started >= 0.09) is overloaded
+    assert limiter._reserve() == 0.0
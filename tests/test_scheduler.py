@@ -0,0 +1,66 @@
+import pytest
+
+from Survey import SurveyHistory, SurveyScheduler, survey_form_key
+
+
+def survey(sid, token):
+    return f"https://survey.uit.edu.vn/index.php/{sid}?token={token}"
+
+
+# --- survey_form_key --------------------------------------------------------
+
+@pytest.mark.parametrize("link, key", [
+    ("https://survey.uit.edu.vn/index.php/123456?token=abc&lang=vi", "123456"),
+    ("https://survey.uit.edu.vn/index.php?r=survey/index&sid=654321&token=x", "654321"),
+    ("https://survey.uit.edu.vn/index.php/survey/index/sid/777/token/y", "777"),
+    ("https://survey.uit.edu.vn/khac/form?token=z", "/khac/form"),
+])
+def test_survey_form_key(link, key):
+    assert survey_form_key(link) == key
+
+
+def test_survey_form_key_ignores_token():
+    assert survey_form_key(survey(111, "a")) == survey_form_key(survey(111, "b"))
+
+
+# --- SurveyScheduler --------------------------------------------------------
+
+def test_scheduler_runs_shortest_known_survey_first():
+    history = SurveyHistory()
+    history.record("111", pages=6, seconds=60.0)
+    history.record("222", pages=1, seconds=8.0)
+    links = [survey(111, "a"), survey(222, "b")]
+    scheduler = SurveyScheduler(links, history)
+    assert scheduler.ordered() == [survey(222, "b"), survey(111, "a")]
+    assert scheduler.next() == survey(222, "b")
+    assert scheduler.started == 1
+
+
+def test_scheduler_samples_each_unknown_form_before_repeats():
+    links = [survey(1, "a"), survey(1, "b"), survey(2, "c"), survey(2, "d")]
+    scheduler = SurveyScheduler(links, SurveyHistory())
+    assert scheduler.ordered() == [survey(1, "a"), survey(2, "c"), survey(1, "b"), survey(2, "d")]
+
+
+def test_scheduler_orders_by_first_page_progress():
+    links = [survey(1, "a"), survey(1, "b"), survey(2, "c"), survey(2, "d")]
+    scheduler = SurveyScheduler(links, SurveyHistory())
+    assert scheduler.next() == survey(1, "a")
+    scheduler.on_page(1, 10.0)  # mẫu 1: 10 trang
+    scheduler.finish(False)
+    assert scheduler.estimate_pages(survey(1, "b")) == 10
+    assert scheduler.next() == survey(2, "c")
+    scheduler.on_page(1, 50.0)  # mẫu 2: 2 trang
+    scheduler.finish(False)
+    assert scheduler.ordered() == [survey(2, "d"), survey(1, "b")]
+    assert scheduler.failed == 2
+
+
+def test_scheduler_eta_counts_pending_and_current():
+    history = SurveyHistory()
+    history.seconds_per_page = 10.0
+    scheduler = SurveyScheduler([survey(1, "a"), survey(2, "b")], history, default_pages=3)
+    assert scheduler.eta_seconds() == pytest.approx(60.0)
+    scheduler.next()
+    assert scheduler.eta_seconds() == pytest.approx(60.0, abs=0.5)
+    assert scheduler.pages_remaining() == 6
@@ -0,0 +1,51 @@
+import pytest
+
+from Survey import LatencyHistogram, setup_driver
+
+
+# --- LatencyHistogram -------------------------------------------------------
+
+def test_latency_histogram_percentiles_and_merge():
+    histogram = LatencyHistogram()
+    for seconds in (0.003, 0.004, 0.2, 0.9):
+        histogram.observe(seconds)
+    assert histogram.count == 4
+    assert histogram.mean() == pytest.approx(0.27675)
+    assert histogram.percentile(0.5) == 0.005
+    assert histogram.percentile(1.0) == 0.9  # cận trên bucket bị chặn bởi max
+    cumulative = histogram.cumulative()
+    assert cumulative[LatencyHistogram.BOUNDS.index(0.005)] == 2
+    assert cumulative[-1] == 4
+
+    other = LatencyHistogram()
+    other.observe(100.0)
+    histogram.merge(other)
+    assert histogram.count == 5
+    assert histogram.max == 100.0
+    assert histogram.buckets[-1] == 1
+    assert histogram.percentile(1.0) == 100.0
+    assert histogram.to_list()[1:] == [5, histogram.total, 100.0]
+
+
+# --- setup_driver -----------------------------------------------------------
+
+class UnstartableBackend:
+    display_name = "Test"
+
+    def __init__(self):
+        self.starts = 0
+
+    def start(self, headless=False):
+        self.starts += 1
+        raise AssertionError("browser must not start with invalid settings")
+
+
+@pytest.mark.parametrize("config", [
+    {"webdriver_pool_size": "0"},
+    {"webdriver_read_timeout": "-1"},
+    {"webdriver_connect_timeout": "abc"},
+])
+def test_invalid_transport_settings_are_rejected_before_starting(config):
+    backend = UnstartableBackend()
+    assert setup_driver(backend, config=config) is None
+    assert backend.starts == 0
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+import Survey
+from Survey import PENDING_STATUS, watch_diff
+
+DONE = "(Đã khảo sát)"
+
+
+def test_watch_diff_marks_done_and_returns_new_pending():
+    known = {"a"}
+    rows = [("a", PENDING_STATUS), ("b", PENDING_STATUS), ("c", DONE)]
+    assert watch_diff(rows, known) == ["b"]
+    assert known == {"a", "c"}
+
+
+class FakeClient:
+    """Portal list that changes as the fake survey_main submits surveys."""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.login_required = False
+
+    def load_cookies(self, path):
+        return True
+
+    def fetch_survey_list(self):
+        return list(self.statuses.items())
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def watch(monkeypatch, tmp_path):
+    """Run watch_surveys for a number of poll cycles; returns the only_links of each browser run."""
+    state_path = tmp_path / "watch_state.json"
+    monkeypatch.setattr(Survey, "WATCH_STATE_PATH", str(state_path))
+    monkeypatch.setattr(Survey, "CONFIG_DIR", str(tmp_path))
+
+    def run(statuses, cycles, submits=()):
+        runs = []
+        client = FakeClient(statuses)
+        monkeypatch.setattr(Survey, "PortalHttpClient", lambda *args, **kwargs: client)
+
+        def survey_main(config, events):
+            links = config["only_links"].split()
+            runs.append(links)
+            for link in links:
+                if link in submits:
+                    statuses[link] = DONE
+
+        polls = {"left": cycles}
+
+        def sleep(seconds):
+            polls["left"] -= 1
+            if polls["left"] == 0:
+                Survey.cancel_token.cancel()
+            return Survey.cancel_token.cancelled
+
+        monkeypatch.setattr(Survey, "survey_main", survey_main)
+        monkeypatch.setattr(Survey.cancel_token, "sleep", sleep)
+        try:
+            assert Survey.watch_surveys({}, interval=0.0)
+        finally:
+            Survey.cancel_token.reset()
+        return runs, json.loads(state_path.read_text(encoding="utf-8")) if state_path.exists() else None
+
+    return run
+
+
+def test_watch_runs_only_new_surveys_and_remembers_submitted(watch):
+    statuses = {"old": DONE, "new": PENDING_STATUS}
+    runs, state = watch(statuses, cycles=2, submits={"new"})
+    # Lượt chạy chỉ nhận link mới; chu kỳ sau không mở lại trình duyệt
+    assert runs == [["new"]]
+    assert state["known"] == ["new", "old"]
+    assert state["attempts"] == {}
+
+
+def test_watch_retries_failed_survey_until_limit(watch):
+    statuses = {"new": PENDING_STATUS}
+    runs, state = watch(statuses, cycles=Survey.WATCH_MAX_ATTEMPTS + 1)
+    assert runs == [["new"]] * Survey.WATCH_MAX_ATTEMPTS
+    assert state["known"] == ["new"]
+
+
+def test_watch_keeps_failed_survey_pending(watch):
+    statuses = {"new": PENDING_STATUS}
+    runs, state = watch(statuses, cycles=1)
+    assert runs == [["new"]]
+    assert state["known"] == []
+    assert state["attempts"] == {"new": 1}
+
+
+def test_only_links_restricts_run():
+    bus = Survey.EventBus()
+    links = ["a", "b"]
+    assert Survey.select_run_links(links, {"only_links": "b"}, bus) == ["b"]
+    assert Survey.select_run_links(links, {"only_links": ""}, bus) == []
@@ -0,0 +1,110 @@
+import multiprocessing
+import threading
+from dataclasses import asdict
+
+import Survey
+from Survey import LogMessage, SurveyFinished, SurveyStarted, WorkerSupervisor
+
+
+class DeadProcess:
+    exitcode = -9
+
+    def start(self):
+        pass
+
+    def join(self, timeout=None):
+        pass
+
+    def is_alive(self):
+        return False
+
+
+def event_message(event):
+    return ("event", event.__class__.__name__, asdict(event))
+
+
+def crash_worker(supervisor, messages):
+    """Feed a worker's messages to the supervisor, then drop the pipe without "done"."""
+    parent, child = multiprocessing.Pipe()
+    supervisor.process = DeadProcess()
+    for message in messages:
+        child.send(message)
+    child.close()
+    supervisor._read_loop(parent)
+
+
+def make_supervisor(monkeypatch, **kwargs):
+    events, starts, killed = [], [], []
+    supervisor = WorkerSupervisor({"log_level": "ERROR"}, events.append, restart_delay=0.0, **kwargs)
+    monkeypatch.setattr(supervisor, "start", lambda: starts.append(supervisor.restarts))
+    monkeypatch.setattr(Survey, "kill_pid_tree", killed.append)
+    return supervisor, events, starts, killed
+
+
+def test_crashed_worker_restarts_skipping_submitted_surveys(monkeypatch):
+    supervisor, events, starts, killed = make_supervisor(monkeypatch)
+    crash_worker(supervisor, [
+        ("metrics", dict(Survey.run_metrics.to_dict(), browser_pid=4321), 0, False, {}),
+        event_message(SurveyStarted(1, 2, "https://survey.uit.edu.vn/index.php/1?token=a")),
+        event_message(SurveyFinished(1, True, 2, 10.0)),
+        event_message(SurveyStarted(2, 2, "https://survey.uit.edu.vn/index.php/2?token=b")),
+    ])
+    # Trình duyệt của worker chết được dừng trước khi khởi động lại
+    assert killed == [4321]
+    assert starts == [1]
+    assert supervisor.submitted_links == ["https://survey.uit.edu.vn/index.php/1?token=a"]
+    # Sự kiện dưới mức log chỉ để theo dõi, không hiện lên giao diện
+    assert [type(event) for event in events] == [LogMessage]
+
+
+def test_restarted_worker_resumes_session_and_skips_links(monkeypatch):
+    supervisor, _, _, _ = make_supervisor(monkeypatch)
+    supervisor.submitted_links = ["a", "b"]
+    supervisor.restarts = 1
+    configs = []
+
+    class Context:
+        def Pipe(self):
+            return multiprocessing.Pipe()
+
+        def Process(self, target, args, daemon):
+            configs.append(args[0])
+            return DeadProcess()
+
+    monkeypatch.setattr(Survey.multiprocessing, "get_context", lambda method: Context())
+    WorkerSupervisor.start(supervisor)
+    supervisor._reader.join(5.0)
+    assert configs[0]["resume_session"] == "1"
+    assert configs[0]["skip_links"].split() == ["a", "b"]
+
+
+def test_restarts_are_capped(monkeypatch):
+    supervisor, events, starts, _ = make_supervisor(monkeypatch, max_restarts=2)
+    for _ in range(4):
+        crash_worker(supervisor, [])
+    assert starts == [1, 2]
+    assert "hết số lần khởi động lại" in events[-2].text
+
+
+def test_no_restart_after_stop_or_clean_exit(monkeypatch):
+    supervisor, _, starts, killed = make_supervisor(monkeypatch)
+    crash_worker(supervisor, [("done",)])
+    assert starts == [] and killed == []
+
+    supervisor.restart_delay = 30.0
+    reader = threading.Thread(target=crash_worker, args=(supervisor, []))
+    reader.start()
+    # Dừng trong lúc chờ khởi động lại: không mở worker mới
+    while supervisor.restarts == 0:
+        reader.join(0.01)
+    supervisor.stop(timeout=0.1)
+    reader.join(5.0)
+    assert not reader.is_alive()
+    assert starts == []
+
+
+def test_select_run_links_skips_submitted():
+    bus = Survey.EventBus()
+    links = ["a", "b", "c"]
+    assert Survey.select_run_links(links, {}, bus) == links
+    assert Survey.select_run_links(links, {"skip_links": "a\nc"}, bus) == ["b"]